@@ -1,8 +1,19 @@
+import uuid
 import streamlit as st
-import json
-import os
+import pandas as pd
 from datetime import datetime
+from itertools import groupby
 from gist_manager import GistManager
+from tenants import (get_shared_state, get_sync_worker, get_points_engine, get_task_index,
+                     current_tenant, use_tenant, UnknownTenant, TenantClosed, DEFAULT_TENANT)
+from event_log import make_event, apply_event, completion_seen
+from profiling import PROFILER, profiled
+from github_client import get_github_client
+from storage import (GistStorage, JsonFileStorage, EventLogStorage, StorageClosed, DATA_FILE, create_storage,
+                     get_backend_name)
+from migrations import migrate, needs_migration
+from catalog import available_catalogs, get_catalog_name, new_document
+from merge import merge_documents
 
 st.set_page_config(
     page_title="TaskGame - Colocation",
@@ -10,47 +21,167 @@ st.set_page_config(
     layout="wide"
 )
 
-DATA_FILE = "colocation_data.json"
+def get_gist_manager():
+    """Accès au Gist de la colocation courante"""
+    return GistManager(gist_id=current_tenant().gist_id)
 
-def load_data():
-    """Charge les données depuis GitHub Gist ou fichier local"""
-    gist_manager = GistManager()
-    
-    # Essayer de charger depuis GitHub Gist d'abord
-    if gist_manager.is_configured():
-        data = gist_manager.load_data_from_gist()
+def load_initial_data(tenant):
+    """Document de départ des moteurs incrémentaux : Gist, fichier local ou valeurs par défaut"""
+    backup = JsonFileStorage(tenant.path(DATA_FILE))
+    sources = [backup]
+    if GistManager(gist_id=tenant.gist_id).is_configured():
+        sources.insert(0, GistStorage(tenant.sync_worker, backup, tenant.gist_id))
+    
+    for storage in sources:
+        data = storage.load()
         if data is not None:
-            # Migrer les données si nécessaire
-            data = migrate_task_data(data)
-            return data
-        else:
-            st.warning("⚠️ Impossible de charger depuis GitHub Gist, utilisation des données locales")
-    
-    # Fallback vers le fichier local
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            # Migrer les données si nécessaire
+            return migrate_task_data(data)
+    return get_default_data()
+
+def get_storage():
+    """Retourne le moteur de stockage de la colocation courante (réglage STORAGE_BACKEND)"""
+    tenant = current_tenant()
+    with tenant.lock:
+        tenant.ensure_open()
+        if tenant.storage is None:
+            tenant.storage = create_storage(get_backend_name(tenant.gist_id),
+                                            lambda: load_initial_data(tenant), tenant)
+            if GistManager(gist_id=tenant.gist_id).is_configured():
+                # Thread de synchronisation seulement pour les colocations qui ont un Gist
+                tenant.sync_worker.on_merge = lambda sent, merged: merge_remote_changes(tenant, sent, merged)
+            if isinstance(tenant.storage, EventLogStorage):
+                tenant.storage.event_log.on_replay = lambda event: replay_external_event(tenant, event)
+        return tenant.storage
+
+def replay_external_event(tenant, event):
+    """Événement écrit dans le journal par un autre processus (convert_tasks.py), déjà
+    appliqué à l'état du journal : les index de la colocation le suivent"""
+    data = tenant.storage.event_log.state
+    tenant.points_engine.on_event(data, event)
+    tenant.task_index.on_event(data, event)
+
+def record_event(data, event_type, /, **payload):
+    """Applique une modification aux données et la transmet au moteur de stockage
+
+    data et event_type sont positionnels : le contenu de l'événement peut lui-même avoir
+    un champ data (app_reset, remote_merged).
+    """
+    event = make_event(event_type, **payload)
+    apply_event(data, event)
+    get_points_engine().on_event(data, event)
+    get_task_index().on_event(data, event)
+    # Les moteurs incrémentaux (SQLite, journal) n'enregistrent que cette modification
+    get_storage().record(data, event)
+    return event
+
+def merge_remote_changes(tenant, sent, merged):
+    """Le Gist avait été modifié par une autre instance : l'état partagé reprend la version
+    fusionnée, plus les modifications faites depuis l'envoi (appelé par le thread de synchronisation)"""
+    with use_tenant(tenant):
+        state = get_shared_state()
+        with state.lock:
+            get_sync_worker().rebase_pending(sent, merged)
+            if state.data is not None:
+                record_event(state.data, "remote_merged", data=merge_documents(sent, state.data, merged))
+            # Le Gist relu à l'envoi est intégré : fin de l'avertissement de démarrage à chaud
+            state.mark_fresh()
+
+@profiled("load_data")
+def load_data():
+    """Charge les données depuis l'état partagé ou le moteur de stockage"""
+    state = get_shared_state()
+    gist_manager = get_gist_manager()
+    
+    with state.lock:
+        # Toutes les sessions partagent le même document tant qu'il est frais
+        # (ou pendant que la copie locale est revalidée en arrière-plan)
+        if state.refreshing or not state.is_stale(gist_manager.cache_ttl):
+            return state.data
+        
+        storage = get_storage()
+        if state.data is None and isinstance(storage, GistStorage):
+            # Démarrage à chaud : la copie locale s'affiche sans attendre GitHub
+            snapshot = storage.local_snapshot()
+            if snapshot is not None:
+                data, saved_at = snapshot
+                state.serve_stale(migrate_task_data(data), saved_at, storage.load_remote)
+                return state.data
+        
+        known_revision = state.revision if state.data is not None else None
+        data, revision = storage.load_if_changed(known_revision)
+        if data is None and state.data is not None:
+            # La source n'a pas changé : garder l'état déjà migré
+            state.touch()
+            return state.data
+        
+        if data is None:
+            data = get_default_data()
+        elif needs_migration(data):
+            # Migration faite une seule fois : la version à jour est enregistrée
             data = migrate_task_data(data)
-            return data
-    else:
-        return get_default_data()
+            storage.save(data)
+            if not isinstance(storage, GistStorage):
+                revision = storage.revision()
+        
+        state.replace(data, revision)
+        return data
 
+@profiled("save_data")
 def save_data(data):
-    """Sauvegarde les données sur GitHub Gist et localement"""
-    gist_manager = GistManager()
-    
-    # Sauvegarder sur GitHub Gist si configuré
-    if gist_manager.is_configured():
-        success = gist_manager.save_data_to_gist(data)
-        if success:
-            st.success("✅ Données sauvegardées sur GitHub!")
+    """Sauvegarde les données via le moteur de stockage (et sur GitHub Gist si configuré)"""
+    state = get_shared_state()
+    storage = get_storage()
+    
+    with state.lock:
+        if storage.incremental:
+            # Chaque modification est déjà enregistrée ; le Gist reste une copie du document
+            if get_gist_manager().is_configured():
+                get_sync_worker().enqueue(data)
+        elif isinstance(storage, GistStorage):
+            # Données issues de la copie locale d'un démarrage à chaud, pas encore relue sur
+            # le Gist : l'envoi fusionne avec le Gist à partir de cette copie
+            stale_base = state.take_stale_base()
+            storage.save(data, None if stale_base is None else (None, stale_base))
         else:
-            st.error("❌ Erreur lors de la sauvegarde sur GitHub")
-    
-    # Sauvegarder localement aussi (backup)
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+            storage.save(data)
+        
+        # Les données sauvegardées deviennent l'état partagé de référence
+        if isinstance(storage, GistStorage):
+            # Le Gist ne change qu'une fois l'envoi en arrière-plan terminé (fusion comprise)
+            state.replace(data, state.revision, fresh=False)
+        else:
+            state.replace(data, storage.revision())
+
+def snapshot(data):
+    """Copie du document partagé, lisible hors du verrou (les autres sessions le modifient sur place)"""
+    with get_shared_state().lock:
+        return {
+            **data,
+            'colocataires': {nom: dict(info) for nom, info in data['colocataires'].items()},
+            'taches': {nom: dict(info) for nom, info in data['taches'].items()}
+        }
+
+def render_sync_status():
+    """Affiche l'état de la synchronisation avec GitHub Gist"""
+    if not get_gist_manager().is_configured():
+        return
+    
+    state = get_shared_state()
+    status = get_sync_worker().status()
+    if state.stale_since is not None:
+        date = datetime.fromtimestamp(state.stale_since).strftime('%d/%m %H:%M') if state.stale_since else "?"
+        if state.refreshing or (status["pending"] and not status["failures"]):
+            # Modifications faites sur la copie locale : fusionnées avec GitHub à l'envoi
+            st.warning(f"🕒 Données de la copie locale du {date} - actualisation depuis GitHub en cours...")
+        else:
+            st.warning(f"🕒 Données de la copie locale du {date} - GitHub injoignable pour le moment")
+    
+    if status["failures"]:
+        st.caption(f"⚠️ Modifications non synchronisées avec GitHub - nouvel essai dans {status['retry_in']}s")
+    elif status["pending"]:
+        st.caption("🔄 Synchronisation avec GitHub en cours...")
+    elif status["last_sync"]:
+        st.caption(f"☁️ Synchronisé avec GitHub à {status['last_sync'].strftime('%H:%M:%S')}")
 
 def calculate_task_points(task_info):
     """Calcule les points actuels d'une tâche en fonction du temps écoulé"""
@@ -74,24 +205,24 @@ def calculate_task_points(task_info):
         # En cas d'erreur, utiliser les points de base
         return points_base
 
+@profiled("update_task_points")
 def update_task_points(data):
-    """Met à jour les points actuels de toutes les tâches"""
-    for tache_info in data['taches'].values():
-        tache_info['points_actuels'] = calculate_task_points(tache_info)
-    return data
+    """Met à jour les points actuels des tâches dont le palier de bonus a changé"""
+    return get_points_engine().refresh(data)
 
-def complete_task(data, user, task_name):
-    """Marque une tâche comme terminée et attribue les points"""
+def complete_task(data, user, task_name, key=None):
+    """Marque une tâche comme terminée et attribue les points
+    
+    key : clé d'idempotence générée à l'ouverture de la confirmation ; une réalisation
+    déjà comptée avec la même clé n'est pas rejouée (0 point).
+    """
     if task_name in data['taches']:
+        if completion_seen(data, key):
+            return 0
         points_gagnes = data['taches'][task_name]['points_actuels']
-        data['colocataires'][user]['points'] += points_gagnes
-        
-        # Mettre à jour la date de dernière réalisation et qui l'a réalisée
-        data['taches'][task_name]['derniere_realisation'] = datetime.now().isoformat()
-        data['taches'][task_name]['derniere_realisation_par'] = user
         
-        # Réinitialiser les points actuels aux points de base
-        data['taches'][task_name]['points_actuels'] = data['taches'][task_name]['points_base']
+        # Ajoute les points, note la date et qui l'a réalisée, et remet les points à la base
+        record_event(data, "completion", user=user, task=task_name, points=points_gagnes, key=key)
         
         return points_gagnes
     return 0
@@ -111,157 +242,85 @@ def get_lieu_color(lieu):
     }
     return colors.get(lieu, "⚪")
 
+@profiled("migrate_task_data")
 def migrate_task_data(data):
-    """Migre les données des tâches vers la nouvelle structure si nécessaire"""
-    for tache_nom, tache_info in data['taches'].items():
-        # Vérifier si la tâche a la nouvelle structure
-        if 'attribuee_a' not in tache_info:
-            # Migrer vers la nouvelle structure
-            tache_info['attribuee_a'] = ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"]
-            tache_info['derniere_realisation_par'] = None
-        
-        # Migrer points vers points_base si nécessaire
-        if 'points_base' not in tache_info and 'points' in tache_info:
-            tache_info['points_base'] = tache_info['points']
-            del tache_info['points']
-        
-        # S'assurer que points_actuels existe
-        if 'points_actuels' not in tache_info:
-            tache_info['points_actuels'] = tache_info.get('points_base', 1)
-    
+    """Migre les données vers la version courante du schéma (voir migrations.py)"""
+    migrate(data)
     return data
 
-def is_task_available_for_user(task_info, user):
-    """Vérifie si une tâche est disponible pour un utilisateur"""
-    return user in task_info.get('attribuee_a', [])
-
 def get_default_data():
-    """Retourne les données par défaut de l'application"""
-    return {
-        "colocataires": {
-            "Antoine": {"points": 0},
-            "Arthur": {"points": 0},
-            "Raphael": {"points": 0},
-            "Martin": {"points": 0},
-            "Perrinne": {"points": 0}
-        },
-        "taches": {
-            # Cuisine
-            "Faire la vaisselle": {
-                "points_base": 2, 
-                "lieu": "Cuisine",
-                "derniere_realisation": None,
-                "points_actuels": 2,
-                "attribuee_a": ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"],
-                "derniere_realisation_par": None
-            },
-            "Nettoyer le plan de travail": {
-                "points_base": 1, 
-                "lieu": "Cuisine",
-                "derniere_realisation": None,
-                "points_actuels": 1,
-                "attribuee_a": ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"],
-                "derniere_realisation_par": None
-            },
-            "Nettoyer les plaques de cuisson": {"points_base": 2, "lieu": "Cuisine", "derniere_realisation": None, "points_actuels": 2, "attribuee_a": ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"], "derniere_realisation_par": None},
-            "Nettoyer le four": {"points_base": 3, "lieu": "Cuisine", "derniere_realisation": None, "points_actuels": 3, "attribuee_a": ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"], "derniere_realisation_par": None},
-            "Nettoyer le micro-ondes": {"points_base": 2, "lieu": "Cuisine", "derniere_realisation": None, "points_actuels": 2, "attribuee_a": ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"], "derniere_realisation_par": None},
-            "Nettoyer le frigo (intérieur)": {"points_base": 3, "lieu": "Cuisine", "derniere_realisation": None, "points_actuels": 3, "attribuee_a": ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"], "derniere_realisation_par": None},
-            "Nettoyer l'évier": {"points_base": 1, "lieu": "Cuisine", "derniere_realisation": None, "points_actuels": 1, "attribuee_a": ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"], "derniere_realisation_par": None},
-            "Vider le lave-vaisselle": {"points_base": 1, "lieu": "Cuisine", "derniere_realisation": None, "points_actuels": 1, "attribuee_a": ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"], "derniere_realisation_par": None},
-            "Sortir les poubelles": {"points_base": 1, "lieu": "Cuisine", "derniere_realisation": None, "points_actuels": 1, "attribuee_a": ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"], "derniere_realisation_par": None},
-            "Nettoyer la hotte": {"points_base": 2, "lieu": "Cuisine", "derniere_realisation": None, "points_actuels": 2, "attribuee_a": ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"], "derniere_realisation_par": None},
-            "Ranger les courses": {"points_base": 1, "lieu": "Cuisine", "derniere_realisation": None, "points_actuels": 1, "attribuee_a": ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"], "derniere_realisation_par": None},
-            
-            # Salon
-            "Passer l'aspirateur salon": {"points_base": 2, "lieu": "Salon", "derniere_realisation": None, "points_actuels": 2},
-            "Épousseter les meubles salon": {"points_base": 1, "lieu": "Salon", "derniere_realisation": None, "points_actuels": 1},
-            "Nettoyer la table basse": {"points_base": 1, "lieu": "Salon", "derniere_realisation": None, "points_actuels": 1},
-            "Ranger le salon": {"points_base": 1, "lieu": "Salon", "derniere_realisation": None, "points_actuels": 1},
-            "Nettoyer les vitres salon": {"points_base": 2, "lieu": "Salon", "derniere_realisation": None, "points_actuels": 2},
-            
-            # Salle de bain 1er étage
-            "Nettoyer les toilettes 1er": {"points_base": 2, "lieu": "SDB 1er", "derniere_realisation": None, "points_actuels": 2},
-            "Nettoyer la douche 1er": {"points_base": 3, "lieu": "SDB 1er", "derniere_realisation": None, "points_actuels": 3},
-            "Nettoyer le lavabo 1er": {"points_base": 1, "lieu": "SDB 1er", "derniere_realisation": None, "points_actuels": 1},
-            "Nettoyer le miroir 1er": {"points_base": 1, "lieu": "SDB 1er", "derniere_realisation": None, "points_actuels": 1},
-            "Passer la serpillière SDB 1er": {"points_base": 2, "lieu": "SDB 1er", "derniere_realisation": None, "points_actuels": 2},
-            
-            # Salle de bain 2ème étage
-            "Nettoyer les toilettes 2ème": {"points_base": 2, "lieu": "SDB 2ème", "derniere_realisation": None, "points_actuels": 2},
-            "Nettoyer la douche 2ème": {"points_base": 3, "lieu": "SDB 2ème", "derniere_realisation": None, "points_actuels": 3},
-            "Nettoyer le lavabo 2ème": {"points_base": 1, "lieu": "SDB 2ème", "derniere_realisation": None, "points_actuels": 1},
-            "Nettoyer le miroir 2ème": {"points_base": 1, "lieu": "SDB 2ème", "derniere_realisation": None, "points_actuels": 1},
-            "Passer la serpillière SDB 2ème": {"points_base": 2, "lieu": "SDB 2ème", "derniere_realisation": None, "points_actuels": 2},
-            
-            # Rez-de-chaussée
-            "Passer l'aspirateur escaliers": {"points_base": 2, "lieu": "RDC", "derniere_realisation": None, "points_actuels": 2},
-            "Épousseter hall d'entrée": {"points_base": 1, "lieu": "RDC", "derniere_realisation": None, "points_actuels": 1},
-            "Nettoyer les vitres RDC": {"points_base": 2, "lieu": "RDC", "derniere_realisation": None, "points_actuels": 2},
-            "Passer la serpillière RDC": {"points_base": 2, "lieu": "RDC", "derniere_realisation": None, "points_actuels": 2},
-            
-            # Garage
-            "Ranger le garage": {"points_base": 2, "lieu": "Garage", "derniere_realisation": None, "points_actuels": 2},
-            "Balayer le garage": {"points_base": 1, "lieu": "Garage", "derniere_realisation": None, "points_actuels": 1},
-            "Sortir les vélos": {"points_base": 1, "lieu": "Garage", "derniere_realisation": None, "points_actuels": 1},
-            "Organiser les outils": {"points_base": 1, "lieu": "Garage", "derniere_realisation": None, "points_actuels": 1},
-            
-            # Jardin
-            "Tondre la pelouse": {"points_base": 3, "lieu": "Jardin", "derniere_realisation": None, "points_actuels": 3},
-            "Arroser les plantes": {"points_base": 1, "lieu": "Jardin", "derniere_realisation": None, "points_actuels": 1},
-            "Désherber": {"points_base": 2, "lieu": "Jardin", "derniere_realisation": None, "points_actuels": 2},
-            "Tailler les haies": {"points_base": 3, "lieu": "Jardin", "derniere_realisation": None, "points_actuels": 3},
-            "Ramasser les feuilles": {"points_base": 2, "lieu": "Jardin", "derniere_realisation": None, "points_actuels": 2},
-            "Nettoyer la terrasse": {"points_base": 2, "lieu": "Jardin", "derniere_realisation": None, "points_actuels": 2},
-            
-            # Cour d'entrée
-            "Balayer la cour": {"points_base": 1, "lieu": "Cour", "derniere_realisation": None, "points_actuels": 1},
-            "Nettoyer les marches": {"points_base": 1, "lieu": "Cour", "derniere_realisation": None, "points_actuels": 1},
-            "Arroser les plantes cour": {"points_base": 1, "lieu": "Cour", "derniere_realisation": None, "points_actuels": 1},
-            
-            # Tâches générales
-            "Changer les draps communs": {"points_base": 2, "lieu": "Général", "derniere_realisation": None, "points_actuels": 2},
-            "Faire une lessive commune": {"points_base": 2, "lieu": "Général", "derniere_realisation": None, "points_actuels": 2},
-            "Repasser le linge commun": {"points_base": 2, "lieu": "Général", "derniere_realisation": None, "points_actuels": 2},
-            "Acheter produits ménagers": {"points_base": 1, "lieu": "Général", "derniere_realisation": None, "points_actuels": 1},
-            "Remplacer ampoules grillées": {"points_base": 1, "lieu": "Général", "derniere_realisation": None, "points_actuels": 1},
-            "Nettoyer radiateurs": {"points_base": 2, "lieu": "Général", "derniere_realisation": None, "points_actuels": 2},
-            "Dépoussiérer plinthes": {"points_base": 1, "lieu": "Général", "derniere_realisation": None, "points_actuels": 1},
-            "Nettoyer interrupteurs": {"points_base": 1, "lieu": "Général", "derniere_realisation": None, "points_actuels": 1}
-        }
-    }
+    """Retourne les données par défaut de l'application (catalogue choisi par le secret CATALOG)"""
+    return new_document()
 
+@profiled("page_accueil")
 def page_accueil():
     """Page d'accueil pour sélectionner le colocataire"""
     st.title("🏠 T'ES QUI ?")
+    tenant = current_tenant()
+    if tenant.id != DEFAULT_TENANT:
+        st.caption(f"Colocation : {tenant.id}")
     st.markdown("---")
     
-    col1, col2, col3, col4, col5 = st.columns(5)
-    
-    colocataires = ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"]
+    # Les colocataires viennent des données de la colocation (5 boutons par ligne)
+    data = load_data()
+    with get_shared_state().lock:
+        colocataires = list(data['colocataires'])
     
     for i, coloc in enumerate(colocataires):
-        col = [col1, col2, col3, col4, col5][i]
-        with col:
+        if i % 5 == 0:
+            cols = st.columns(5)
+        with cols[i % 5]:
             if st.button(coloc, key=f"btn_{coloc}", use_container_width=True):
                 st.session_state.current_user = coloc
                 st.session_state.page = "dashboard"
                 st.rerun()
 
+# Nombre de tâches affichées par page du dashboard
+TACHES_PAR_PAGE = 20
+
+def paginate(items, key, per_page=TACHES_PAR_PAGE):
+    """Éléments de la page courante (numéro de page gardé dans st.session_state[key])"""
+    pages = max(1, -(-len(items) // per_page))
+    page = min(max(st.session_state.get(key, 1), 1), pages)
+    st.session_state[key] = page
+    return items[(page - 1) * per_page:page * per_page], page, pages
+
+def render_pagination(key, page, pages, total):
+    """Boutons de navigation entre les pages"""
+    if pages <= 1:
+        return
+    col_prec, col_page, col_suiv = st.columns([1, 2, 1])
+    with col_prec:
+        if st.button("◀ Précédent", key=f"{key}_prec", disabled=page <= 1):
+            st.session_state[key] = page - 1
+            st.rerun()
+    with col_page:
+        st.caption(f"Page {page} / {pages} · {total} tâches")
+    with col_suiv:
+        if st.button("Suivant ▶", key=f"{key}_suiv", disabled=page >= pages):
+            st.session_state[key] = page + 1
+            st.rerun()
+
+@profiled("page_dashboard")
 def page_dashboard():
     """Dashboard principal avec les tâches ménagères"""
+    state = get_shared_state()
     data = load_data()
     
-    # Mettre à jour les points des tâches au chargement
-    data = update_task_points(data)
-    
     user = st.session_state.current_user
     
+    # Mettre à jour les points des tâches au chargement ; les autres sessions modifient le
+    # document sur place : il n'est lu que sous le verrou ou à travers des copies
+    with state.lock:
+        data = update_task_points(data)
+        points_user = data['colocataires'].get(user, {}).get('points', 0)
+        scores = [(nom, info['points']) for nom, info in data['colocataires'].items()]
+    
     st.title(f"🎮 Dashboard - {user}")
-    st.markdown(f"**Points actuels: {data['colocataires'][user]['points']}**")
+    st.markdown(f"**Points actuels: {points_user}**")
+    render_sync_status()
     
     # Podium preview en haut
-    scores = [(nom, info['points']) for nom, info in data['colocataires'].items()]
     scores.sort(key=lambda x: x[1], reverse=True)
     
     col_podium, col_buttons = st.columns([2, 1])
@@ -292,25 +351,65 @@ def page_dashboard():
     
     st.markdown("---")
     
-    # Grouper les tâches par lieu
-    taches_par_lieu = {}
-    for tache, info in data['taches'].items():
-        lieu = info['lieu']
-        if lieu not in taches_par_lieu:
-            taches_par_lieu[lieu] = []
-        taches_par_lieu[lieu].append((tache, info))
-    
-    # Afficher les tâches par lieu avec couleurs
-    for lieu, taches in taches_par_lieu.items():
+    # Les tâches sont regroupées par lieu grâce à l'index (tenu à jour à chaque modification)
+    task_index = get_task_index()
+    with state.lock:
+        task_index.sync(data)
+    
+    # Filtres : seules les tâches de la page courante sont construites
+    col_recherche, col_lieu = st.columns([2, 1])
+    with col_recherche:
+        recherche = st.text_input("🔍 Rechercher une tâche", key="filtre_recherche")
+    with col_lieu:
+        lieu_choisi = st.selectbox("Lieu", ["Tous les lieux"] + task_index.lieux(), key="filtre_lieu")
+    col_mes_taches, col_bonus = st.columns(2)
+    with col_mes_taches:
+        mes_taches = st.checkbox("Mes tâches uniquement", key="filtre_mes_taches")
+    with col_bonus:
+        bonus_uniquement = st.checkbox("⚡ Avec bonus uniquement", key="filtre_bonus")
+    filtre_user = user if mes_taches else None
+    
+    resultats = task_index.search(
+        recherche,
+        lieu=None if lieu_choisi == "Tous les lieux" else lieu_choisi,
+        user=filtre_user
+    )
+    if bonus_uniquement:
+        with state.lock:
+            taches = data['taches']
+            resultats = [
+                (lieu, tache) for lieu, tache in resultats
+                if tache in taches and taches[tache]['points_actuels'] > taches[tache].get('points_base', 1)
+            ]
+    
+    # Retour à la première page quand les filtres changent
+    filtres = (recherche, lieu_choisi, mes_taches, bonus_uniquement)
+    if st.session_state.get("filtres_dashboard") != filtres:
+        st.session_state.filtres_dashboard = filtres
+        st.session_state.page_taches = 1
+    page_resultats, page, pages = paginate(resultats, "page_taches")
+    # Copie des tâches de la page : une tâche supprimée entre-temps par une autre session disparaît
+    with state.lock:
+        infos = {tache: dict(data['taches'][tache]) for _, tache in page_resultats if tache in data['taches']}
+    
+    if not resultats:
+        st.info("Aucune tâche ne correspond aux filtres")
+    
+    # Afficher les tâches de la page par lieu avec couleurs
+    for lieu, groupe in groupby(page_resultats, key=lambda resultat: resultat[0]):
+        taches = [tache for _, tache in groupe]
         color_emoji = get_lieu_color(lieu)
         st.subheader(f"{color_emoji} {lieu}")
         cols = st.columns(2)
         
-        for i, (tache, info) in enumerate(taches):
+        for i, tache in enumerate(taches):
+            info = infos.get(tache)
+            if info is None:
+                continue
             col = cols[i % 2]
             with col:
                 # Vérifier si la tâche est disponible pour l'utilisateur
-                is_available = is_task_available_for_user(info, user)
+                is_available = task_index.is_available(tache, user)
                 
                 # Créer un container avec style conditionnel
                 if is_available:
@@ -371,13 +470,15 @@ def page_dashboard():
                             if st.button("✓", key=f"task_{tache}"):
                                 if st.session_state.get(f"confirm_{tache}"):
                                     # Confirmer la tâche
-                                    points_gagnes = complete_task(data, user, tache)
-                                    save_data(data)
+                                    with state.lock:
+                                        points_gagnes = complete_task(data, user, tache, key=st.session_state[f"confirm_{tache}"])
+                                        save_data(data)
                                     st.success(f"+{points_gagnes} points!")
                                     del st.session_state[f"confirm_{tache}"]
                                     st.rerun()
                                 else:
-                                    st.session_state[f"confirm_{tache}"] = True
+                                    # Clé d'idempotence de cette réalisation : un clic rejoué ne la compte pas deux fois
+                                    st.session_state[f"confirm_{tache}"] = uuid.uuid4().hex
                                     st.rerun()
                         else:
                             st.write("🚫")
@@ -388,8 +489,9 @@ def page_dashboard():
                         col_oui, col_non = st.columns(2)
                         with col_oui:
                             if st.button("Oui", key=f"oui_{tache}"):
-                                points_gagnes = complete_task(data, user, tache)
-                                save_data(data)
+                                with state.lock:
+                                    points_gagnes = complete_task(data, user, tache, key=st.session_state[f"confirm_{tache}"])
+                                    save_data(data)
                                 st.success(f"+{points_gagnes} points!")
                                 del st.session_state[f"confirm_{tache}"]
                                 st.rerun()
@@ -402,12 +504,16 @@ def page_dashboard():
                     st.markdown("</div>", unsafe_allow_html=True)
         
         st.markdown("---")
+    
+    render_pagination("page_taches", page, pages, len(resultats))
 
+@profiled("page_scores")
 def page_scores():
     """Page des scores/classement"""
     data = load_data()
     
     st.title("🏆 Tableau des Scores")
+    render_sync_status()
     
     if st.button("← Retour"):
         st.session_state.page = "dashboard"
@@ -416,7 +522,8 @@ def page_scores():
     st.markdown("---")
     
     # Trier les colocataires par points
-    scores = [(nom, info['points']) for nom, info in data['colocataires'].items()]
+    with get_shared_state().lock:
+        scores = [(nom, info['points']) for nom, info in data['colocataires'].items()]
     scores.sort(key=lambda x: x[1], reverse=True)
     
     st.subheader("🥇 Classement")
@@ -424,12 +531,199 @@ def page_scores():
     for i, (nom, points) in enumerate(scores, 1):
         emoji = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else "🏅"
         st.write(f"{emoji} **{i}. {nom}**: {points} points")
+    
+    # L'historique n'est conservé que par les moteurs journal d'événements et SQLite
+    realisations = get_storage().history(limit=20)
+    if realisations:
+        st.markdown("---")
+        st.subheader("📜 Dernières réalisations")
+        for event in realisations:
+            date = datetime.fromisoformat(event['ts'])
+            st.write(f"{date.strftime('%d/%m/%Y %H:%M')} - **{event['user']}** : {event['task']} (+{event['points']} pts)")
+
+LIEUX = ["Cuisine", "Salon", "SDB 1er", "SDB 2ème", "RDC", "Garage", "Jardin", "Cour", "Général"]
+
+def lieux_disponibles(data):
+    """Lieux proposés : lieux habituels puis ceux des tâches existantes"""
+    return list(dict.fromkeys(LIEUX + [info['lieu'] for info in data['taches'].values()]))
+
+def editor_key(nom):
+    """Clé du tableau d'édition ; elle change après un enregistrement ou une annulation"""
+    return f"editeur_{nom}_{st.session_state.get('editor_version', 0)}"
+
+def editor_snapshot(nom, build):
+    """Lignes affichées dans un tableau, figées pendant toute la session d'édition
+
+    Les modifications de st.data_editor sont repérées par la position des lignes : le
+    tableau doit rester identique d'un rerun à l'autre tant que l'édition n'est pas terminée.
+    """
+    cle = f"{editor_key(nom)}_lignes"
+    if cle not in st.session_state:
+        st.session_state[cle] = build()
+    return st.session_state[cle]
 
+def reset_editors():
+    """Termine la session d'édition : les tableaux repartent des données enregistrées"""
+    for cle in [cle for cle in st.session_state if str(cle).startswith("editeur_")]:
+        del st.session_state[cle]
+    st.session_state.editor_version = st.session_state.get('editor_version', 0) + 1
+
+def build_task_rows(data, colocataires):
+    """Tableau d'édition des tâches : une ligne par tâche, une case à cocher par colocataire
+
+    data est une copie du document (voir snapshot) : il est parcouru hors du verrou.
+    """
+    rows = []
+    for tache, info in data['taches'].items():
+        derniere = ""
+        if info.get('derniere_realisation'):
+            try:
+                date = datetime.fromisoformat(info['derniere_realisation']).strftime('%d/%m/%Y')
+                qui = info.get('derniere_realisation_par')
+                derniere = f"{qui} - {date}" if qui else date
+            except ValueError:
+                pass
+        row = {"Tâche": tache, "Lieu": info['lieu'], "Points": info.get('points_base', info.get('points', 1))}
+        attribuee_a = info.get('attribuee_a', [])
+        row.update({coloc: coloc in attribuee_a for coloc in colocataires})
+        row["Dernière réalisation"] = derniere
+        rows.append(row)
+    return pd.DataFrame(rows, columns=["Tâche", "Lieu", "Points", *colocataires, "Dernière réalisation"])
+
+def build_coloc_rows(data):
+    """Tableau d'édition des colocataires"""
+    rows = [{"Nom": nom, "Points": info['points']} for nom, info in data['colocataires'].items()]
+    return pd.DataFrame(rows, columns=["Nom", "Points"])
+
+def staged_changes(data, task_table, coloc_table, task_edits, coloc_edits):
+    """Traduit les modifications des tableaux en événements : (événements, résumé, erreurs)
+
+    data est une copie du document (voir snapshot) ; les événements sont appliqués au
+    document partagé, sous le verrou.
+    """
+    task_rows = task_table.to_dict("records")
+    coloc_rows = coloc_table.to_dict("records")
+    events = []
+    resume = []
+    erreurs = []
+    
+    # Colocataires : ajouts et suppressions (les renommages feraient perdre les points)
+    coloc_supprimes = {coloc_rows[i]["Nom"] for i in coloc_edits.get("deleted_rows", []) if i < len(coloc_rows)}
+    for i, changes in coloc_edits.get("edited_rows", {}).items():
+        if "Nom" in changes and int(i) < len(coloc_rows):
+            erreurs.append(f"Impossible de renommer {coloc_rows[int(i)]['Nom']} : supprimez-le puis ajoutez le nouveau nom")
+    coloc_ajoutes = []
+    for row in coloc_edits.get("added_rows", []):
+        nom = " ".join(str(row.get("Nom") or "").split())
+        if not nom:
+            continue
+        if (nom in data['colocataires'] and nom not in coloc_supprimes) or nom in coloc_ajoutes:
+            erreurs.append(f"Le colocataire {nom} existe déjà")
+            continue
+        coloc_ajoutes.append(nom)
+    if len(data['colocataires']) - len(coloc_supprimes & set(data['colocataires'])) + len(coloc_ajoutes) < 1:
+        erreurs.append("Impossible de supprimer le dernier colocataire!")
+    for nom in sorted(coloc_supprimes):
+        if nom in data['colocataires']:
+            events.append(make_event("coloc_deleted", name=nom))
+            resume.append(f"🗑️ Colocataire supprimé : **{nom}**")
+    for nom in coloc_ajoutes:
+        events.append(make_event("coloc_added", name=nom))
+        resume.append(f"➕ Colocataire ajouté : **{nom}**")
+    
+    # Tâches : les lignes sont repérées par leur position dans le tableau de départ
+    # Colocataires affichés quand le tableau a été construit
+    colocataires = [col for col in task_table.columns if col not in ("Tâche", "Lieu", "Points", "Dernière réalisation")]
+    supprimees = {task_rows[i]["Tâche"] for i in task_edits.get("deleted_rows", []) if i < len(task_rows)}
+    debut = len(events)
+    
+    # Nouvelle version de chaque ligne modifiée : position -> (ancien nom, nom, champs modifiés, fiche)
+    modifiees = {}
+    for i, changes in sorted(task_edits.get("edited_rows", {}).items(), key=lambda item: int(item[0])):
+        i = int(i)
+        if i >= len(task_rows) or task_rows[i]["Tâche"] in supprimees:
+            continue
+        ancien_nom = task_rows[i]["Tâche"]
+        if ancien_nom not in data['taches']:
+            erreurs.append(f"« {ancien_nom} » a été supprimée entre-temps")
+            continue
+        row = dict(task_rows[i], **changes)
+        nom = " ".join(str(row.get("Tâche") or "").split())
+        if not nom:
+            erreurs.append(f"Le nom de « {ancien_nom} » ne peut pas être vide")
+            continue
+        info = data['taches'][ancien_nom]
+        nouveau = {
+            'points_base': int(row.get("Points") or 1),
+            'lieu': row.get("Lieu") or info['lieu'],
+            'attribuee_a': [coloc for coloc in colocataires if row.get(coloc)]
+        }
+        # Colocataires non affichés dans le tableau (ajoutés entre-temps) : attribution conservée
+        nouveau['attribuee_a'] += [coloc for coloc in info.get('attribuee_a', []) if coloc not in colocataires]
+        nouveau['points_actuels'] = calculate_task_points({**info, **nouveau})
+        modifiees[i] = (ancien_nom, nom, nouveau, info)
+    
+    # Noms après enregistrement : un renommage peut reprendre le nom d'une tâche supprimée ou
+    # renommée dans le même lot (échange de deux noms)
+    noms_finals = [modifiees[i][1] if i in modifiees else row["Tâche"]
+                   for i, row in enumerate(task_rows) if row["Tâche"] not in supprimees]
+    renommages = []
+    for ancien_nom, nom, nouveau, info in modifiees.values():
+        if nom != ancien_nom:
+            if noms_finals.count(nom) > 1:
+                erreurs.append(f"La tâche « {nom} » existe déjà")
+                continue
+            renommages.append((ancien_nom, nom, {**info, **nouveau}))
+            resume.append(f"✏️ « {ancien_nom} » renommée en **{nom}**")
+        elif any(info.get(k) != v for k, v in nouveau.items() if k != 'points_actuels'):
+            events.append(make_event("task_updated", task=nom, changes=nouveau))
+            resume.append(f"✏️ Tâche modifiée : **{nom}** ({nouveau['lieu']}, {nouveau['points_base']} pts)")
+    
+    # Suppressions d'abord, puis les anciens noms des tâches renommées, puis les nouveaux noms :
+    # aucun événement ne retire un nom que le lot vient de (re)créer
+    suppressions = []
+    for nom in sorted(supprimees):
+        if nom in data['taches']:
+            suppressions.append(make_event("task_deleted", task=nom))
+            resume.append(f"🗑️ Tâche supprimée : **{nom}**")
+    suppressions += [make_event("task_deleted", task=ancien_nom) for ancien_nom, _, _ in renommages]
+    events[debut:debut] = suppressions + [make_event("task_added", task=nom, info=info) for _, nom, info in renommages]
+    
+    for row in task_edits.get("added_rows", []):
+        nom = " ".join(str(row.get("Tâche") or "").split())
+        if not nom:
+            continue
+        if nom in noms_finals:
+            erreurs.append(f"La tâche « {nom} » existe déjà")
+            continue
+        if not row.get("Lieu"):
+            erreurs.append(f"Choisissez un lieu pour « {nom} »")
+            continue
+        noms_finals.append(nom)
+        points = int(row.get("Points") or 1)
+        attribuee_a = [coloc for coloc in colocataires if row.get(coloc, True)]
+        events.append(make_event("task_added", task=nom, info={
+            "points_base": points,
+            "lieu": row["Lieu"],
+            "derniere_realisation": None,
+            "points_actuels": points,
+            "attribuee_a": attribuee_a,
+            "derniere_realisation_par": None
+        }))
+        resume.append(f"➕ Tâche ajoutée : **{nom}** ({row['Lieu']}, {points} pts)")
+    
+    return events, resume, erreurs
+
+@profiled("page_parametres")
 def page_parametres():
     """Page de paramètres pour gérer tâches et colocataires"""
-    data = load_data()
+    state = get_shared_state()
+    # Document partagé (modifié par les boutons de remise à zéro) et copie pour les tableaux
+    shared = load_data()
+    data = snapshot(shared)
     
     st.title("⚙️ Paramètres")
+    render_sync_status()
     
     if st.button("← Retour"):
         st.session_state.page = "dashboard"
@@ -437,192 +731,121 @@ def page_parametres():
     
     st.markdown("---")
     
+    colocataires = list(data['colocataires'])
+    
     # Onglets pour différentes sections
     tab1, tab2, tab3 = st.tabs(["Tâches", "Colocataires", "Reset"])
     
     with tab1:
         st.subheader("Gestion des Tâches")
+        st.caption("Modifiez directement le tableau : ajoutez une ligne en bas, cochez les colocataires, "
+                   "supprimez des lignes. Rien n'est enregistré avant de valider les modifications en bas de page.")
         
-        # Ajouter une tâche
-        st.write("**Ajouter une nouvelle tâche:**")
-        col1, col2, col3 = st.columns([2, 1, 1])
-        with col1:
-            new_task = st.text_input("Nom de la tâche")
-        with col2:
-            new_points = st.number_input("Points", min_value=1, max_value=3, value=1)
-        with col3:
-            new_lieu = st.selectbox("Lieu", ["Cuisine", "Salon", "SDB 1er", "SDB 2ème", "RDC", "Garage", "Jardin", "Cour", "Général"])
-        
-        if st.button("Ajouter tâche") and new_task:
-            data['taches'][new_task] = {
-                "points_base": new_points,
-                "lieu": new_lieu,
-                "derniere_realisation": None,
-                "points_actuels": new_points,
-                "attribuee_a": ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"],
-                "derniere_realisation_par": None
+        task_table = editor_snapshot("taches", lambda: build_task_rows(data, colocataires))
+        st.data_editor(
+            task_table,
+            key=editor_key("taches"),
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config={
+                "Tâche": st.column_config.TextColumn("Tâche", required=True),
+                "Lieu": st.column_config.SelectboxColumn("Lieu", options=lieux_disponibles(data), required=True),
+                "Points": st.column_config.NumberColumn("Points", min_value=1, max_value=3, step=1, default=1),
+                "Dernière réalisation": st.column_config.TextColumn("Dernière réalisation", disabled=True),
+                **{coloc: st.column_config.CheckboxColumn(coloc, default=True)
+                   for coloc in task_table.columns if coloc in data['colocataires']}
             }
-            save_data(data)
-            st.success("Tâche ajoutée!")
-            st.rerun()
-        
-        st.markdown("---")
-        
-        # Modifier/supprimer tâches existantes
-        st.write("**Modifier/Supprimer des tâches:**")
-        
-        # Interface de modification
-        if 'editing_task' not in st.session_state:
-            st.session_state.editing_task = None
-        
-        for tache, info in data['taches'].items():
-            # Affichage normal ou mode édition
-            if st.session_state.editing_task == tache:
-                # Mode édition
-                st.write(f"**Édition: {tache}**")
-                
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    new_points_base = st.number_input("Points de base", 
-                                                     min_value=1, max_value=3, 
-                                                     value=info.get('points_base', info.get('points', 1)),
-                                                     key=f"edit_points_{tache}")
-                with col2:
-                    new_lieu = st.selectbox("Lieu", 
-                                          ["Cuisine", "Salon", "SDB 1er", "SDB 2ème", "RDC", "Garage", "Jardin", "Cour", "Général"],
-                                          index=["Cuisine", "Salon", "SDB 1er", "SDB 2ème", "RDC", "Garage", "Jardin", "Cour", "Général"].index(info['lieu']) if info['lieu'] in ["Cuisine", "Salon", "SDB 1er", "SDB 2ème", "RDC", "Garage", "Jardin", "Cour", "Général"] else 0,
-                                          key=f"edit_lieu_{tache}")
-                with col3:
-                    st.write("**Attribuée à:**")
-                    colocataires_actuels = info.get('attribuee_a', [])
-                    new_attribution = {}
-                    for coloc in ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"]:
-                        new_attribution[coloc] = st.checkbox(coloc, 
-                                                            value=coloc in colocataires_actuels,
-                                                            key=f"edit_attr_{tache}_{coloc}")
-                
-                # Boutons d'action
-                col_save, col_cancel = st.columns(2)
-                with col_save:
-                    if st.button("💾 Sauvegarder", key=f"save_{tache}"):
-                        # Mettre à jour la tâche
-                        data['taches'][tache]['points_base'] = new_points_base
-                        data['taches'][tache]['lieu'] = new_lieu
-                        data['taches'][tache]['attribuee_a'] = [coloc for coloc, selected in new_attribution.items() if selected]
-                        
-                        # Recalculer les points actuels
-                        data['taches'][tache]['points_actuels'] = calculate_task_points(data['taches'][tache])
-                        
-                        save_data(data)
-                        st.session_state.editing_task = None
-                        st.success("Tâche modifiée!")
-                        st.rerun()
-                
-                with col_cancel:
-                    if st.button("❌ Annuler", key=f"cancel_{tache}"):
-                        st.session_state.editing_task = None
-                        st.rerun()
-                        
-                st.markdown("---")
-            
-            else:
-                # Affichage normal
-                col1, col2, col3, col4, col5 = st.columns([2, 1, 1, 1, 1])
-                with col1:
-                    color_emoji = get_lieu_color(info['lieu'])
-                    st.write(f"{color_emoji} **{tache}**")
-                    
-                    # Afficher qui peut faire cette tâche
-                    attribuee_a = info.get('attribuee_a', [])
-                    if len(attribuee_a) < 5:
-                        st.caption(f"👥 {', '.join(attribuee_a)}")
-                    
-                    # Afficher la date de dernière réalisation si elle existe
-                    if info.get('derniere_realisation') and info.get('derniere_realisation_par'):
-                        try:
-                            date = datetime.fromisoformat(info['derniere_realisation'])
-                            qui = info['derniere_realisation_par']
-                            st.caption(f"👤 {qui} - {date.strftime('%d/%m/%Y')}")
-                        except:
-                            pass
-                    elif info.get('derniere_realisation'):
-                        try:
-                            date = datetime.fromisoformat(info['derniere_realisation'])
-                            st.caption(f"Dernière: {date.strftime('%d/%m/%Y')}")
-                        except:
-                            pass
-                
-                with col2:
-                    points_base = info.get('points_base', info.get('points', 1))
-                    points_actuels = info.get('points_actuels', points_base)
-                    
-                    if points_actuels > points_base:
-                        st.write(f"**{points_actuels} pts** ⚡")
-                        st.caption(f"(base: {points_base})")
-                    else:
-                        st.write(f"**{points_base} pts**")
-                
-                with col3:
-                    st.write(info['lieu'])
-                
-                with col4:
-                    if st.button("✏️", key=f"edit_{tache}", help="Modifier"):
-                        st.session_state.editing_task = tache
-                        st.rerun()
-                
-                with col5:
-                    if st.button("🗑️", key=f"del_{tache}", help="Supprimer"):
-                        del data['taches'][tache]
-                        save_data(data)
-                        st.rerun()
+        )
     
     with tab2:
         st.subheader("Gestion des Colocataires")
+        st.caption("Ajoutez ou supprimez des lignes ; les points ne se modifient pas ici.")
         
-        # Ajouter un colocataire
-        st.write("**Ajouter un nouveau colocataire:**")
-        new_coloc = st.text_input("Nom du colocataire")
-        if st.button("Ajouter colocataire") and new_coloc:
-            data['colocataires'][new_coloc] = {"points": 0}
-            save_data(data)
-            st.success("Colocataire ajouté!")
-            st.rerun()
-        
-        st.markdown("---")
-        
-        # Liste des colocataires
-        st.write("**Colocataires actuels:**")
-        for nom, info in data['colocataires'].items():
-            col1, col2, col3 = st.columns([2, 1, 1])
-            with col1:
-                st.write(nom)
-            with col2:
-                st.write(f"{info['points']} pts")
-            with col3:
-                if st.button("🗑️", key=f"del_coloc_{nom}"):
-                    if len(data['colocataires']) > 1:
-                        del data['colocataires'][nom]
-                        save_data(data)
-                        st.rerun()
-                    else:
-                        st.error("Impossible de supprimer le dernier colocataire!")
+        coloc_table = editor_snapshot("colocataires", lambda: build_coloc_rows(data))
+        st.data_editor(
+            coloc_table,
+            key=editor_key("colocataires"),
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config={
+                "Nom": st.column_config.TextColumn("Nom", required=True),
+                "Points": st.column_config.NumberColumn("Points", disabled=True)
+            }
+        )
     
     with tab3:
         st.subheader("Remise à zéro")
         st.write("**Attention: Ces actions sont irréversibles!**")
         
         if st.button("🔄 Remettre tous les scores à zéro"):
-            for nom in data['colocataires']:
-                data['colocataires'][nom]['points'] = 0
-            save_data(data)
+            with state.lock:
+                record_event(shared, "scores_reset")
+                save_data(shared)
             st.success("Scores remis à zéro!")
             st.rerun()
         
+        catalogues = available_catalogs()
+        catalogue = get_catalog_name()
+        if len(catalogues) > 1:
+            catalogue = st.selectbox(
+                "Catalogue de tâches",
+                catalogues,
+                index=catalogues.index(catalogue) if catalogue in catalogues else 0
+            )
+        
         if st.button("🔄 Réinitialiser toute l'application"):
-            data = get_default_data()
-            save_data(data)
+            with state.lock:
+                record_event(shared, "app_reset", data=new_document(catalogue))
+                save_data(shared)
             st.success("Application réinitialisée!")
             st.rerun()
+    
+    # Toutes les modifications des tableaux sont enregistrées en une seule fois
+    events, resume, erreurs = staged_changes(
+        data, task_table, coloc_table,
+        st.session_state.get(editor_key("taches"), {}),
+        st.session_state.get(editor_key("colocataires"), {})
+    )
+    
+    st.markdown("---")
+    st.subheader("📝 Modifications en attente")
+    for erreur in erreurs:
+        st.error(erreur)
+    if not resume:
+        st.caption("Aucune modification en attente")
+        return
+    
+    for ligne in resume:
+        st.write(ligne)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button(f"💾 Enregistrer {len(resume)} modification(s)", type="primary", disabled=bool(erreurs)):
+            with state.lock:
+                record_event(shared, "batch", events=events)
+                save_data(shared)
+            reset_editors()
+            st.success("Modifications enregistrées!")
+            st.rerun()
+    with col2:
+        if st.button("↩️ Annuler les modifications"):
+            reset_editors()
+            st.rerun()
+
+def render_profiling_panel():
+    """Panneau de profilage (secret PROFILING = true) : durées par étape et trafic réseau"""
+    summary = PROFILER.summary()
+    with st.expander(f"🔧 Profilage ({summary['reruns']} reruns)"):
+        if summary["per_rerun"]:
+            st.write("**Moyenne par rerun:** " + ", ".join(f"{nom}: {valeur}" for nom, valeur in summary["per_rerun"].items()))
+        st.table(summary["stages"])
+        client = get_github_client().counters()
+        if client["calls"]:
+            quota = f"{client['remaining']}/{client['limit']}" if client["remaining"] is not None else "inconnu"
+            st.caption(f"GitHub : {client['calls']} appels, {client['retries']} nouveaux essais, "
+                       f"{client['throttled']} ralentis, {client['rate_limited']} reportés (quota), quota restant {quota}")
+        if PROFILER.export_path:
+            st.caption(f"Export JSON lines : {PROFILER.export_path}")
 
 def main():
     # Initialisation des variables de session
@@ -631,15 +854,48 @@ def main():
     if 'page' not in st.session_state:
         st.session_state.page = "accueil"
     
-    # Navigation entre les pages
-    if st.session_state.page == "accueil" or st.session_state.current_user is None:
-        page_accueil()
-    elif st.session_state.page == "dashboard":
-        page_dashboard()
-    elif st.session_state.page == "scores":
-        page_scores()
-    elif st.session_state.page == "parametres":
-        page_parametres()
+    # Profilage optionnel : sans le secret PROFILING, aucune mesure n'est prise.
+    # Configuré avant le premier chargement pour mesurer aussi le démarrage à froid.
+    PROFILER.configure(bool(st.secrets.get("PROFILING", False)), st.secrets.get("PROFILING_EXPORT", None))
+    PROFILER.begin_rerun(st.session_state.page)
+    
+    try:
+        # Colocation choisie par l'URL (?maison=...), résolue une seule fois par rerun : une
+        # éviction concurrente ne peut pas répartir la page entre deux objets Tenant
+        try:
+            tenant = current_tenant()
+        except UnknownTenant as e:
+            st.error(f"❌ {e}")
+            st.stop()
+        with use_tenant(tenant):
+            if st.session_state.get('tenant') != tenant.id:
+                # Changement de colocation : retour à l'accueil
+                st.session_state.tenant = tenant.id
+                st.session_state.current_user = None
+                st.session_state.page = "accueil"
+            elif (st.session_state.current_user is not None
+                  and st.session_state.current_user not in load_data()['colocataires']):
+                # Colocataire supprimé entre-temps
+                st.session_state.current_user = None
+                st.session_state.page = "accueil"
+            
+            # Navigation entre les pages
+            if st.session_state.page == "accueil" or st.session_state.current_user is None:
+                page_accueil()
+            elif st.session_state.page == "dashboard":
+                page_dashboard()
+            elif st.session_state.page == "scores":
+                page_scores()
+            elif st.session_state.page == "parametres":
+                page_parametres()
+    except (TenantClosed, StorageClosed):
+        # Colocation évincée du cache pendant la page : la visite suivante la recharge
+        st.warning("🔄 La colocation vient d'être rechargée : recommencez la dernière action")
+    finally:
+        PROFILER.end_rerun()
+    
+    if PROFILER.enabled:
+        render_profiling_panel()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
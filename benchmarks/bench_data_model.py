@@ -0,0 +1,318 @@
+"""Benchmarks des chemins critiques du modèle de données sur des colocations synthétiques
+
+Usage :
+    python benchmarks/bench_data_model.py                  # grille par défaut
+    python benchmarks/bench_data_model.py --tasks 10 1000 --roommates 5 50
+    python benchmarks/bench_data_model.py --save-baseline  # enregistre la référence
+    python benchmarks/bench_data_model.py --compare        # signale les régressions
+
+Chaque étape est chronométrée (médiane sur plusieurs répétitions), puis rejouée une
+fois sous tracemalloc pour mesurer le pic mémoire. Les résultats peuvent être comparés
+à une référence enregistrée dans benchmarks/baseline.json.
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(REPO_DIR, "benchmarks", "baseline.json")
+
+LIEUX = ["Cuisine", "Salon", "SDB 1er", "SDB 2ème", "RDC", "Garage", "Jardin", "Cour", "Général"]
+
+# Grille par défaut : (nombre de tâches, nombre de colocataires)
+DEFAULT_GRID = [(10, 5), (100, 5), (1000, 50), (10000, 500)]
+
+def generate_household(n_tasks, n_roommates, history_days=365, seed=0):
+    """Génère une colocation synthétique avec un historique de réalisations"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    colocataires = [f"Coloc {i}" for i in range(n_roommates)]
+    data = {
+        "colocataires": {nom: {"points": rng.randint(0, 500)} for nom in colocataires},
+        "taches": {}
+    }
+    for i in range(n_tasks):
+        points_base = rng.randint(1, 3)
+        jamais_faite = rng.random() < 0.2
+        data['taches'][f"Tâche {i}"] = {
+            "points_base": points_base,
+            "lieu": rng.choice(LIEUX),
+            "derniere_realisation": None if jamais_faite else (now - timedelta(days=rng.uniform(0, history_days))).isoformat(),
+            "points_actuels": points_base,
+            "attribuee_a": rng.sample(colocataires, rng.randint(1, min(5, n_roommates))),
+            "derniere_realisation_par": None if jamais_faite else rng.choice(colocataires)
+        }
+    return data
+
+def prepare_workdir():
+    """Répertoire de travail isolé, configuré pour le moteur de stockage JSON"""
+    workdir = tempfile.mkdtemp(prefix="taskgame-bench-")
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), 'w', encoding='utf-8') as f:
+        f.write('STORAGE_BACKEND = "json"\n')
+    os.chdir(workdir)
+    return workdir
+
+def import_app():
+    """Importe app.py hors de Streamlit (les avertissements du mode « bare » sont ignorés)"""
+    sys.path.insert(0, REPO_DIR)
+    warnings.filterwarnings("ignore")
+    import logging
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    import app
+    return app
+
+def measure(stage, setup, repeat):
+    """Chronomètre stage(setup()) : médiane des durées puis pic mémoire sur une exécution"""
+    durations = []
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        stage(arg)
+        durations.append(time.perf_counter() - start)
+
+    arg = setup()
+    tracemalloc.start()
+    stage(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(durations), peak
+
+def run_size(app, n_tasks, n_roommates, repeat, history):
+    """Mesure toutes les étapes pour une taille de colocation"""
+    from event_log import EventLog, make_event
+    from points_engine import PointsEngine
+    from task_index import TaskIndex
+    from storage import JsonFileStorage, SQLiteStorage
+    import wire_format
+
+    household = generate_household(n_tasks, n_roommates)
+    serialized = json.dumps(household, indent=2, ensure_ascii=False)
+    compact = wire_format.dumps(household)
+    compressed = wire_format.dumps(household, compress=True)
+    user = next(iter(household['colocataires']))
+    task_names = list(household['taches'])
+    results = {}
+
+    def record(name, items, stage, setup):
+        seconds, peak = measure(stage, setup, repeat)
+        results[name] = {
+            "seconds": seconds,
+            "items_per_second": items / seconds if seconds > 0 else None,
+            "peak_bytes": peak
+        }
+
+    # load_data : lecture du fichier, migration, publication dans l'état partagé
+    def setup_load():
+        JsonFileStorage().save(household)
+        app.get_shared_state().invalidate()
+    record("load_data", n_tasks, lambda _: app.load_data(), setup_load)
+
+    # Migration complète d'un ancien document, puis chemin rapide d'un document à jour
+    record("migrate_task_data", n_tasks, app.migrate_task_data, lambda: copy.deepcopy(household))
+    record("migrate_task_data_current", n_tasks, app.migrate_task_data,
+           lambda: app.migrate_task_data(copy.deepcopy(household)))
+
+    # update_task_points : premier calcul (nouveau document) puis rerun sans changement
+    record("update_task_points_cold", n_tasks, lambda e: e[0].refresh(e[1]),
+           lambda: (PointsEngine(), copy.deepcopy(household)))
+
+    def setup_warm():
+        engine, data = PointsEngine(), copy.deepcopy(household)
+        engine.refresh(data)
+        return engine, data
+    record("update_task_points_warm", n_tasks, lambda e: e[0].refresh(e[1]), setup_warm)
+
+    # complete_task : une rafale de 100 réalisations sur le document partagé
+    burst = task_names[:100]
+    def setup_complete():
+        data = copy.deepcopy(household)
+        app.get_shared_state().replace(data, None)
+        return data
+    def complete_burst(data):
+        for tache in burst:
+            app.complete_task(data, user, tache)
+    record("complete_task", len(burst), complete_burst, setup_complete)
+
+    # Sérialisation effectuée par save_data (copie locale et Gist) : JSON indenté d'origine,
+    # format compact, format compact compressé
+    record("save_serialization", n_tasks,
+           lambda data: json.dumps(data, indent=2, ensure_ascii=False), lambda: household)
+    record("save_serialization_compact", n_tasks, wire_format.dumps, lambda: household)
+    record("save_serialization_gzip", n_tasks,
+           lambda data: wire_format.dumps(data, compress=True), lambda: household)
+    record("parse_document", n_tasks, json.loads, lambda: serialized)
+    record("parse_document_compact", n_tasks, wire_format.loads, lambda: compact)
+    record("parse_document_gzip", n_tasks, wire_format.loads, lambda: compressed)
+
+    # Copie locale : une rafale de 20 sauvegardes, fichier remplacé à chaque fois (fsync et
+    # renommage) ou ajoutées au journal (un fsync par fenêtre de validation)
+    def setup_local(journal):
+        return lambda: JsonFileStorage(f"bench-{time.perf_counter_ns()}.json", journal=journal)
+    def local_burst(storage):
+        for _ in range(20):
+            storage.save(household)
+        if storage.journal is not None:
+            storage.journal.flush()
+    record("local_save_atomic", 20, local_burst, setup_local(False))
+    record("local_save_journal", 20, local_burst, setup_local(True))
+
+    # Regroupement du dashboard : construction de l'index puis parcours d'une page
+    record("dashboard_index_build", n_tasks, lambda e: e[0].rebuild(e[1]),
+           lambda: (TaskIndex(), household))
+
+    def setup_grouping():
+        index = TaskIndex()
+        index.rebuild(household)
+        return index
+    def dashboard_grouping(index):
+        for lieu in index.lieux():
+            for tache in index.tasks_in(lieu):
+                index.is_available(tache, user)
+    record("dashboard_grouping", n_tasks, dashboard_grouping, setup_grouping)
+
+    # Recherche du dashboard : filtrage puis construction de la première page seulement
+    def dashboard_search(index):
+        for lieu, tache in index.search("tache 1", user=user)[:app.TACHES_PAR_PAGE]:
+            index.is_available(tache, user)
+    record("dashboard_search", n_tasks, dashboard_search, setup_grouping)
+
+    # Historique long : réalisations enregistrées dans SQLite puis rejeu du journal d'événements
+    rng = random.Random(1)
+    completions = [
+        make_event("completion", user=rng.choice(list(household['colocataires'])),
+                   task=rng.choice(task_names), points=rng.randint(1, 6))
+        for _ in range(history)
+    ]
+
+    def setup_sqlite():
+        path = f"bench-{time.perf_counter_ns()}.db"
+        storage = SQLiteStorage(lambda: copy.deepcopy(household), path=path)
+        with storage.conn:
+            storage.conn.executemany(
+                "INSERT INTO realisations (tache, colocataire, points, date) VALUES (?, ?, ?, ?)",
+                [(e["task"], e["user"], e["points"], e["ts"]) for e in completions]
+            )
+        return storage, storage.load()
+    def sqlite_burst(args):
+        storage, data = args
+        for event in completions[:100]:
+            storage.record(data, event)
+        storage.history(limit=20)
+    record("sqlite_complete_task", min(100, history), sqlite_burst, setup_sqlite)
+
+    def setup_replay():
+        log_file = f"bench-{time.perf_counter_ns()}.jsonl"
+        with open(log_file, 'w', encoding='utf-8') as f:
+            for seq, event in enumerate(completions, 1):
+                f.write(json.dumps(dict(event, seq=seq), ensure_ascii=False) + "\n")
+        return EventLog(log_file=log_file, snapshot_file=f"{log_file}.snapshot")
+    record("event_log_replay", history, lambda log: log.load(lambda: copy.deepcopy(household)), setup_replay)
+
+    return {
+        "size_bytes": len(serialized.encode('utf-8')),
+        "compact_size_bytes": len(compact.encode('utf-8')),
+        "gzip_size_bytes": len(compressed),
+        "stages": results
+    }
+
+def compare(results, baseline, threshold):
+    """Liste les étapes plus lentes que la référence de plus de threshold (en fraction)"""
+    regressions = []
+    for size, report in results.items():
+        base_report = baseline.get(size)
+        if base_report is None:
+            continue
+        for stage, mesure in report["stages"].items():
+            base = base_report["stages"].get(stage)
+            if base is None or not base["seconds"]:
+                continue
+            ratio = mesure["seconds"] / base["seconds"]
+            if ratio > 1 + threshold:
+                regressions.append((size, stage, base["seconds"], mesure["seconds"], ratio))
+    return regressions
+
+def print_report(results):
+    for size, report in results.items():
+        print(f"\n== {size} ({report['size_bytes'] / 1024:.0f} Ko sérialisé, "
+              f"{report.get('compact_size_bytes', 0) / 1024:.0f} Ko compact, "
+              f"{report.get('gzip_size_bytes', 0) / 1024:.0f} Ko compressé)")
+        print(f"{'étape':<26}{'durée (ms)':>12}{'éléments/s':>14}{'pic mémoire':>14}")
+        for stage, mesure in report["stages"].items():
+            debit = mesure["items_per_second"]
+            print(f"{stage:<26}{mesure['seconds'] * 1000:>12.3f}"
+                  f"{(f'{debit:,.0f}' if debit else '-'):>14}"
+                  f"{mesure['peak_bytes'] / 1024:>11.0f} Ko")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, nargs="+", help="nombres de tâches à mesurer")
+    parser.add_argument("--roommates", type=int, nargs="+", help="nombres de colocataires (associés aux --tasks)")
+    parser.add_argument("--history", type=int, default=5000, help="nombre de réalisations dans l'historique")
+    parser.add_argument("--repeat", type=int, default=5, help="répétitions par étape (médiane)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="fichier de référence")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre les résultats comme référence")
+    parser.add_argument("--compare", action="store_true", help="compare à la référence (code de sortie 1 si régression)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="ralentissement toléré avant de signaler une régression")
+    parser.add_argument("--json", help="écrit les résultats bruts dans ce fichier")
+    args = parser.parse_args(argv)
+
+    if args.tasks:
+        roommates = args.roommates or [5]
+        grid = [(n, roommates[min(i, len(roommates) - 1)]) for i, n in enumerate(args.tasks)]
+    else:
+        grid = DEFAULT_GRID
+
+    cwd = os.getcwd()
+    workdir = prepare_workdir()
+    try:
+        app = import_app()
+        results = {}
+        for n_tasks, n_roommates in grid:
+            results[f"{n_tasks}t-{n_roommates}c"] = run_size(app, n_tasks, n_roommates, args.repeat, args.history)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    status = 0
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"\nAucune référence dans {args.baseline} (lancez avec --save-baseline)")
+        else:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = compare(results, baseline, args.threshold)
+            if regressions:
+                status = 1
+                print("\nRégressions :")
+                for size, stage, before, after, ratio in regressions:
+                    print(f"  {size} {stage}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms (x{ratio:.2f})")
+            else:
+                print("\nAucune régression par rapport à la référence")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nRéférence enregistrée dans {args.baseline}")
+
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
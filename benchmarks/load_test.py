@@ -0,0 +1,211 @@
+"""Test de charge multi-sessions des vraies pages Streamlit
+
+Plusieurs sessions simulées (streamlit.testing AppTest) tournent en parallèle dans le
+même processus, comme sur un serveur partagé : accueil -> dashboard -> réalisation de
+tâches (✓ puis Oui) -> scores. Le Gist est remplacé par tools/fake_gist_server.py, le
+test ne fait donc aucun appel réseau externe.
+
+AppTest ne supporte pas deux reruns simultanés dans un même processus : les reruns des
+sessions sont entrelacés dans un ordre aléatoire (un à la fois), tandis que le thread de
+synchronisation et le faux Gist tournent réellement en parallèle. La latence mesurée
+exclut l'attente de ce verrou.
+
+Usage :
+    python benchmarks/load_test.py --sessions 10 --completions 5 --latency 0.2
+
+Rapport : percentiles de latence des reruns par action, mises à jour perdues (points
+attendus contre points dans l'état partagé et dans le Gist) et appels réseau par action.
+Code de sortie 1 si des mises à jour ont été perdues.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+
+from fake_gist_server import FakeGistServer
+
+COLOCATAIRES = ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"]
+GIST_ID = "load-test"
+
+# Un seul rerun AppTest à la fois (voir plus haut)
+APPTEST_LOCK = threading.Lock()
+
+def initial_document():
+    """Catalogue par défaut où chaque réalisation rapporte exactement 1 point"""
+    with open(os.path.join(REPO_DIR, "catalogs", "default.json"), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for info in data['taches'].values():
+        info.update(points_base=1, points_actuels=1, derniere_realisation=None,
+                    derniere_realisation_par=None, attribuee_a=list(COLOCATAIRES))
+    for nom in data['colocataires']:
+        data['colocataires'][nom]['points'] = 0
+    return data
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+class Session:
+    """Une session simulée : un colocataire qui enchaîne les pages"""
+
+    def __init__(self, index, secrets, completions, seed, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.user = COLOCATAIRES[index % len(COLOCATAIRES)]
+        self.completions = completions
+        self.random = random.Random(seed)
+        self.app = AppTest.from_file(os.path.join(REPO_DIR, "app.py"), default_timeout=timeout)
+        for key, value in secrets.items():
+            self.app.secrets[key] = value
+        self.latencies = {}
+        self.completed = 0
+        self.errors = []
+
+    def _timed(self, action, step):
+        with APPTEST_LOCK:
+            start = time.perf_counter()
+            step()
+            self.latencies.setdefault(action, []).append(time.perf_counter() - start)
+        # Laisser les autres sessions s'intercaler entre deux actions
+        time.sleep(self.random.uniform(0, 0.01))
+        if self.app.exception:
+            raise RuntimeError(f"{action}: {self.app.exception[0].message}")
+
+    def _button(self, label=None, key=None):
+        for button in self.app.button:
+            if (key is not None and button.key == key) or (label is not None and button.label == label):
+                return button
+        raise LookupError(key or label)
+
+    def run(self, barrier):
+        try:
+            self._timed("accueil", self.app.run)
+            barrier.wait()
+            self._timed("dashboard", lambda: self._button(key=f"btn_{self.user}").click().run())
+
+            for _ in range(self.completions):
+                taches = [b.key[len("task_"):] for b in self.app.button if b.key and b.key.startswith("task_")]
+                tache = self.random.choice(taches)
+                self._timed("confirmer", lambda: self._button(key=f"task_{tache}").click().run())
+                self._timed("valider", lambda: self._button(key=f"oui_{tache}").click().run())
+                self.completed += 1
+
+            self._timed("scores", lambda: self._button(label="🏆 Scores complets").click().run())
+        except Exception as e:
+            self.errors.append(str(e))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge multi-sessions de TaskGame")
+    parser.add_argument("--sessions", type=int, default=10, help="sessions simultanées")
+    parser.add_argument("--completions", type=int, default=5, help="tâches validées par session")
+    parser.add_argument("--latency", type=float, default=0.05, help="latence du faux Gist (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="proportion d'erreurs 502 du faux Gist")
+    parser.add_argument("--backend", default="gist", help="moteur de stockage (STORAGE_BACKEND)")
+    parser.add_argument("--timeout", type=float, default=60, help="délai maximal d'un rerun (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore")
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    server = FakeGistServer(latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+    server.create_gist({"colocation_data.json": json.dumps(initial_document(), ensure_ascii=False)},
+                       gist_id=GIST_ID)
+    base_url = server.start()
+
+    secrets = {
+        "GITHUB_TOKEN": "load-test",
+        "GIST_ID": GIST_ID,
+        "GITHUB_API_URL": base_url,
+        "STORAGE_BACKEND": args.backend,
+        "GIST_SYNC_WINDOW": 0.2
+    }
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="taskgame-load-")
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), 'w', encoding='utf-8') as f:
+        for key, value in secrets.items():
+            f.write(f"{key} = {json.dumps(value)}\n")
+    os.chdir(workdir)
+
+    try:
+        import streamlit as st
+        st.cache_resource.clear()
+
+        sessions = [Session(i, secrets, args.completions, args.seed + i, args.timeout) for i in range(args.sessions)]
+        barrier = threading.Barrier(len(sessions))
+        threads = [threading.Thread(target=s.run, args=(barrier,)) for s in sessions]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        # Attendre l'envoi des dernières modifications vers le Gist
+        from tenants import get_sync_worker, get_shared_state
+        from gist_manager import assemble_files
+        from github_client import get_github_client
+        synced = get_sync_worker().flush(timeout=30)
+        client = get_github_client().counters()
+        state = get_shared_state().data
+        gist = assemble_files(server.current_files(GIST_ID))
+    finally:
+        os.chdir(cwd)
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    expected = {}
+    for session in sessions:
+        expected[session.user] = expected.get(session.user, 0) + session.completed
+    actions = sum(len(v) for s in sessions for v in s.latencies.values())
+
+    print(f"{args.sessions} sessions, {sum(s.completed for s in sessions)} tâches validées en {elapsed:.1f}s")
+    print(f"\n{'action':<12}{'n':>6}{'p50 (ms)':>12}{'p95 (ms)':>12}{'p99 (ms)':>12}{'max (ms)':>12}")
+    latencies = {}
+    for session in sessions:
+        for action, values in session.latencies.items():
+            latencies.setdefault(action, []).extend(values)
+    for action in ["accueil", "dashboard", "confirmer", "valider", "scores"]:
+        values = latencies.get(action)
+        if values:
+            print(f"{action:<12}{len(values):>6}{percentile(values, 0.5) * 1000:>12.1f}"
+                  f"{percentile(values, 0.95) * 1000:>12.1f}{percentile(values, 0.99) * 1000:>12.1f}"
+                  f"{max(values) * 1000:>12.1f}")
+
+    lost_state = sum(max(0, pts - (state or {}).get('colocataires', {}).get(u, {}).get('points', 0)) for u, pts in expected.items())
+    # Avec le moteur "json", le Gist n'est pas utilisé
+    lost_gist = 0 if args.backend == "json" else \
+        sum(max(0, pts - gist['colocataires'].get(u, {}).get('points', 0)) for u, pts in expected.items())
+    print(f"\nPoints attendus : {expected}")
+    print(f"Mises à jour perdues : {lost_state} dans l'état partagé, {lost_gist} dans le Gist"
+          f"{'' if synced else ' (synchronisation non terminée)'}")
+    print(f"Appels au Gist : {server.stats['requests']} ({server.stats['requests'] / max(1, actions):.2f} par action, "
+          f"{server.stats['not_modified']} réponses 304, {server.stats['errors_injected']} erreurs injectées)")
+    print(f"Octets : {server.stats['bytes_in']} envoyés au Gist, {server.stats['bytes_out']} reçus")
+    print(f"Client GitHub : {client['retries']} nouveaux essais, {client['throttled']} appels ralentis, "
+          f"{client['rate_limited']} reportés, quota restant {client['remaining']}/{client['limit']}")
+
+    errors = [e for s in sessions for e in s.errors]
+    if errors:
+        print(f"\n{len(errors)} session(s) en erreur :")
+        for error in errors[:10]:
+            print(f"  {error}")
+
+    return 1 if lost_state or lost_gist or errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
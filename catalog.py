@@ -0,0 +1,32 @@
+import copy
+import json
+import os
+import streamlit as st
+from migrations import migrate
+
+# Catalogues de tâches livrés avec l'application : un fichier JSON par agencement de maison
+CATALOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalogs")
+DEFAULT_CATALOG = "default"
+
+def available_catalogs():
+    """Noms des catalogues disponibles (fichiers catalogs/*.json)"""
+    return sorted(os.path.splitext(nom)[0] for nom in os.listdir(CATALOG_DIR) if nom.endswith(".json"))
+
+def get_catalog_name():
+    """Catalogue choisi dans les secrets (CATALOG), par défaut "default\""""
+    return st.secrets.get("CATALOG", DEFAULT_CATALOG)
+
+@st.cache_resource
+def load_catalog(name=DEFAULT_CATALOG):
+    """Lit un catalogue une seule fois par processus (le résultat partagé ne doit pas être modifié)"""
+    path = os.path.join(CATALOG_DIR, f"{name}.json")
+    if not os.path.exists(path):
+        raise ValueError(f"Catalogue inconnu : {name} (disponibles : {', '.join(available_catalogs())})")
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    migrate(data)
+    return data
+
+def new_document(name=None):
+    """Nouveau document de colocation : copie indépendante du catalogue"""
+    return copy.deepcopy(load_catalog(name or get_catalog_name()))
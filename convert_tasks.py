@@ -1,76 +1,307 @@
-"""Script pour convertir rapidement toutes les tâches à la nouvelle structure"""
-
-def convert_old_to_new_format():
-    old_tasks = {
-        # Salon
-        "Passer l'aspirateur salon": {"points": 2, "lieu": "Salon"},
-        "Épousseter les meubles salon": {"points": 1, "lieu": "Salon"},
-        "Nettoyer la table basse": {"points": 1, "lieu": "Salon"},
-        "Ranger le salon": {"points": 1, "lieu": "Salon"},
-        "Nettoyer les vitres salon": {"points": 2, "lieu": "Salon"},
-        
-        # Salle de bain 1er étage
-        "Nettoyer les toilettes 1er": {"points": 2, "lieu": "SDB 1er"},
-        "Nettoyer la douche 1er": {"points": 3, "lieu": "SDB 1er"},
-        "Nettoyer le lavabo 1er": {"points": 1, "lieu": "SDB 1er"},
-        "Nettoyer le miroir 1er": {"points": 1, "lieu": "SDB 1er"},
-        "Passer la serpillière SDB 1er": {"points": 2, "lieu": "SDB 1er"},
-        
-        # Salle de bain 2ème étage
-        "Nettoyer les toilettes 2ème": {"points": 2, "lieu": "SDB 2ème"},
-        "Nettoyer la douche 2ème": {"points": 3, "lieu": "SDB 2ème"},
-        "Nettoyer le lavabo 2ème": {"points": 1, "lieu": "SDB 2ème"},
-        "Nettoyer le miroir 2ème": {"points": 1, "lieu": "SDB 2ème"},
-        "Passer la serpillière SDB 2ème": {"points": 2, "lieu": "SDB 2ème"},
-        
-        # Rez-de-chaussée
-        "Passer l'aspirateur escaliers": {"points": 2, "lieu": "RDC"},
-        "Épousseter hall d'entrée": {"points": 1, "lieu": "RDC"},
-        "Nettoyer les vitres RDC": {"points": 2, "lieu": "RDC"},
-        "Passer la serpillière RDC": {"points": 2, "lieu": "RDC"},
-        
-        # Garage
-        "Ranger le garage": {"points": 2, "lieu": "Garage"},
-        "Balayer le garage": {"points": 1, "lieu": "Garage"},
-        "Sortir les vélos": {"points": 1, "lieu": "Garage"},
-        "Organiser les outils": {"points": 1, "lieu": "Garage"},
-        
-        # Jardin
-        "Tondre la pelouse": {"points": 3, "lieu": "Jardin"},
-        "Arroser les plantes": {"points": 1, "lieu": "Jardin"},
-        "Désherber": {"points": 2, "lieu": "Jardin"},
-        "Tailler les haies": {"points": 3, "lieu": "Jardin"},
-        "Ramasser les feuilles": {"points": 2, "lieu": "Jardin"},
-        "Nettoyer la terrasse": {"points": 2, "lieu": "Jardin"},
-        
-        # Cour d'entrée
-        "Balayer la cour": {"points": 1, "lieu": "Cour"},
-        "Nettoyer les marches": {"points": 1, "lieu": "Cour"},
-        "Arroser les plantes cour": {"points": 1, "lieu": "Cour"},
-        
-        # Tâches générales
-        "Changer les draps communs": {"points": 2, "lieu": "Général"},
-        "Faire une lessive commune": {"points": 2, "lieu": "Général"},
-        "Repasser le linge commun": {"points": 2, "lieu": "Général"},
-        "Acheter produits ménagers": {"points": 1, "lieu": "Général"},
-        "Remplacer ampoules grillées": {"points": 1, "lieu": "Général"},
-        "Nettoyer radiateurs": {"points": 2, "lieu": "Général"},
-        "Dépoussiérer plinthes": {"points": 1, "lieu": "Général"},
-        "Nettoyer interrupteurs": {"points": 1, "lieu": "Général"}
-    }
-    
-    converted_tasks = {}
-    for name, info in old_tasks.items():
-        converted_tasks[name] = {
-            "points_base": info["points"],
-            "lieu": info["lieu"],
-            "derniere_realisation": None,
-            "points_actuels": info["points"]
+"""Import/export en masse des tâches et de l'historique de TaskGame
+
+Usage :
+    python convert_tasks.py validate taches.csv              # vérifie sans rien écrire
+    python convert_tasks.py import taches.csv                # ajoute ou met à jour les tâches
+    python convert_tasks.py import taches.jsonl --replace    # remplace tout le catalogue
+    python convert_tasks.py export state -o etat.json        # document complet
+    python convert_tasks.py export tasks -o taches.csv       # tâches, réimportables
+    python convert_tasks.py export history -o historique.csv # réalisations (moteurs sqlite et events)
+    python convert_tasks.py convert anciennes_taches.json catalogs/maison.json
+    python convert_tasks.py --maison dupont import taches.csv  # autre colocation (?maison=dupont)
+
+CSV : colonnes nom, lieu, points et attribuee_a (noms séparés par « ; », vide = tout le monde).
+JSON Lines : un objet par ligne avec les mêmes champs (attribuee_a peut être une liste).
+Le fichier est lu ligne à ligne ; les noms en double (casse et espaces ignorés) ne sont
+importés qu'une fois. Les écritures passent par le moteur de stockage configuré dans
+.streamlit/secrets.toml (STORAGE_BACKEND), en une seule transaction.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from migrations import migrate
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Bornes des points de base (les mêmes que dans la page Paramètres)
+MIN_POINTS = 1
+MAX_POINTS = 3
+
+TASK_COLUMNS = ["nom", "lieu", "points", "attribuee_a"]
+HISTORY_COLUMNS = ["ts", "user", "task", "points"]
+
+def convert_old_to_new_format(old_tasks, colocataires):
+    """Construit un catalogue à la structure actuelle à partir des anciennes tâches"""
+    data = {
+        "colocataires": {nom: {"points": 0} for nom in colocataires},
+        "taches": {
+            name: {"points": info["points"], "lieu": info["lieu"], "derniere_realisation": None,
+                   "attribuee_a": list(colocataires), "derniere_realisation_par": None}
+            for name, info in old_tasks.items()
         }
-    
-    # Imprimer le résultat formaté
-    for name, info in converted_tasks.items():
-        print(f'            "{name}": {info},')
+    }
+    # Les étapes de migrations.py renomment points en points_base et ajoutent points_actuels
+    migrate(data)
+    return data
+
+def file_format(path, explicit=None):
+    """Format d'un fichier : choisi explicitement ou déduit de l'extension"""
+    if explicit:
+        return explicit
+    extension = os.path.splitext(path)[1].lower()
+    return "csv" if extension == ".csv" else "jsonl"
+
+def read_rows(path, fmt):
+    """Parcourt le fichier ligne à ligne : (numéro de ligne, dict) ou (numéro de ligne, erreur)"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError as e:
+                    yield line_no, f"JSON invalide ({e})"
+
+def normalize_name(nom):
+    """Clé de dédoublonnage : espaces multiples et casse ignorés"""
+    return " ".join(nom.split()).casefold()
+
+def parse_task(row, colocataires):
+    """Valide une ligne ; retourne (nom, info) ou lève ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError("objet attendu")
+    nom = " ".join(str(row.get("nom") or "").split())
+    lieu = " ".join(str(row.get("lieu") or "").split())
+    if not nom:
+        raise ValueError("nom manquant")
+    if not lieu:
+        raise ValueError(f"lieu manquant pour « {nom} »")
+
+    points = row.get("points", row.get("points_base"))
+    try:
+        points = int(points)
+    except (TypeError, ValueError):
+        raise ValueError(f"points invalides pour « {nom} » : {points!r}")
+    if not MIN_POINTS <= points <= MAX_POINTS:
+        raise ValueError(f"points hors de [{MIN_POINTS}, {MAX_POINTS}] pour « {nom} » : {points}")
+
+    attribuee_a = row.get("attribuee_a") or []
+    if isinstance(attribuee_a, str):
+        attribuee_a = [coloc.strip() for coloc in attribuee_a.split(";")]
+    attribuee_a = list(dict.fromkeys(coloc for coloc in attribuee_a if coloc))
+    inconnus = [coloc for coloc in attribuee_a if coloc not in colocataires]
+    if inconnus:
+        raise ValueError(f"colocataire(s) inconnu(s) pour « {nom} » : {', '.join(inconnus)}")
+
+    return nom, {"lieu": lieu, "points_base": points, "attribuee_a": attribuee_a or list(colocataires)}
+
+def validate_file(path, fmt, colocataires):
+    """Lit et valide tout le fichier : (tâches par clé normalisée, erreurs, doublons)"""
+    tasks = {}
+    errors = []
+    duplicates = []
+    for line_no, row in read_rows(path, fmt):
+        if isinstance(row, str):
+            errors.append((line_no, row))
+            continue
+        try:
+            nom, info = parse_task(row, colocataires)
+        except ValueError as e:
+            errors.append((line_no, str(e)))
+            continue
+        key = normalize_name(nom)
+        if key in tasks:
+            # La première occurrence est gardée
+            duplicates.append((line_no, nom))
+            continue
+        tasks[key] = (nom, info)
+    return tasks, errors, duplicates
+
+def plan_import(data, tasks, replace):
+    """Tâches à écrire (en gardant l'historique des tâches existantes) et tâches à supprimer"""
+    existing = {normalize_name(nom): nom for nom in data['taches']}
+    changes = {}
+    added = updated = 0
+    for key, (nom, info) in tasks.items():
+        current_name = existing.get(key)
+        if current_name is None:
+            added += 1
+            changes[nom] = dict(info, points_actuels=info["points_base"],
+                                derniere_realisation=None, derniere_realisation_par=None)
+            continue
+        current = data['taches'][current_name]
+        merged = dict(current, **info)
+        if merged != current:
+            updated += 1
+            # Le moteur de points recalcule le bonus au prochain chargement
+            merged['points_actuels'] = merged['points_base']
+            changes[current_name] = merged
+    removed = [nom for key, nom in existing.items() if replace and key not in tasks]
+    return changes, removed, added, updated
+
+def print_report(errors, duplicates):
+    for line_no, message in errors[:50]:
+        print(f"  ligne {line_no} : {message}", file=sys.stderr)
+    if len(errors) > 50:
+        print(f"  ... et {len(errors) - 50} autres erreurs", file=sys.stderr)
+    for line_no, nom in duplicates[:20]:
+        print(f"  ligne {line_no} : doublon ignoré « {nom} »", file=sys.stderr)
+
+def open_app():
+    """Importe app.py hors de Streamlit pour utiliser le moteur de stockage configuré"""
+    import logging
+    import warnings
+    warnings.filterwarnings("ignore")
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    sys.path.insert(0, REPO_DIR)
+    import app
+    return app
+
+def load_document(app):
+    storage = app.get_storage()
+    data = storage.load()
+    if data is None:
+        data = app.get_default_data()
+    return storage, app.migrate_task_data(data)
+
+def finish_sync(app):
+    """Attend l'envoi vers le Gist s'il est configuré"""
+    if app.get_gist_manager().is_configured():
+        if app.get_sync_worker().flush(timeout=60):
+            print("Gist mis à jour")
+        else:
+            print("⚠️ Envoi vers le Gist pas encore terminé : il reprendra au prochain lancement (colocation_outbox.json)",
+                  file=sys.stderr)
+
+def command_validate(args, write=False):
+    app = open_app()
+    storage, data = load_document(app)
+    fmt = file_format(args.file, args.format)
+    tasks, errors, duplicates = validate_file(args.file, fmt, data['colocataires'])
+    print_report(errors, duplicates)
+    changes, removed, added, updated = plan_import(data, tasks, getattr(args, "replace", False))
+    print(f"{len(tasks)} tâches valides, {len(errors)} erreurs, {len(duplicates)} doublons ignorés")
+    print(f"{added} à ajouter, {updated} à mettre à jour, {len(removed)} à supprimer")
+
+    if errors and not getattr(args, "skip_invalid", False):
+        return 1
+    if not write or args.dry_run:
+        return 0
+    if not changes and not removed:
+        print("Rien à écrire")
+        return 0
+
+    # Un seul événement : une transaction SQLite, une ligne de journal ou un envoi vers le Gist
+    with app.get_shared_state().lock:
+        app.record_event(data, "tasks_imported", tasks=changes, removed=removed)
+        app.save_data(data)
+    print(f"Import enregistré ({app.get_backend_name(app.current_tenant().gist_id)})")
+    finish_sync(app)
+    return 0
+
+def command_import(args):
+    return command_validate(args, write=True)
+
+def open_output(path):
+    if path in (None, "-"):
+        return sys.stdout
+    return open(path, 'w', encoding='utf-8', newline='')
+
+def write_rows(out, fmt, columns, rows):
+    """Écrit les lignes au fil de l'eau en CSV ou en JSON Lines"""
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: ";".join(v) if isinstance(v, list) else v for k, v in row.items()})
+    else:
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+def command_export(args):
+    app = open_app()
+    storage, data = load_document(app)
+    fmt = args.format or (file_format(args.output) if args.output not in (None, "-") else "csv")
+    out = open_output(args.output)
+    try:
+        if args.what == "state":
+            json.dump(data, out, indent=2, ensure_ascii=False)
+            out.write("\n")
+        elif args.what == "tasks":
+            rows = ({"nom": nom, "lieu": info['lieu'], "points": info.get('points_base', 1),
+                     "attribuee_a": info.get('attribuee_a', [])} for nom, info in data['taches'].items())
+            write_rows(out, fmt, TASK_COLUMNS, rows)
+        else:
+            history = storage.history(limit=None)
+            if not history and not storage.incremental:
+                print("⚠️ Le moteur de stockage actuel ne conserve pas l'historique (utilisez sqlite ou events)",
+                      file=sys.stderr)
+            # Du plus ancien au plus récent
+            write_rows(out, fmt, HISTORY_COLUMNS, reversed(history))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+def command_convert(args):
+    with open(args.source, 'r', encoding='utf-8') as f:
+        old_tasks = json.load(f)
+    with open(os.path.join(REPO_DIR, "catalogs", "default.json"), 'r', encoding='utf-8') as f:
+        colocataires = list(json.load(f)["colocataires"])
+
+    with open(args.destination, 'w', encoding='utf-8') as f:
+        json.dump(convert_old_to_new_format(old_tasks, colocataires), f, indent=2, ensure_ascii=False)
+    print(f"Catalogue écrit dans {args.destination}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="\n".join(__doc__.splitlines()[2:]))
+    parser.add_argument("--maison", help="colocation concernée (comme ?maison= dans l'URL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("validate", "vérifie un fichier de tâches sans rien écrire"),
+                            ("import", "importe un fichier de tâches dans le stockage configuré")):
+        sub = commands.add_parser(name, help=help_text)
+        sub.add_argument("file", help="fichier CSV ou JSON Lines")
+        sub.add_argument("--format", choices=["csv", "jsonl"], help="format du fichier (sinon d'après l'extension)")
+        sub.add_argument("--replace", action="store_true", help="supprime les tâches absentes du fichier")
+        if name == "import":
+            sub.add_argument("--skip-invalid", action="store_true", help="importe les lignes valides malgré les erreurs")
+            sub.add_argument("--dry-run", action="store_true", help="affiche le résultat sans rien écrire")
+
+    sub = commands.add_parser("export", help="exporte l'état, les tâches ou l'historique")
+    sub.add_argument("what", choices=["state", "tasks", "history"])
+    sub.add_argument("-o", "--output", help="fichier de sortie (sortie standard par défaut)")
+    sub.add_argument("--format", choices=["csv", "jsonl"], help="format des tâches et de l'historique")
+
+    sub = commands.add_parser("convert", help="convertit une liste de tâches à l'ancien format en catalogue")
+    sub.add_argument("source")
+    sub.add_argument("destination")
+
+    args = parser.parse_args(argv)
+    handlers = {"validate": command_validate, "import": command_import,
+                "export": command_export, "convert": command_convert}
+    if args.maison is None:
+        return handlers[args.command](args)
+    open_app()
+    from tenants import get_tenant_cache, use_tenant, UnknownTenant
+    try:
+        tenant = get_tenant_cache().get(args.maison.strip().lower())
+    except UnknownTenant as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    with use_tenant(tenant):
+        return handlers[args.command](args)
 
 if __name__ == "__main__":
-    convert_old_to_new_format()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from local_files import file_lock
+
+# Journal des événements (une ligne JSON par modification, jamais réécrit)
+EVENTS_FILE = "colocation_events.jsonl"
+# Photo de l'état à une position du journal : le démarrage ne rejoue que la suite
+SNAPSHOT_FILE = "colocation_snapshot.json"
+DEFAULT_SNAPSHOT_EVERY = 200
+# Dernières réalisations gardées en mémoire (et dans la photo) pour la page des scores :
+# l'affichage ne relit pas le journal complet
+RECENT_COMPLETIONS = 100
+
+# Clés d'idempotence des dernières réalisations (clé -> date) : une réalisation rejouée
+# (double clic, nouvel essai) n'est comptée qu'une fois. La fenêtre est bornée en durée
+# et en nombre : les clés les plus anciennes sont oubliées.
+COMPLETION_KEYS = "realisations_recentes"
+COMPLETION_KEYS_WINDOW = timedelta(days=2)
+COMPLETION_KEYS_MAX = 200
+
+def completion_seen(data, key):
+    """Indique si une réalisation portant cette clé a déjà été comptée"""
+    return key is not None and key in data.get(COMPLETION_KEYS, {})
+
+def _remember_completion(data, event):
+    """Note la clé d'une réalisation et oublie celles sorties de la fenêtre"""
+    keys = data.setdefault(COMPLETION_KEYS, {})
+    keys[event["key"]] = event["ts"]
+    limite = (datetime.fromisoformat(event["ts"]) - COMPLETION_KEYS_WINDOW).isoformat()
+    for key in list(keys):
+        if len(keys) <= COMPLETION_KEYS_MAX and keys[key] >= limite:
+            break
+        del keys[key]
+
+def make_event(event_type, **payload):
+    """Construit un événement horodaté"""
+    return {"type": event_type, "ts": datetime.now().isoformat(), **payload}
+
+def apply_event(data, event):
+    """Applique un événement aux données (réduction incrémentale de l'état)"""
+    event_type = event["type"]
+
+    if event_type == "completion":
+        if completion_seen(data, event.get("key")):
+            return data
+        tache = data['taches'].get(event["task"])
+        if event["user"] in data['colocataires']:
+            data['colocataires'][event["user"]]['points'] += event["points"]
+        if tache is not None:
+            tache['derniere_realisation'] = event["ts"]
+            tache['derniere_realisation_par'] = event["user"]
+            tache['points_actuels'] = tache.get('points_base', 1)
+        if event.get("key") is not None:
+            _remember_completion(data, event)
+
+    elif event_type == "task_added":
+        data['taches'][event["task"]] = dict(event["info"])
+
+    elif event_type == "task_updated":
+        if event["task"] in data['taches']:
+            data['taches'][event["task"]].update(event["changes"])
+
+    elif event_type == "task_deleted":
+        data['taches'].pop(event["task"], None)
+
+    elif event_type == "batch":
+        # Modifications groupées de la page Paramètres, enregistrées ensemble
+        for sub_event in event["events"]:
+            apply_event(data, sub_event)
+
+    elif event_type == "tasks_imported":
+        # Import en masse (convert_tasks.py) : un seul événement pour tout le lot
+        for nom in event.get("removed", []):
+            data['taches'].pop(nom, None)
+        for nom, info in event["tasks"].items():
+            data['taches'][nom] = dict(info)
+
+    elif event_type == "coloc_added":
+        data['colocataires'][event["name"]] = {"points": 0}
+
+    elif event_type == "coloc_deleted":
+        data['colocataires'].pop(event["name"], None)
+
+    elif event_type == "scores_reset":
+        for nom in data['colocataires']:
+            data['colocataires'][nom]['points'] = 0
+
+    elif event_type in ("app_reset", "remote_merged"):
+        # remote_merged : document fusionné avec les modifications d'une autre instance
+        data.clear()
+        data.update(json.loads(json.dumps(event["data"])))
+
+    return data
+
+class EventLog:
+    """Journal d'événements en ajout seul, source de vérité des scores et des tâches
+
+    Plusieurs processus peuvent écrire le même journal (l'application et convert_tasks.py) :
+    les écritures se font sous un verrou de fichier (flock), après avoir appliqué les
+    événements ajoutés entre-temps par les autres, pour que les numéros (seq) se suivent.
+    """
+
+    def __init__(self, log_file=EVENTS_FILE, snapshot_file=SNAPSHOT_FILE, snapshot_every=DEFAULT_SNAPSHOT_EVERY):
+        self.log_file = log_file
+        self.snapshot_file = snapshot_file
+        self.snapshot_every = snapshot_every
+        self.lock = threading.RLock()
+        self.state = None
+        self.seq = 0
+        self.events_since_snapshot = 0
+        self.recent = deque(maxlen=RECENT_COMPLETIONS)
+        # Octets du journal déjà appliqués à l'état
+        self.position = 0
+        # on_replay(événement) : appelé pour chaque événement écrit par un autre processus
+        # et appliqué à l'état après le chargement (voir app.get_storage)
+        self.on_replay = None
+
+    def load(self, initial_state):
+        """Reconstruit l'état : dernière photo puis rejeu des événements suivants
+
+        initial_state est appelé pour obtenir l'état de départ quand aucune photo n'existe.
+        """
+        with self.lock, file_lock(self.log_file):
+            offset = 0
+            self.recent.clear()
+            if os.path.exists(self.snapshot_file):
+                with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                self.state = snapshot["state"]
+                self.seq = snapshot["seq"]
+                offset = snapshot["offset"]
+                if "recent" in snapshot:
+                    self.recent.extend(snapshot["recent"])
+                else:
+                    # Photo écrite avant les dernières réalisations : une seule lecture du journal
+                    self.recent.extend(e for e in self.history(event_type="completion") if e["seq"] <= self.seq)
+            else:
+                self.state = initial_state()
+                self.seq = 0
+
+            self.events_since_snapshot = 0
+            self.position = offset
+            self._replay(notify=False)
+
+            if not os.path.exists(self.snapshot_file):
+                self._write_snapshot()
+            return self.state
+
+    def _replay(self, notify=True):
+        """Applique les événements du journal situés après self.position (sous le verrou du fichier)"""
+        if not os.path.exists(self.log_file) or os.path.getsize(self.log_file) <= self.position:
+            return
+        with open(self.log_file, 'rb') as f:
+            f.seek(self.position)
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("ligne incomplète")
+                    event = json.loads(line)
+                except ValueError:
+                    # Dernière ligne tronquée par un arrêt brutal : on la retire
+                    break
+                self.position += len(line)
+                if event["seq"] <= self.seq:
+                    continue
+                apply_event(self.state, event)
+                self.seq = event["seq"]
+                self.events_since_snapshot += 1
+                if event["type"] == "completion":
+                    self.recent.append(event)
+                if notify and self.on_replay is not None:
+                    self.on_replay(event)
+        if self.position < os.path.getsize(self.log_file):
+            os.truncate(self.log_file, self.position)
+
+    def refresh(self):
+        """Applique les événements écrits par un autre processus ; retourne le dernier seq"""
+        with self.lock:
+            # Cas courant : personne d'autre n'a écrit, pas de verrou de fichier
+            if os.path.exists(self.log_file) and os.path.getsize(self.log_file) != self.position:
+                with file_lock(self.log_file):
+                    self._replay()
+            return self.seq
+
+    def append(self, event, apply=True):
+        """Ajoute un événement au journal et l'applique à l'état
+
+        apply=False quand l'appelant a déjà appliqué l'événement à self.state (les événements
+        d'un autre processus rattrapés ici sont alors appliqués après lui).
+        """
+        with self.lock, file_lock(self.log_file):
+            self._replay()
+            event = dict(event, seq=self.seq + 1)
+            line = (json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8')
+            with open(self.log_file, 'ab') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.position += len(line)
+            self.seq = event["seq"]
+            if apply:
+                apply_event(self.state, event)
+            if event["type"] == "completion":
+                self.recent.append(event)
+
+            self.events_since_snapshot += 1
+            if self.events_since_snapshot >= self.snapshot_every:
+                self._write_snapshot()
+            return event
+
+    def compact(self):
+        """Écrit une photo de l'état courant et la position correspondante du journal"""
+        with self.lock, file_lock(self.log_file):
+            # La photo couvre exactement les événements appliqués, y compris ceux des autres processus
+            self._replay()
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        """Écrit la photo (sous le verrou du fichier : flock ne s'imbrique pas)"""
+        snapshot = {"seq": self.seq, "offset": self.position, "state": self.state, "recent": list(self.recent)}
+        tmp_file = f"{self.snapshot_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+        self.events_since_snapshot = 0
+
+    def recent_completions(self, limit=20):
+        """Dernières réalisations, de la plus récente à la plus ancienne (au plus RECENT_COMPLETIONS)"""
+        with self.lock:
+            return list(reversed(self.recent))[:limit]
+
+    def history(self, task=None, user=None, event_type=None):
+        """Parcourt les événements du journal, du plus ancien au plus récent"""
+        if not os.path.exists(self.log_file):
+            return
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if task is not None and event.get("task") != task:
+                    continue
+                if user is not None and event.get("user") != user:
+                    continue
+                if event_type is not None and event["type"] != event_type:
+                    continue
+                yield event
@@ -1,77 +1,323 @@
-import requests
 import json
+import copy
+import re
+import time
+import unicodedata
 import streamlit as st
 from datetime import datetime
+from profiling import PROFILER
+from github_client import get_github_client
+from merge import merge_documents, guess_base
+import wire_format
+
+# API GitHub (remplaçable par le serveur local tools/fake_gist_server.py via GITHUB_API_URL)
+DEFAULT_API_URL = "https://api.github.com"
+
+# Durée (en secondes) pendant laquelle le Gist en cache est servi sans aucun appel réseau
+DEFAULT_CACHE_TTL = 30
+
+# Le document est réparti en plusieurs fichiers du Gist : métadonnées, scores et un fichier
+# par lieu. Une sauvegarde n'envoie que les fichiers dont le contenu a changé.
+META_FILE = "colocation_meta.json"
+SCORES_FILE = "colocation_scores.json"
+LIEU_FILE = "colocation_lieu_{}.json"
+# Un grand lieu est découpé en fichiers de TASKS_PER_FILE tâches au plus : l'envoi d'une
+# réalisation reste borné quelle que soit la taille du catalogue
+TASKS_PER_FILE = 200
+# Ancien fichier unique, encore lu tant que le Gist n'a pas été réparti
+LEGACY_FILE = "colocation_data.json"
+# Fichiers gérés par l'application (les autres fichiers du Gist, comme README.md, ne sont jamais supprimés)
+MANAGED_PREFIX = "colocation_"
+SHARDS_FORMAT = "taskgame-shards"
+
+def _lieu_slugs(lieux):
+    """Préfixe de nom de fichier de chaque lieu (sans accents ni espaces, unique)"""
+    slugs = {}
+    utilises = set()
+    for lieu in lieux:
+        slug = unicodedata.normalize('NFKD', str(lieu)).encode('ascii', 'ignore').decode('ascii')
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', slug).strip('_').lower() or "lieu"
+        candidat, suffixe = slug, 2
+        while candidat in utilises:
+            candidat, suffixe = f"{slug}_{suffixe}", suffixe + 1
+        utilises.add(candidat)
+        slugs[lieu] = candidat
+    return slugs
+
+def split_document(data, wire_format_name=wire_format.COMPACT, compress=False):
+    """Découpe le document en fichiers du Gist : {nom de fichier: contenu}"""
+    par_lieu = {}
+    for nom, info in data.get('taches', {}).items():
+        par_lieu.setdefault(info.get('lieu'), {})[nom] = info
+    slugs = _lieu_slugs(par_lieu)
+
+    files = {
+        SCORES_FILE: wire_format.dumps({'colocataires': data.get('colocataires', {})}, wire_format_name, compress)
+    }
+    fichiers_lieux = {}
+    for lieu, taches in par_lieu.items():
+        noms = list(taches)
+        fichiers_lieux[lieu] = []
+        for debut in range(0, len(noms), TASKS_PER_FILE):
+            nom_fichier = LIEU_FILE.format(slugs[lieu] if debut == 0 else f"{slugs[lieu]}.{debut // TASKS_PER_FILE + 1}")
+            morceau = {nom: taches[nom] for nom in noms[debut:debut + TASKS_PER_FILE]}
+            files[nom_fichier] = wire_format.dumps({'taches': morceau}, wire_format_name, compress)
+            fichiers_lieux[lieu].append(nom_fichier)
+
+    meta = {k: v for k, v in data.items() if k not in ('colocataires', 'taches')}
+    meta.update(format=SHARDS_FORMAT, v=1, lieux=fichiers_lieux)
+    files[META_FILE] = json.dumps(meta, ensure_ascii=False, separators=(',', ':'))
+    return files
+
+def _files_changed(known, files):
+    """Compare les fichiers du Gist à ceux en cache (contenu vide : fichier à supprimer, ignoré)"""
+    return (any(known.get(name) not in (content, "") for name, content in files.items())
+            or any(content and name not in files for name, content in known.items()))
+
+def _same_revision(base, revision):
+    """Vrai si le Gist est encore à la révision de base (base : (révision, document) ou None)"""
+    return base is not None and base[0] is not None and base[0] == revision
+
+def assemble_files(files):
+    """Reconstitue le document à partir des fichiers du Gist (réparti ou ancien fichier unique)"""
+    if META_FILE in files:
+        meta = json.loads(files[META_FILE])
+        data = {k: v for k, v in meta.items() if k not in ('format', 'v', 'lieux')}
+        data['colocataires'] = wire_format.loads(files[SCORES_FILE]).get('colocataires', {})
+        data['taches'] = {}
+        for noms_fichiers in meta['lieux'].values():
+            for nom_fichier in noms_fichiers:
+                data['taches'].update(wire_format.loads(files[nom_fichier])['taches'])
+        return data
+    if LEGACY_FILE in files:
+        return wire_format.loads(files[LEGACY_FILE])
+    return None
 
 class GistManager:
     """Gestionnaire pour sauvegarder/charger les données via GitHub Gist"""
     
-    def __init__(self):
+    # Cache partagé entre les instances (une instance est créée à chaque rerun)
+    # (api_url, gist_id) -> {"etag", "last_modified", "data", "fetched_at"}
+    _cache = {}
+    
+    def __init__(self, show_errors=True, gist_id=None):
+        # Les erreurs ne sont pas affichées quand le gestionnaire tourne hors d'une page
+        # (thread de synchronisation en arrière-plan) : elles restent dans last_error
+        self.show_errors = show_errors
+        self.last_error = None
+        # Client HTTP partagé ; hors d'une page, les appels suivent le budget de quota
+        self.client = get_github_client()
+        self.background = not show_errors
+        # Document réellement envoyé par la dernière sauvegarde s'il a fallu le fusionner
+        # avec une version distante plus récente (None sinon)
+        self.merged = None
         # Configuration via les secrets Streamlit Cloud
         self.github_token = st.secrets.get("GITHUB_TOKEN", None)
-        self.gist_id = st.secrets.get("GIST_ID", None)
+        # Gist de la colocation (None : secret GIST_ID ; chaîne vide : pas de Gist)
+        self.gist_id = st.secrets.get("GIST_ID", None) if gist_id is None else gist_id
+        self.cache_ttl = float(st.secrets.get("GIST_CACHE_TTL", DEFAULT_CACHE_TTL))
+        self.api_url = st.secrets.get("GITHUB_API_URL", DEFAULT_API_URL).rstrip('/')
+        # Format du document envoyé (voir wire_format.py) ; la lecture accepte tous les formats
+        self.wire_format = st.secrets.get("WIRE_FORMAT", wire_format.COMPACT)
+        self.compress = bool(st.secrets.get("GIST_COMPRESS", False))
         self.headers = {
             'Authorization': f'token {self.github_token}' if self.github_token else None,
             'Accept': 'application/vnd.github.v3+json'
         }
     
+    def _report_error(self, message):
+        """Mémorise une erreur et l'affiche si le gestionnaire est utilisé dans une page"""
+        self.last_error = message
+        if self.show_errors:
+            st.error(message)
+    
+    def _record_traffic(self, response, payload=None):
+        """Compte l'appel réseau et les octets échangés (panneau de profilage)"""
+        if PROFILER.enabled:
+            PROFILER.count("appels réseau")
+            PROFILER.count("octets reçus", len(response.content))
+            if payload is not None:
+                PROFILER.count("octets envoyés", len(json.dumps(payload, ensure_ascii=False).encode('utf-8')))
+    
     def is_configured(self):
         """Vérifie si la configuration GitHub est disponible"""
-        return self.github_token is not None and self.gist_id is not None
+        return self.github_token is not None and bool(self.gist_id)
+    
+    def _update_cache(self, data, response, files):
+        """Mémorise le document, le contenu de ses fichiers et les validateurs HTTP de la dernière réponse"""
+        GistManager._cache[(self.api_url, self.gist_id)] = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "data": copy.deepcopy(data),
+            "files": files,
+            "fetched_at": time.monotonic()
+        }
+    
+    def _file_contents(self, gist_data):
+        """Contenu des fichiers gérés du Gist (GitHub tronque les fichiers de plus de 1 Mo)"""
+        files = {}
+        for name, info in gist_data["files"].items():
+            if not name.startswith(MANAGED_PREFIX):
+                continue
+            if info.get("truncated") and info.get("raw_url"):
+                response = self.client.get(info["raw_url"], headers=self.headers, background=self.background)
+                self._record_traffic(response)
+                response.raise_for_status()
+                files[name] = response.text
+            else:
+                files[name] = info["content"]
+        return files
+    
+    @property
+    def revision(self):
+        """Identifiant de la version du Gist actuellement en cache (ETag)"""
+        cached = GistManager._cache.get((self.api_url, self.gist_id))
+        if cached is None:
+            return None
+        return cached["etag"] or cached["last_modified"]
+    
+    def cached_version(self):
+        """(révision, document) de la version en cache, ou None"""
+        cached = GistManager._cache.get((self.api_url, self.gist_id))
+        if cached is None:
+            return None
+        return cached["etag"] or cached["last_modified"], copy.deepcopy(cached["data"])
+    
+    def _get_gist(self, cached):
+        """GET du Gist, conditionnel : GitHub répond 304 s'il n'a pas changé depuis la version en cache"""
+        headers = dict(self.headers)
+        if cached and cached["etag"]:
+            headers['If-None-Match'] = cached["etag"]
+        elif cached and cached["last_modified"]:
+            headers['If-Modified-Since'] = cached["last_modified"]
+        response = self.client.get(f"{self.api_url}/gists/{self.gist_id}", headers=headers, background=self.background)
+        self._record_traffic(response)
+        return response
+    
+    def invalidate_cache(self):
+        """Oublie le document en cache (le prochain chargement ira sur GitHub)"""
+        GistManager._cache.pop((self.api_url, self.gist_id), None)
     
     def load_data_from_gist(self):
         """Charge les données depuis le Gist GitHub"""
         if not self.is_configured():
             return None
         
+        cached = GistManager._cache.get((self.api_url, self.gist_id))
+        
+        # Dans la fenêtre du TTL, aucun appel réseau
+        if cached and time.monotonic() - cached["fetched_at"] < self.cache_ttl:
+            return copy.deepcopy(cached["data"])
+        
         try:
-            url = f"https://api.github.com/gists/{self.gist_id}"
-            response = requests.get(url, headers=self.headers)
+            response = self._get_gist(cached)
             
-            if response.status_code == 200:
-                gist_data = response.json()
-                # Le fichier principal est "colocation_data.json"
-                if "colocation_data.json" in gist_data["files"]:
-                    content = gist_data["files"]["colocation_data.json"]["content"]
-                    return json.loads(content)
+            if response.status_code == 304 and cached:
+                cached["fetched_at"] = time.monotonic()
+                return copy.deepcopy(cached["data"])
+            elif response.status_code == 200:
+                files = self._file_contents(response.json())
+                data = assemble_files(files)
+                if data is not None:
+                    self._update_cache(data, response, files)
+                    return data
             else:
-                st.error(f"Erreur lors du chargement du Gist: {response.status_code}")
+                self._report_error(f"Erreur lors du chargement du Gist: {response.status_code}")
                 return None
                 
         except Exception as e:
-            st.error(f"Erreur lors du chargement depuis GitHub: {str(e)}")
+            self._report_error(f"Erreur lors du chargement depuis GitHub: {str(e)}")
             return None
     
-    def save_data_to_gist(self, data):
-        """Sauvegarde les données sur le Gist GitHub"""
+    def _check_remote(self, data, base=None):
+        """Contrôle optimiste avant l'envoi : si le Gist a changé depuis la version dont data
+        est issu (autre instance de l'application), data est fusionné avec la version distante
+        
+        base : (révision, document) dont data est issu, mémorisé avec l'outbox ; à défaut,
+        la version en cache. Sans l'une ni l'autre (redémarrage), la version distante est
+        relue et fusionnée avec une version commune supposée (voir merge.guess_base) plutôt
+        qu'écrasée.
+        
+        Retourne (document à envoyer, contenu actuel des fichiers du Gist), ou (None, None)
+        si le Gist n'a pas pu être lu.
+        """
+        cached = GistManager._cache.get((self.api_url, self.gist_id))
+        response = self._get_gist(cached)
+        if response.status_code == 304 and cached:
+            cached["fetched_at"] = time.monotonic()
+            if base is None or _same_revision(base, cached["etag"] or cached["last_modified"]):
+                return data, cached["files"]
+            # Le Gist n'a pas changé depuis la version en cache, mais depuis la base
+            files, theirs = cached["files"], cached["data"]
+        elif response.status_code != 200:
+            self._report_error(f"Erreur lors de la vérification du Gist: {response.status_code}")
+            return None, None
+        else:
+            files = self._file_contents(response.json())
+            theirs = assemble_files(files)
+            if theirs is None:
+                return data, files
+            if _same_revision(base, response.headers.get("ETag") or response.headers.get("Last-Modified")):
+                return data, files
+        
+        # L'ancêtre commun reste le même jusqu'à ce que l'envoi réussisse (un nouvel essai
+        # refera la même fusion)
+        if base is not None:
+            self.merged = data = merge_documents(base[1], data, theirs)
+        elif cached is None:
+            self.merged = data = merge_documents(guess_base(data, theirs), data, theirs)
+        elif _files_changed(cached["files"], files):
+            self.merged = data = merge_documents(cached["data"], data, theirs)
+        return data, files
+    
+    def save_data_to_gist(self, data, base=None):
+        """Sauvegarde les données sur le Gist GitHub
+        
+        Pas de verrou : la version du Gist est vérifiée juste avant l'envoi et fusionnée
+        avec les données si une autre instance l'a modifiée depuis base (voir merge.py et
+        _check_remote). Le document finalement envoyé est dans self.merged quand il diffère de data.
+        """
         if not self.is_configured():
             return False
         
+        self.merged = None
         try:
-            url = f"https://api.github.com/gists/{self.gist_id}"
+            url = f"{self.api_url}/gists/{self.gist_id}"
+            
+            data, known = self._check_remote(data, base)
+            if data is None:
+                return False
             
             # Ajouter un timestamp de dernière mise à jour
             data["last_updated"] = datetime.now().isoformat()
             
+            # Seuls les fichiers modifiés depuis la dernière version connue sont envoyés ;
+            # ceux qui ne correspondent plus à rien (lieu vidé, ancien fichier unique) sont supprimés
+            files = split_document(data, self.wire_format, self.compress)
+            changes = {name: {"content": content} for name, content in files.items() if known.get(name) != content}
+            changes.update({name: None for name in known if name not in files})
+            
             payload = {
-                "files": {
-                    "colocation_data.json": {
-                        "content": json.dumps(data, indent=2, ensure_ascii=False)
-                    }
-                },
+                "files": changes,
                 "description": "Données TaskGame Colocation - Mise à jour automatique"
             }
             
-            response = requests.patch(url, headers=self.headers, json=payload)
+            response = self.client.patch(url, headers=self.headers, json=payload, background=self.background)
+            self._record_traffic(response, payload)
             
             if response.status_code == 200:
+                # Le document envoyé devient la version en cache ; les fichiers gérés encore
+                # présents sur le Gist mais inconnus du cache seront supprimés au prochain envoi
+                restants = [name for name in response.json().get("files", {})
+                            if name.startswith(MANAGED_PREFIX) and name not in files]
+                self._update_cache(data, response, dict(files, **dict.fromkeys(restants, "")))
                 return True
             else:
-                st.error(f"Erreur lors de la sauvegarde: {response.status_code}")
+                self._report_error(f"Erreur lors de la sauvegarde: {response.status_code}")
                 return False
                 
         except Exception as e:
-            st.error(f"Erreur lors de la sauvegarde sur GitHub: {str(e)}")
+            self._report_error(f"Erreur lors de la sauvegarde sur GitHub: {str(e)}")
             return False
     
     def create_initial_gist(self, data):
@@ -80,7 +326,7 @@ class GistManager:
             return None
         
         try:
-            url = "https://api.github.com/gists"
+            url = f"{self.api_url}/gists"
             
             data["last_updated"] = datetime.now().isoformat()
             data["created_at"] = datetime.now().isoformat()
@@ -89,24 +335,24 @@ class GistManager:
                 "description": "TaskGame Colocation - Données persistantes",
                 "public": False,
                 "files": {
-                    "colocation_data.json": {
-                        "content": json.dumps(data, indent=2, ensure_ascii=False)
-                    },
+                    **{name: {"content": content}
+                       for name, content in split_document(data, self.wire_format, self.compress).items()},
                     "README.md": {
                         "content": "# TaskGame Colocation\n\nDonnées persistantes pour l'application de gamification des tâches ménagères.\n\n**Ne pas modifier ce fichier manuellement !**"
                     }
                 }
             }
             
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = self.client.post(url, headers=self.headers, json=payload, background=self.background)
+            self._record_traffic(response, payload)
             
             if response.status_code == 201:
                 gist_data = response.json()
                 return gist_data["id"]
             else:
-                st.error(f"Erreur lors de la création du Gist: {response.status_code}")
+                self._report_error(f"Erreur lors de la création du Gist: {response.status_code}")
                 return None
                 
         except Exception as e:
-            st.error(f"Erreur lors de la création du Gist: {str(e)}")
+            self._report_error(f"Erreur lors de la création du Gist: {str(e)}")
             return None
\ No newline at end of file
@@ -0,0 +1,173 @@
+import random
+import threading
+import time
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from profiling import PROFILER
+
+# Délais (en secondes) : établissement de la connexion, puis attente de la réponse
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 20
+
+# Nouveaux essais après une erreur 5xx, une réponse 429 ou une coupure réseau :
+# attente aléatoire entre 0 et RETRY_BASE_DELAY * 2^essai, plafonnée à RETRY_MAX_DELAY
+# (ou la durée demandée par Retry-After). Les pages n'attendent qu'un seul nouvel essai.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKGROUND_RETRIES = 3
+PAGE_RETRIES = 1
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8
+
+# Quota de l'API (en-têtes X-RateLimit-*) : sous LOW_QUOTA requêtes restantes, les appels
+# en arrière-plan sont espacés pour répartir le reste jusqu'au renouvellement ; les
+# RESERVED_QUOTA dernières requêtes sont réservées aux pages
+LOW_QUOTA = 500
+RESERVED_QUOTA = 50
+# Au-delà de cette pause, l'appel en arrière-plan est abandonné (la synchronisation réessaiera)
+MAX_BUDGET_WAIT = 30
+
+class RateLimited(Exception):
+    """Quota GitHub (presque) épuisé : la requête n'est pas envoyée avant retry_at"""
+
+    def __init__(self, retry_at):
+        super().__init__(f"Quota GitHub épuisé, prochain envoi à {time.strftime('%H:%M:%S', time.localtime(retry_at))}")
+        self.retry_at = retry_at
+
+class GitHubClient:
+    """Client HTTP partagé pour l'API GitHub
+
+    Une seule requests.Session (connexions keep-alive réutilisées, sans nouvelle poignée
+    de main TLS à chaque appel), des délais explicites, de nouveaux essais espacés
+    aléatoirement et un budget de requêtes qui ralentit les appels en arrière-plan
+    avant que le quota ne soit épuisé (GitHub répond alors 403 jusqu'au renouvellement).
+    """
+
+    def __init__(self, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 low_quota=LOW_QUOTA, reserved_quota=RESERVED_QUOTA):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.timeout = (connect_timeout, read_timeout)
+        self.low_quota = low_quota
+        self.reserved_quota = reserved_quota
+        self.random = random.Random()
+
+        self.lock = threading.Lock()
+        # Dernières valeurs des en-têtes X-RateLimit-* (None tant qu'aucune réponse n'est arrivée)
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.rate_limited = 0
+
+    def _update_quota(self, response):
+        headers = response.headers
+        if "X-RateLimit-Remaining" not in headers:
+            # Réponse sans quota (contenu brut des gros fichiers, 304...)
+            return
+        try:
+            with self.lock:
+                self.limit = int(headers.get("X-RateLimit-Limit", self.limit or 0))
+                self.remaining = int(headers["X-RateLimit-Remaining"])
+                self.reset_at = int(headers.get("X-RateLimit-Reset", self.reset_at or 0))
+        except ValueError:
+            pass
+
+    def wait_time(self, background=True):
+        """Secondes à attendre avant le prochain appel selon le quota (0 : aucun délai)"""
+        with self.lock:
+            remaining, reset_at = self.remaining, self.reset_at
+        now = time.time()
+        if remaining is None or not reset_at or now >= reset_at:
+            return 0
+        reserve = self.reserved_quota if background else 0
+        if remaining <= reserve:
+            return reset_at - now
+        if background and remaining < self.low_quota:
+            # Requêtes restantes réparties jusqu'au renouvellement du quota
+            return (reset_at - now) / (remaining - reserve)
+        return 0
+
+    def _retry_delay(self, attempt, retry_after):
+        try:
+            if retry_after is not None:
+                return min(RETRY_MAX_DELAY, float(retry_after))
+        except ValueError:
+            pass
+        return self.random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+    def request(self, method, url, background=False, **kwargs):
+        """Envoie une requête ; background=True pour les appels hors d'une page (synchronisation)
+
+        Lève RateLimited si le quota ne permet pas l'appel, et les erreurs réseau de requests
+        quand les nouveaux essais sont épuisés.
+        """
+        delay = self.wait_time(background)
+        if delay > (MAX_BUDGET_WAIT if background else 0):
+            with self.lock:
+                self.rate_limited += 1
+            raise RateLimited(time.time() + delay)
+        if delay:
+            with self.lock:
+                self.throttled += 1
+            time.sleep(delay)
+
+        kwargs.setdefault("timeout", self.timeout)
+        max_retries = BACKGROUND_RETRIES if background else PAGE_RETRIES
+        for attempt in range(max_retries + 1):
+            with self.lock:
+                self.calls += 1
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == max_retries:
+                    raise
+                retry_after = None
+            else:
+                self._update_quota(response)
+                if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+                    if response.status_code in (403, 429) and self.remaining == 0:
+                        with self.lock:
+                            self.rate_limited += 1
+                    return response
+                retry_after = response.headers.get("Retry-After")
+
+            with self.lock:
+                self.retries += 1
+            if PROFILER.enabled:
+                PROFILER.count("nouveaux essais")
+            time.sleep(self._retry_delay(attempt, retry_after))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def counters(self):
+        """Compteurs pour l'affichage : appels, nouveaux essais, quota restant"""
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "rate_limited": self.rate_limited,
+                "remaining": self.remaining,
+                "limit": self.limit,
+                "reset_at": self.reset_at
+            }
+
+@st.cache_resource
+def get_github_client():
+    """Retourne le client GitHub partagé par les sessions et le thread de synchronisation"""
+    return GitHubClient(
+        connect_timeout=float(st.secrets.get("GITHUB_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+        read_timeout=float(st.secrets.get("GITHUB_READ_TIMEOUT", DEFAULT_READ_TIMEOUT))
+    )
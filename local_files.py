@@ -0,0 +1,226 @@
+import atexit
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows : pas de verrou entre processus, les écritures restent atomiques
+    fcntl = None
+
+# Journal d'écriture anticipée (secret LOCAL_JOURNAL) : chaque sauvegarde est ajoutée à
+# <fichier>.journal ; un seul fsync couvre les sauvegardes arrivées pendant JOURNAL_WINDOW
+# secondes, et la dernière version est recopiée dans le fichier principal (point de
+# contrôle) toutes les JOURNAL_CHECKPOINT sauvegardes
+JOURNAL_SUFFIX = ".journal"
+DEFAULT_JOURNAL_WINDOW = 0.05
+DEFAULT_JOURNAL_CHECKPOINT = 50
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Verrou consultatif entre processus (flock sur <path>.lock), partagé pour les lectures"""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _fsync_directory(path):
+    """Rend durable le renommage d'un fichier (entrée du répertoire)"""
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write(path, content):
+    """Remplace le contenu d'un fichier d'un seul coup : fichier temporaire, fsync, renommage
+
+    Un arrêt brutal laisse l'ancienne ou la nouvelle version, jamais un fichier tronqué ;
+    chaque écriture a son propre fichier temporaire.
+    """
+    fd, tmp_file = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+    except BaseException:
+        try:
+            os.remove(tmp_file)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_directory(path)
+
+def last_journal_entry(journal_file, loads):
+    """(ligne, données) de la dernière sauvegarde complète du journal, ou None
+
+    Une dernière ligne tronquée par un arrêt brutal est ignorée.
+    """
+    try:
+        with open(journal_file, 'rb') as f:
+            content = f.read()
+    except FileNotFoundError:
+        return None
+    # Après le dernier saut de ligne : rien, ou une ligne incomplète
+    for line in reversed(content.split(b"\n")[:-1]):
+        try:
+            text = line.decode('utf-8')
+            return text, loads(text)
+        except (ValueError, KeyError):
+            continue
+    return None
+
+class LocalJournal:
+    """Journal d'écriture anticipée d'un fichier local, avec validation groupée
+
+    append() ajoute la sauvegarde à la fin du journal et rend la main dès qu'elle est
+    confiée au système : un arrêt du processus ne la perd pas. Le thread d'écriture fait
+    ensuite un seul fsync pour toutes les sauvegardes arrivées pendant la fenêtre (une
+    coupure de courant perd au plus cette fenêtre), puis recopie régulièrement la
+    dernière version dans le fichier principal et vide le journal.
+    """
+
+    def __init__(self, path, loads, to_file=None, window=DEFAULT_JOURNAL_WINDOW,
+                 checkpoint_every=DEFAULT_JOURNAL_CHECKPOINT):
+        self.path = path
+        self.journal_file = f"{path}{JOURNAL_SUFFIX}"
+        # loads(ligne) : vérifie une ligne du journal ; to_file(ligne) : contenu du fichier principal
+        self.loads = loads
+        self.to_file = to_file or (lambda line: line)
+        self.window = window
+        self.checkpoint_every = checkpoint_every
+        self.condition = threading.Condition()
+        self.fd = None
+        # Sauvegardes ajoutées au journal, et rendues durables par fsync
+        self.written = 0
+        self.synced = 0
+        self.since_checkpoint = 0
+        self.fsyncs = 0
+        self.checkpoints = 0
+        # Démarré à la première sauvegarde, arrêté quand tout est écrit
+        self.thread = None
+        atexit.register(self.flush)
+
+    def _open(self):
+        """Ouvre le journal en ajout, après avoir retiré une fin tronquée par un arrêt brutal"""
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'rb') as f:
+                content = f.read()
+            end = content.rfind(b"\n") + 1
+            if end < len(content):
+                os.truncate(self.journal_file, end)
+        return os.open(self.journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def append(self, line):
+        """Ajoute une sauvegarde (une ligne sans saut de ligne) au journal"""
+        data = f"{line}\n".encode('utf-8')
+        with self.condition:
+            # Le verrou ordonne les ajouts des différents processus
+            with file_lock(self.path):
+                if self.fd is None:
+                    self.fd = self._open()
+                while data:
+                    data = data[os.write(self.fd, data):]
+            self.written += 1
+            self.since_checkpoint += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="local-journal", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if self.synced == self.written:
+                    # Tout est écrit : la prochaine sauvegarde relancera le thread
+                    self.thread = None
+                    return
+            # Les sauvegardes qui arrivent pendant la fenêtre partagent le même fsync
+            time.sleep(self.window)
+            self._sync()
+            if self.since_checkpoint >= self.checkpoint_every:
+                self.checkpoint()
+
+    def _sync(self):
+        with self.condition:
+            target, fd = self.written, self.fd
+        if fd is None or self.synced >= target:
+            return
+        os.fsync(fd)
+        with self.condition:
+            self.synced = max(self.synced, target)
+            self.fsyncs += 1
+            self.condition.notify_all()
+
+    def flush(self):
+        """Rend durables les sauvegardes en attente (appelé aussi à l'arrêt du processus)"""
+        self._sync()
+
+    def close(self):
+        """Rend durables les sauvegardes en attente et ferme le journal (fichier libéré de la mémoire)"""
+        with self.condition:
+            thread = self.thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+        atexit.unregister(self.flush)
+        with self.condition:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+
+    def checkpoint(self):
+        """Recopie la dernière version du journal dans le fichier principal puis vide le journal"""
+        with self.condition:
+            # Sauvegardes déjà dans le journal : toutes couvertes par ce point de contrôle
+            included = self.since_checkpoint
+        with file_lock(self.path):
+            entry = last_journal_entry(self.journal_file, self.loads)
+            if entry is not None:
+                atomic_write(self.path, self.to_file(entry[0]))
+                os.truncate(self.journal_file, 0)
+        with self.condition:
+            self.since_checkpoint -= included
+            self.checkpoints += 1
+
+    def stats(self):
+        with self.condition:
+            return {
+                "written": self.written,
+                "synced": self.synced,
+                "fsyncs": self.fsyncs,
+                "checkpoints": self.checkpoints
+            }
+
+# Un seul journal par fichier dans le processus : les moteurs qui écrivent le même
+# fichier (copie de secours du Gist, moteur json) partagent ses compteurs et son thread
+_journals = {}
+_journals_lock = threading.Lock()
+
+def get_journal(path, **options):
+    """Journal du fichier path (créé au premier appel avec ces options)"""
+    key = os.path.abspath(path)
+    with _journals_lock:
+        journal = _journals.get(key)
+        if journal is None:
+            journal = _journals[key] = LocalJournal(path, **options)
+        return journal
+
+def release_journal(path):
+    """Ferme et oublie le journal du fichier path s'il a été ouvert (colocation libérée)"""
+    with _journals_lock:
+        journal = _journals.pop(os.path.abspath(path), None)
+    if journal is not None:
+        journal.close()
@@ -0,0 +1,89 @@
+import copy
+from event_log import COMPLETION_KEYS, COMPLETION_KEYS_MAX
+from points_engine import parse_completion_date
+
+# Fusion à trois voies du document : base (version commune), ours (version locale),
+# theirs (version distante écrite entre-temps par une autre instance).
+#   - points des colocataires : les gains sont additifs (theirs + ours - base)
+#   - dernière réalisation d'une tâche : la plus récente l'emporte (avec son auteur)
+#   - autres champs : la valeur modifiée localement l'emporte, sinon la valeur distante
+#   - tâche ou colocataire supprimé d'un côté : supprimé
+#   - clés d'idempotence des réalisations : réunies (les plus récentes sont gardées)
+REALISATION_FIELDS = ('derniere_realisation', 'derniere_realisation_par', 'points_actuels')
+
+_MISSING = object()
+
+def _pick(base, ours, theirs):
+    """Valeur modifiée localement, sinon valeur distante"""
+    return theirs if ours == base else ours
+
+def _merge_fields(base, ours, theirs, skip=()):
+    merged = {}
+    for key in list(theirs) + [k for k in ours if k not in theirs]:
+        if key in skip:
+            continue
+        value = _pick(base.get(key, _MISSING), ours.get(key, _MISSING), theirs.get(key, _MISSING))
+        if value is not _MISSING:
+            merged[key] = value
+    return merged
+
+def _merge_coloc(base, ours, theirs):
+    merged = _merge_fields(base, ours, theirs, skip=('points',))
+    merged['points'] = theirs.get('points', 0) + ours.get('points', 0) - base.get('points', 0)
+    return merged
+
+def _merge_task(base, ours, theirs):
+    merged = _merge_fields(base, ours, theirs, skip=REALISATION_FIELDS)
+    date_ours = parse_completion_date(ours)
+    date_theirs = parse_completion_date(theirs)
+    if date_ours == date_theirs:
+        merged.update(_merge_fields(
+            {k: base[k] for k in REALISATION_FIELDS if k in base},
+            {k: ours[k] for k in REALISATION_FIELDS if k in ours},
+            {k: theirs[k] for k in REALISATION_FIELDS if k in theirs}
+        ))
+    else:
+        # Réalisée des deux côtés : la plus récente l'emporte
+        latest = ours if date_theirs is None or (date_ours is not None and date_ours > date_theirs) else theirs
+        merged.update({k: latest[k] for k in REALISATION_FIELDS if k in latest})
+    return merged
+
+def _merge_entries(base, ours, theirs, merge_entry):
+    """Fusionne deux dictionnaires nom -> fiche (tâches ou colocataires)"""
+    merged = {}
+    for key in list(theirs) + [k for k in ours if k not in theirs]:
+        b, o, t = base.get(key), ours.get(key), theirs.get(key)
+        if o is None or t is None:
+            # Ajouté d'un seul côté : conservé ; supprimé d'un côté : supprimé
+            if b is None:
+                merged[key] = o if t is None else t
+            continue
+        merged[key] = merge_entry(b or {}, o, t)
+    return merged
+
+def merge_documents(base, ours, theirs):
+    """Intègre à theirs les modifications faites dans ours depuis base (nouveau document)"""
+    merged = _merge_fields(base, ours, theirs, skip=('colocataires', 'taches', COMPLETION_KEYS))
+    keys = {**theirs.get(COMPLETION_KEYS, {}), **ours.get(COMPLETION_KEYS, {})}
+    if keys:
+        merged[COMPLETION_KEYS] = dict(sorted(keys.items(), key=lambda item: item[1])[-COMPLETION_KEYS_MAX:])
+    merged['colocataires'] = _merge_entries(base.get('colocataires', {}), ours.get('colocataires', {}),
+                                            theirs.get('colocataires', {}), _merge_coloc)
+    merged['taches'] = _merge_entries(base.get('taches', {}), ours.get('taches', {}),
+                                      theirs.get('taches', {}), _merge_task)
+    return copy.deepcopy(merged)
+
+def guess_base(ours, theirs):
+    """Version commune supposée quand la vraie est inconnue (outbox d'avant un redémarrage)
+
+    Rien n'est écrasé à l'aveugle : les points gardent le plus grand des deux côtés (un gain
+    n'est pas compté deux fois), la réalisation la plus récente l'emporte, les autres champs
+    suivent la version distante et les ajouts locaux sont conservés.
+    """
+    base = {k: v for k, v in ours.items() if k not in ('colocataires', 'taches')}
+    leurs = theirs.get('colocataires', {})
+    base['colocataires'] = {nom: dict(info, points=min(info.get('points', 0), leurs[nom].get('points', 0)))
+                            for nom, info in ours.get('colocataires', {}).items() if nom in leurs}
+    base['taches'] = {nom: info for nom, info in ours.get('taches', {}).items()
+                      if nom in theirs.get('taches', {})}
+    return base
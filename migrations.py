@@ -0,0 +1,50 @@
+# Étapes de migration du document, dans l'ordre : (version atteinte, fonction)
+# Chaque étape est idempotente : la rejouer sur un document déjà migré ne change rien.
+MIGRATIONS = []
+
+def migration(version):
+    """Décorateur : enregistre une étape qui amène le document à la version donnée"""
+    def decorator(func):
+        MIGRATIONS.append((version, func))
+        MIGRATIONS.sort(key=lambda step: step[0])
+        return func
+    return decorator
+
+@migration(1)
+def add_assignments(data):
+    """Ajoute l'attribution des tâches (toutes les tâches pour tous les colocataires)"""
+    for tache_info in data['taches'].values():
+        if 'attribuee_a' not in tache_info:
+            tache_info['attribuee_a'] = list(data['colocataires'])
+            tache_info['derniere_realisation_par'] = None
+
+@migration(2)
+def rename_points(data):
+    """Renomme points en points_base"""
+    for tache_info in data['taches'].values():
+        if 'points_base' not in tache_info and 'points' in tache_info:
+            tache_info['points_base'] = tache_info.pop('points')
+
+@migration(3)
+def add_current_points(data):
+    """Ajoute points_actuels (égal aux points de base)"""
+    for tache_info in data['taches'].values():
+        if 'points_actuels' not in tache_info:
+            tache_info['points_actuels'] = tache_info.get('points_base', 1)
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def needs_migration(data):
+    """Vérifie si le document est antérieur à la version courante du schéma"""
+    return data.get('schema_version', 0) < SCHEMA_VERSION
+
+def migrate(data):
+    """Applique les étapes manquantes et note la version atteinte ; retourne True si le document a changé"""
+    version = data.get('schema_version', 0)
+    if version >= SCHEMA_VERSION:
+        return False
+    for step_version, step in MIGRATIONS:
+        if step_version > version:
+            step(data)
+            data['schema_version'] = step_version
+    return True
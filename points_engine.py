@@ -0,0 +1,120 @@
+import heapq
+import math
+import threading
+from datetime import datetime, timedelta
+
+# +1 point tous les 7 jours sans réalisation, au maximum +3
+BONUS_PERIOD_DAYS = 7
+MAX_BONUS = 3
+
+def parse_completion_date(task_info):
+    """Date de dernière réalisation d'une tâche (None si jamais réalisée ou illisible)"""
+    derniere_realisation = task_info.get('derniere_realisation')
+    if derniere_realisation is None:
+        return None
+    try:
+        derniere_date = datetime.fromisoformat(derniere_realisation)
+    except (TypeError, ValueError):
+        return None
+    if derniere_date.tzinfo is not None:
+        # Les dates de l'application sont en heure locale sans fuseau
+        derniere_date = derniere_date.astimezone().replace(tzinfo=None)
+    return derniere_date
+
+def bonus_at(derniere_date, now):
+    """Bonus d'une tâche réalisée à derniere_date, évalué à now"""
+    if derniere_date is None:
+        return 0
+    return max(0, min(MAX_BONUS, (now - derniere_date).days // BONUS_PERIOD_DAYS))
+
+def next_bonus_change(derniere_date, bonus):
+    """Moment où le bonus passera au palier suivant (None s'il est au maximum)"""
+    if derniere_date is None or bonus >= MAX_BONUS:
+        return None
+    return derniere_date + timedelta(days=BONUS_PERIOD_DAYS * (bonus + 1))
+
+class PointsEngine:
+    """Calcul incrémental des points bonus
+
+    Les dates de réalisation sont analysées une seule fois, et un tas trie les tâches
+    par prochain changement de palier : un rerun ne recalcule que les tâches dont le
+    palier est atteint, et rien du tout si aucune date n'est dépassée.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data = None
+        # tâche -> (date de dernière réalisation, version de l'entrée dans le tas)
+        self.entries = {}
+        self.heap = []
+        self.version = 0
+
+    def _schedule(self, tache, info, now):
+        """Recalcule les points d'une tâche et programme son prochain changement"""
+        derniere_date = parse_completion_date(info)
+        bonus = bonus_at(derniere_date, now)
+        info['points_actuels'] = info.get('points_base', info.get('points', 1)) + bonus
+
+        self.version += 1
+        self.entries[tache] = (derniere_date, self.version)
+        change_at = next_bonus_change(derniere_date, bonus)
+        if change_at is not None:
+            heapq.heappush(self.heap, (change_at, self.version, tache))
+
+        # Purger les entrées périmées quand elles deviennent majoritaires
+        if len(self.heap) > 4 * len(self.entries) + 64:
+            self.heap = [item for item in self.heap if self.entries.get(item[2], (None, None))[1] == item[1]]
+            heapq.heapify(self.heap)
+
+    def rebuild(self, data, now=None):
+        """Indexe toutes les tâches d'un nouveau document"""
+        now = now or datetime.now()
+        with self.lock:
+            self.data = data
+            self.entries = {}
+            self.heap = []
+            for tache, info in data['taches'].items():
+                self._schedule(tache, info, now)
+
+    def refresh(self, data, now=None):
+        """Met à jour les points des tâches dont le palier de bonus est atteint"""
+        now = now or datetime.now()
+        with self.lock:
+            if data is not self.data:
+                self.rebuild(data, now)
+                return data
+
+            while self.heap and self.heap[0][0] <= now:
+                _, version, tache = heapq.heappop(self.heap)
+                entry = self.entries.get(tache)
+                # Entrée périmée (tâche modifiée ou supprimée depuis)
+                if entry is None or entry[1] != version or tache not in data['taches']:
+                    continue
+                self._schedule(tache, data['taches'][tache], now)
+            return data
+
+    def on_event(self, data, event):
+        """Tient l'index à jour après une modification appliquée à data"""
+        with self.lock:
+            if data is not self.data:
+                return
+            if event["type"] in ("app_reset", "tasks_imported", "batch", "remote_merged"):
+                self.rebuild(data)
+            elif event["type"] == "task_deleted":
+                self.entries.pop(event["task"], None)
+            elif event["type"] in ("completion", "task_added", "task_updated"):
+                if event["task"] in data['taches']:
+                    self._schedule(event["task"], data['taches'][event["task"]], datetime.now())
+
+    def next_bonus_in(self, tache, now=None):
+        """Nombre de jours avant le prochain point bonus (None si aucun n'est à venir)"""
+        now = now or datetime.now()
+        with self.lock:
+            entry = self.entries.get(tache)
+            if entry is None:
+                return None
+            derniere_date = entry[0]
+            change_at = next_bonus_change(derniere_date, bonus_at(derniere_date, now))
+            if change_at is None:
+                return None
+            return max(0, math.ceil((change_at - now).total_seconds() / 86400))
@@ -0,0 +1,142 @@
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+
+# Nombre de reruns conservés pour le panneau de profilage
+RING_SIZE = 200
+
+_NULL_SPAN = nullcontext()
+
+def percentile(values, fraction):
+    """Percentile par rang le plus proche (values doit être trié)"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+class Profiler:
+    """Mesures par rerun (durée des étapes, appels réseau, octets transférés)
+
+    Désactivé, chaque point de mesure se réduit à un test de booléen.
+    """
+
+    def __init__(self, ring_size=RING_SIZE):
+        self.enabled = False
+        self.export_path = None
+        self.records = deque(maxlen=ring_size)
+        self.lock = threading.Lock()
+        # Le rerun en cours est propre au thread qui exécute le script de la session
+        self.local = threading.local()
+
+    def configure(self, enabled, export_path=None):
+        self.enabled = enabled
+        self.export_path = export_path
+
+    def _current(self):
+        record = getattr(self.local, "record", None)
+        if record is None:
+            # Mesure hors d'un rerun (thread de synchronisation) : enregistrement isolé
+            return {"ts": datetime.now().isoformat(), "page": "arrière-plan", "spans": {}, "counters": {}}, True
+        return record, False
+
+    def _store(self, record):
+        with self.lock:
+            self.records.append(record)
+            # Sous le verrou : le thread de synchronisation exporte aussi ses mesures
+            if self.export_path:
+                with open(self.export_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def begin_rerun(self, page):
+        if self.enabled:
+            self.local.record = {"ts": datetime.now().isoformat(), "page": page, "spans": {}, "counters": {}}
+            self.local.start = time.perf_counter()
+
+    def end_rerun(self):
+        record = getattr(self.local, "record", None)
+        if record is None:
+            return
+        self.local.record = None
+        record["spans"]["rerun"] = [time.perf_counter() - self.local.start]
+        self._store(record)
+
+    def add_span(self, name, seconds):
+        record, standalone = self._current()
+        record["spans"].setdefault(name, []).append(seconds)
+        if standalone:
+            self._store(record)
+
+    def count(self, name, value=1):
+        """Incrémente un compteur du rerun en cours (appels réseau, octets...)"""
+        if not self.enabled:
+            return
+        record, standalone = self._current()
+        record["counters"][name] = record["counters"].get(name, 0) + value
+        if standalone:
+            self._store(record)
+
+    def span(self, name):
+        """Contexte qui mesure la durée d'une étape"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def summary(self):
+        """Statistiques par étape et moyennes par rerun sur le tampon circulaire"""
+        with self.lock:
+            records = list(self.records)
+        durations = {}
+        reruns = [r for r in records if r["page"] != "arrière-plan"]
+        for record in records:
+            for name, values in record["spans"].items():
+                durations.setdefault(name, []).extend(values)
+
+        stages = []
+        for name, values in sorted(durations.items()):
+            values.sort()
+            stages.append({
+                "étape": name,
+                "appels": len(values),
+                "p50 (ms)": round(percentile(values, 0.5) * 1000, 2),
+                "p95 (ms)": round(percentile(values, 0.95) * 1000, 2)
+            })
+
+        counters = {}
+        for record in reruns:
+            for name, value in record["counters"].items():
+                counters[name] = counters.get(name, 0) + value
+        per_rerun = {name: round(total / len(reruns), 2) for name, total in counters.items()} if reruns else {}
+        return {"reruns": len(reruns), "stages": stages, "per_rerun": per_rerun}
+
+class _Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        # Mesuré aussi quand st.rerun() interrompt l'étape par une exception
+        self.profiler.add_span(self.name, time.perf_counter() - self.start)
+        return False
+
+PROFILER = Profiler()
+
+def profiled(name):
+    """Décorateur : mesure chaque appel de la fonction sous le nom donné"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with _Span(PROFILER, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
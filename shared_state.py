@@ -0,0 +1,97 @@
+import copy
+import threading
+import time
+
+class SharedState:
+    """État des données partagé par toutes les sessions du processus serveur"""
+    
+    def __init__(self):
+        # RLock : save_data peut être appelé alors que l'appelant détient déjà le verrou
+        self.lock = threading.RLock()
+        self.data = None
+        # Version de la source (ETag du Gist ou date de modification du fichier local)
+        self.revision = None
+        self.checked_at = 0.0
+        # Démarrage à chaud : date de la copie locale affichée en attendant la source (None sinon)
+        self.stale_since = None
+        # Copie locale publiée au démarrage à chaud, telle que servie : ancêtre commun de la
+        # première sauvegarde faite dessus avant que la source ait été relue (voir take_stale_base)
+        self.stale_base = None
+        self.refreshing = False
+        # Incrémenté à chaque remplacement des données
+        self.generation = 0
+    
+    def is_stale(self, ttl):
+        """Indique si la source distante doit être revérifiée"""
+        return self.data is None or time.monotonic() - self.checked_at >= ttl
+    
+    def replace(self, data, revision, fresh=True):
+        """Remplace l'état par une nouvelle version des données
+
+        fresh=False : sauvegarde locale faite sur la copie locale, qui reste à fusionner
+        avec la source (l'avertissement de démarrage à chaud reste affiché).
+        """
+        with self.lock:
+            self.data = data
+            self.revision = revision
+            self.checked_at = time.monotonic()
+            if fresh:
+                self.mark_fresh()
+            self.generation += 1
+    
+    def mark_fresh(self):
+        """Les données intègrent la version de la source : fin du démarrage à chaud"""
+        with self.lock:
+            self.stale_since = None
+            self.stale_base = None
+    
+    def take_stale_base(self):
+        """Copie locale dont dérivent les données si la source n'a pas encore été relue (une seule fois)
+
+        La première sauvegarde faite sur la copie locale est fusionnée avec la source à
+        partir de cette version ; les suivantes partent avec elle.
+        """
+        with self.lock:
+            base, self.stale_base = self.stale_base, None
+            return base
+    
+    def serve_stale(self, data, saved_at, fetch):
+        """Publie une copie locale tout de suite et revalide auprès de la source en arrière-plan
+        
+        fetch() retourne (données, révision), ou None si la source est injoignable.
+        """
+        with self.lock:
+            self.replace(data, None)
+            self.stale_since = saved_at
+            self.stale_base = copy.deepcopy(data)
+            self.refreshing = True
+            generation = self.generation
+        threading.Thread(target=self._revalidate, args=(fetch, generation), name="revalidate", daemon=True).start()
+    
+    def _revalidate(self, fetch, generation):
+        try:
+            result = fetch()
+        except Exception:
+            result = None
+        with self.lock:
+            self.refreshing = False
+            if result is None:
+                # Source injoignable : la copie locale reste affichée, nouvel essai après le TTL
+                self.touch()
+            elif self.generation == generation:
+                self.replace(*result)
+            # Sinon une sauvegarde a été faite sur la copie locale entre-temps : son envoi la
+            # fusionne avec la source à partir de la copie locale (stale_base), et la version
+            # fusionnée revient par app.merge_remote_changes
+    
+    def touch(self):
+        """Note que la source vient d'être vérifiée sans changement"""
+        self.checked_at = time.monotonic()
+    
+    def invalidate(self):
+        """Force le rechargement au prochain accès"""
+        with self.lock:
+            self.data = None
+            self.revision = None
+            self.checked_at = 0.0
+            self.mark_fresh()
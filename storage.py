@@ -0,0 +1,481 @@
+import json
+import os
+import sqlite3
+import threading
+import streamlit as st
+from gist_manager import GistManager
+from event_log import (EventLog, DEFAULT_SNAPSHOT_EVERY, EVENTS_FILE, SNAPSHOT_FILE, COMPLETION_KEYS,
+                       RECENT_COMPLETIONS)
+from local_files import (atomic_write, file_lock, get_journal, last_journal_entry, JOURNAL_SUFFIX,
+                         DEFAULT_JOURNAL_WINDOW, DEFAULT_JOURNAL_CHECKPOINT)
+import wire_format
+from migrations import migrate
+
+DATA_FILE = "colocation_data.json"
+SQLITE_FILE = "colocation.db"
+
+class StorageClosed(Exception):
+    """Moteur de stockage fermé : sa colocation a été libérée de la mémoire"""
+
+class Storage:
+    """Interface commune des moteurs de stockage utilisés par load_data/save_data"""
+
+    # True si record() enregistre chaque modification : save_data n'a alors rien à réécrire
+    incremental = False
+    # True une fois close() appelé
+    closed = False
+
+    def load(self):
+        """Retourne le document complet, ou None s'il n'existe pas encore"""
+        raise NotImplementedError
+
+    def save(self, data):
+        """Enregistre le document complet"""
+        raise NotImplementedError
+
+    def record(self, data, event):
+        """Enregistre une modification déjà appliquée à data (moteurs incrémentaux)"""
+
+    def revision(self):
+        """Identifiant peu coûteux de la version stockée (None si inconnu)"""
+        return None
+
+    def load_if_changed(self, known_revision):
+        """Retourne (données, révision) ; données vaut None si known_revision est à jour"""
+        revision = self.revision()
+        if known_revision is not None and revision == known_revision:
+            return None, revision
+        return self.load(), self.revision()
+
+    def history(self, limit=20):
+        """Dernières réalisations, de la plus récente à la plus ancienne (toutes si limit vaut None)"""
+        return []
+
+    def local_snapshot(self):
+        """(données, date d'enregistrement) d'une copie locale affichable en attendant une source lente, ou None"""
+        return None
+
+    def close(self):
+        """Libère les ressources du moteur (colocation évincée) : il n'est plus utilisable ensuite"""
+        self.closed = True
+
+    def _check_open(self):
+        if self.closed:
+            raise StorageClosed("Colocation libérée de la mémoire : rechargez la page")
+
+class JsonFileStorage(Storage):
+    """Document complet dans un fichier JSON local
+
+    Le fichier est remplacé d'un seul coup (fichier temporaire, fsync, renommage) sous un
+    verrou entre processus : ni un arrêt brutal ni deux sauvegardes simultanées ne laissent
+    un fichier tronqué. Avec LOCAL_JOURNAL, les sauvegardes sont ajoutées à un journal
+    (local_files.LocalJournal) et les sauvegardes rapprochées partagent un seul fsync.
+    """
+
+    def __init__(self, path=DATA_FILE, wire_format_name=None, journal=None):
+        self.path = path
+        self.journal_file = f"{path}{JOURNAL_SUFFIX}"
+        self.wire_format = wire_format_name or st.secrets.get("WIRE_FORMAT", wire_format.COMPACT)
+        if journal is None:
+            journal = bool(st.secrets.get("LOCAL_JOURNAL", False))
+        self.journal = None
+        if journal:
+            self.journal = get_journal(
+                path,
+                loads=wire_format.loads,
+                to_file=self._to_file,
+                window=float(st.secrets.get("LOCAL_JOURNAL_WINDOW", DEFAULT_JOURNAL_WINDOW)),
+                checkpoint_every=int(st.secrets.get("LOCAL_JOURNAL_CHECKPOINT", DEFAULT_JOURNAL_CHECKPOINT))
+            )
+
+    def _to_file(self, line):
+        """Contenu du fichier principal pour une ligne du journal (toujours au format compact)"""
+        if self.wire_format == wire_format.COMPACT:
+            return line
+        return wire_format.dumps(wire_format.loads(line), self.wire_format)
+
+    def load(self):
+        with file_lock(self.path, shared=True):
+            # Les sauvegardes du journal sont plus récentes que le fichier principal
+            entry = last_journal_entry(self.journal_file, wire_format.loads)
+            if entry is not None:
+                return entry[1]
+            if not os.path.exists(self.path):
+                return None
+            with open(self.path, 'r', encoding='utf-8') as f:
+                # Ancien fichier indenté ou format compact
+                return wire_format.loads(f.read())
+
+    def save(self, data):
+        if self.journal is not None:
+            self.journal.append(wire_format.dumps(data))
+            return
+        content = wire_format.dumps(data, self.wire_format)
+        with file_lock(self.path):
+            atomic_write(self.path, content)
+            # Journal laissé avec LOCAL_JOURNAL : il masquerait cette version au chargement
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+
+    def revision(self):
+        mtimes = [os.path.getmtime(p) for p in (self.path, self.journal_file) if os.path.exists(p)]
+        return max(mtimes) if mtimes else None
+
+class GistStorage(Storage):
+    """Document complet sur GitHub Gist, avec une copie locale de secours"""
+
+    def __init__(self, sync_worker, backup=None, gist_id=None):
+        # Thread de synchronisation du Gist de la colocation
+        self.sync_worker = sync_worker
+        self.backup = backup or JsonFileStorage()
+        self.gist_id = gist_id
+        self.gist_revision = None
+        # Une sauvegarde commencée avant close() part avant l'arrêt du thread
+        self.lock = threading.Lock()
+
+    def load(self):
+        data, _ = self.load_if_changed(None)
+        return data
+
+    def load_if_changed(self, known_revision):
+        gist_manager = GistManager(gist_id=self.gist_id)
+
+        # Des modifications pas encore envoyées sont plus récentes que le Gist
+        pending = self.sync_worker.pending_snapshot()
+        if pending is not None:
+            if known_revision is not None:
+                return None, known_revision
+            return pending, self.gist_revision
+
+        data = gist_manager.load_data_from_gist()
+        if data is not None:
+            self.gist_revision = gist_manager.revision
+            if known_revision is not None and self.gist_revision == known_revision:
+                return None, known_revision
+            return data, self.gist_revision
+
+        st.warning("⚠️ Impossible de charger depuis GitHub Gist, utilisation des données locales")
+        return self.backup.load_if_changed(known_revision)
+
+    def local_snapshot(self):
+        # La version en attente d'envoi (outbox) est plus récente que la copie locale
+        if self.sync_worker.has_pending():
+            return self.sync_worker.pending_snapshot(), self.backup.revision()
+        data = self.backup.load()
+        if data is None:
+            return None
+        return data, self.backup.revision()
+
+    def load_remote(self):
+        """(données migrées, révision) du Gist sans repli sur la copie locale ni message ; None si injoignable
+
+        Utilisé hors d'une page (revalidation en arrière-plan).
+        """
+        # Des modifications pas encore envoyées sont plus récentes que le Gist
+        pending = self.sync_worker.pending_snapshot()
+        if pending is not None:
+            return pending, self.gist_revision
+
+        gist_manager = GistManager(show_errors=False, gist_id=self.gist_id)
+        data = gist_manager.load_data_from_gist()
+        if data is None:
+            return None
+        self.gist_revision = gist_manager.revision
+        if migrate(data):
+            # Migration faite une seule fois : la version à jour part aussi vers le Gist
+            self.save(data)
+        else:
+            # La copie locale suit le Gist : le prochain démarrage à chaud sera plus récent
+            self.backup.save(data)
+        return data, self.gist_revision
+
+    def save(self, data, base=None):
+        """base : (révision, document) dont data est issu (voir SyncWorker.enqueue)"""
+        with self.lock:
+            # Thread de synchronisation arrêté : la version ne partirait plus
+            self._check_open()
+            # Sauvegarder localement aussi (backup)
+            self.backup.save(data)
+            # L'envoi sur GitHub Gist se fait en arrière-plan : la page n'attend pas GitHub
+            self.sync_worker.enqueue(data, base)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+
+    def revision(self):
+        return self.gist_revision
+
+class EventLogStorage(Storage):
+    """Journal d'événements en ajout seul (voir event_log.py)"""
+
+    incremental = True
+
+    def __init__(self, initial_data, snapshot_every=DEFAULT_SNAPSHOT_EVERY,
+                 log_file=EVENTS_FILE, snapshot_file=SNAPSHOT_FILE):
+        self.event_log = EventLog(log_file, snapshot_file, snapshot_every=snapshot_every)
+        self.event_log.load(initial_data)
+
+    def load(self):
+        # L'état du journal est modifié sur place par record_event
+        return self.event_log.state
+
+    def save(self, data):
+        self.event_log.compact()
+
+    def record(self, data, event):
+        # data est l'état du journal : l'événement y est déjà appliqué
+        self.event_log.append(event, apply=False)
+
+    def revision(self):
+        # Rattrape les événements écrits par un autre processus (import de convert_tasks.py)
+        return self.event_log.refresh()
+
+    def history(self, limit=20):
+        if limit is not None and limit <= RECENT_COMPLETIONS:
+            # Page des scores : dernières réalisations gardées en mémoire
+            return self.event_log.recent_completions(limit)
+        # Export complet : lecture de tout le journal
+        realisations = list(self.event_log.history(event_type="completion"))
+        if limit is not None:
+            realisations = realisations[-limit:]
+        return list(reversed(realisations))
+
+class SQLiteStorage(Storage):
+    """Base SQLite indexée : une réalisation est une transaction d'une ligne"""
+
+    incremental = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            cle TEXT PRIMARY KEY,
+            valeur TEXT
+        );
+        CREATE TABLE IF NOT EXISTS colocataires (
+            nom TEXT PRIMARY KEY,
+            points INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS taches (
+            nom TEXT PRIMARY KEY,
+            lieu TEXT NOT NULL,
+            points_base INTEGER NOT NULL,
+            points_actuels INTEGER NOT NULL,
+            derniere_realisation TEXT,
+            derniere_realisation_par TEXT,
+            position INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS attributions (
+            tache TEXT NOT NULL REFERENCES taches(nom) ON DELETE CASCADE ON UPDATE CASCADE,
+            colocataire TEXT NOT NULL,
+            PRIMARY KEY (tache, colocataire)
+        );
+        CREATE TABLE IF NOT EXISTS realisations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tache TEXT NOT NULL,
+            colocataire TEXT NOT NULL,
+            points INTEGER NOT NULL,
+            date TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_taches_lieu ON taches(lieu);
+        CREATE INDEX IF NOT EXISTS idx_attributions_colocataire ON attributions(colocataire);
+        CREATE INDEX IF NOT EXISTS idx_realisations_date ON realisations(date);
+        CREATE INDEX IF NOT EXISTS idx_realisations_colocataire ON realisations(colocataire, date);
+    """
+
+    def __init__(self, initial_data, path=SQLITE_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(self.SCHEMA)
+
+        # Première utilisation : importer le document existant
+        if self.revision() is None:
+            self.save(initial_data())
+
+    def _bump_revision(self):
+        self.conn.execute(
+            "INSERT INTO meta (cle, valeur) VALUES ('revision', '1') "
+            "ON CONFLICT(cle) DO UPDATE SET valeur = CAST(valeur AS INTEGER) + 1"
+        )
+
+    def _insert_task(self, nom, info, position):
+        self.conn.execute(
+            "INSERT INTO taches (nom, lieu, points_base, points_actuels, derniere_realisation, "
+            "derniere_realisation_par, position) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (nom, info['lieu'], info.get('points_base', 1), info.get('points_actuels', info.get('points_base', 1)),
+             info.get('derniere_realisation'), info.get('derniere_realisation_par'), position)
+        )
+        self.conn.executemany(
+            "INSERT INTO attributions (tache, colocataire) VALUES (?, ?)",
+            [(nom, coloc) for coloc in info.get('attribuee_a', [])]
+        )
+
+    def load(self):
+        with self.lock:
+            self._check_open()
+            data = {"colocataires": {}, "taches": {}}
+            for row in self.conn.execute("SELECT nom, points FROM colocataires ORDER BY rowid"):
+                data['colocataires'][row['nom']] = {"points": row['points']}
+            attributions = {}
+            for row in self.conn.execute("SELECT tache, colocataire FROM attributions ORDER BY rowid"):
+                attributions.setdefault(row['tache'], []).append(row['colocataire'])
+            for row in self.conn.execute("SELECT * FROM taches ORDER BY position"):
+                data['taches'][row['nom']] = {
+                    "points_base": row['points_base'],
+                    "lieu": row['lieu'],
+                    "derniere_realisation": row['derniere_realisation'],
+                    "points_actuels": row['points_actuels'],
+                    "attribuee_a": attributions.get(row['nom'], []),
+                    "derniere_realisation_par": row['derniere_realisation_par']
+                }
+            for row in self.conn.execute("SELECT cle, valeur FROM meta WHERE cle != 'revision'"):
+                data[row['cle']] = json.loads(row['valeur'])
+            return data
+
+    def save(self, data):
+        """Réécrit tout le contenu (import initial et réinitialisation)"""
+        with self.lock, self.conn:
+            self._check_open()
+            self.conn.execute("DELETE FROM attributions")
+            self.conn.execute("DELETE FROM taches")
+            self.conn.execute("DELETE FROM colocataires")
+            self.conn.execute("DELETE FROM meta WHERE cle != 'revision'")
+            self.conn.executemany(
+                "INSERT INTO colocataires (nom, points) VALUES (?, ?)",
+                [(nom, info.get('points', 0)) for nom, info in data['colocataires'].items()]
+            )
+            for position, (nom, info) in enumerate(data['taches'].items()):
+                self._insert_task(nom, info, position)
+            self.conn.executemany(
+                "INSERT INTO meta (cle, valeur) VALUES (?, ?)",
+                [(cle, json.dumps(valeur, ensure_ascii=False)) for cle, valeur in data.items()
+                 if cle not in ('colocataires', 'taches')]
+            )
+            self._bump_revision()
+
+    def record(self, data, event):
+        event_type = event["type"]
+        if event_type in ("app_reset", "tasks_imported", "batch", "remote_merged"):
+            # Réécriture complète, dans une seule transaction
+            self.save(data)
+            return
+
+        with self.lock, self.conn:
+            self._check_open()
+            if event_type == "completion":
+                self.conn.execute(
+                    "UPDATE colocataires SET points = points + ? WHERE nom = ?",
+                    (event["points"], event["user"])
+                )
+                self.conn.execute(
+                    "UPDATE taches SET derniere_realisation = ?, derniere_realisation_par = ?, "
+                    "points_actuels = points_base WHERE nom = ?",
+                    (event["ts"], event["user"], event["task"])
+                )
+                self.conn.execute(
+                    "INSERT INTO realisations (tache, colocataire, points, date) VALUES (?, ?, ?, ?)",
+                    (event["task"], event["user"], event["points"], event["ts"])
+                )
+                if event.get("key") is not None:
+                    # Fenêtre des clés d'idempotence, dans la même transaction que les points
+                    self.conn.execute(
+                        "INSERT INTO meta (cle, valeur) VALUES (?, ?) "
+                        "ON CONFLICT(cle) DO UPDATE SET valeur = excluded.valeur",
+                        (COMPLETION_KEYS, json.dumps(data[COMPLETION_KEYS], ensure_ascii=False))
+                    )
+
+            elif event_type == "task_added":
+                position = self.conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM taches").fetchone()[0]
+                self.conn.execute("DELETE FROM taches WHERE nom = ?", (event["task"],))
+                self._insert_task(event["task"], data['taches'][event["task"]], position)
+
+            elif event_type == "task_updated":
+                info = data['taches'][event["task"]]
+                self.conn.execute(
+                    "UPDATE taches SET lieu = ?, points_base = ?, points_actuels = ? WHERE nom = ?",
+                    (info['lieu'], info['points_base'], info['points_actuels'], event["task"])
+                )
+                if 'attribuee_a' in event["changes"]:
+                    self.conn.execute("DELETE FROM attributions WHERE tache = ?", (event["task"],))
+                    self.conn.executemany(
+                        "INSERT INTO attributions (tache, colocataire) VALUES (?, ?)",
+                        [(event["task"], coloc) for coloc in info['attribuee_a']]
+                    )
+
+            elif event_type == "task_deleted":
+                self.conn.execute("DELETE FROM taches WHERE nom = ?", (event["task"],))
+
+            elif event_type == "coloc_added":
+                self.conn.execute(
+                    "INSERT INTO colocataires (nom, points) VALUES (?, 0) "
+                    "ON CONFLICT(nom) DO UPDATE SET points = 0",
+                    (event["name"],)
+                )
+
+            elif event_type == "coloc_deleted":
+                self.conn.execute("DELETE FROM colocataires WHERE nom = ?", (event["name"],))
+
+            elif event_type == "scores_reset":
+                self.conn.execute("UPDATE colocataires SET points = 0")
+
+            self._bump_revision()
+
+    def revision(self):
+        with self.lock:
+            self._check_open()
+            row = self.conn.execute("SELECT valeur FROM meta WHERE cle = 'revision'").fetchone()
+            return None if row is None else int(row['valeur'])
+
+    def history(self, limit=20):
+        with self.lock:
+            self._check_open()
+            rows = self.conn.execute(
+                "SELECT tache, colocataire, points, date FROM realisations ORDER BY date DESC, id DESC LIMIT ?",
+                (-1 if limit is None else limit,)
+            ).fetchall()
+        return [
+            {"type": "completion", "task": row['tache'], "user": row['colocataire'],
+             "points": row['points'], "ts": row['date']}
+            for row in rows
+        ]
+
+    def close(self):
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                self.conn.close()
+
+def get_backend_name(gist_id=None):
+    """Nom du moteur choisi dans les secrets (STORAGE_BACKEND) ; gist_id : Gist de la colocation"""
+    backend = st.secrets.get("STORAGE_BACKEND", None)
+    # Compatibilité avec l'ancien réglage STORAGE_MODE = "events"
+    if backend is None and st.secrets.get("STORAGE_MODE", None) == "events":
+        backend = "events"
+    if backend is None:
+        backend = "gist" if GistManager(gist_id=gist_id).is_configured() else "json"
+    if backend == "gist" and not GistManager(gist_id=gist_id).is_configured():
+        backend = "json"
+    return backend
+
+def create_storage(backend, initial_data, tenant):
+    """Crée le moteur de stockage d'une colocation (fichiers dans son répertoire, voir tenants.py)
+
+    initial_data fournit le document de départ des moteurs incrémentaux.
+    """
+    if backend == "gist":
+        return GistStorage(tenant.sync_worker, JsonFileStorage(tenant.path(DATA_FILE)), tenant.gist_id)
+    if backend == "json":
+        return JsonFileStorage(tenant.path(DATA_FILE))
+    if backend == "events":
+        return EventLogStorage(
+            initial_data,
+            snapshot_every=int(st.secrets.get("EVENT_SNAPSHOT_EVERY", DEFAULT_SNAPSHOT_EVERY)),
+            log_file=tenant.path(EVENTS_FILE),
+            snapshot_file=tenant.path(SNAPSHOT_FILE)
+        )
+    if backend == "sqlite":
+        return SQLiteStorage(initial_data, path=tenant.path(st.secrets.get("SQLITE_FILE", SQLITE_FILE)))
+    raise ValueError(f"Moteur de stockage inconnu : {backend}")
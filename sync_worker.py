@@ -0,0 +1,263 @@
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from gist_manager import GistManager
+from github_client import get_github_client
+from merge import merge_documents
+
+# Fichier où est conservée la dernière version non synchronisée (survit aux redémarrages),
+# avec la version du Gist dont elle est issue : {"format", "data", "base", "base_revision"}
+OUTBOX_FILE = "colocation_outbox.json"
+OUTBOX_FORMAT = "taskgame-outbox"
+
+# Délais de réessai après un échec : 2s, 4s, 8s... plafonnés à 5 minutes
+RETRY_BASE_DELAY = 2
+RETRY_MAX_DELAY = 300
+
+# Les sauvegardes rapprochées sont regroupées en un seul envoi : l'envoi part après
+# SYNC_WINDOW secondes sans nouvelle modification, ou dès SYNC_MAX_BATCH modifications
+DEFAULT_SYNC_WINDOW = 2
+DEFAULT_SYNC_MAX_BATCH = 20
+
+class SyncWorker:
+    """Envoie les sauvegardes vers le Gist GitHub depuis un thread en arrière-plan"""
+
+    def __init__(self, outbox_file=OUTBOX_FILE, window=DEFAULT_SYNC_WINDOW, max_batch=DEFAULT_SYNC_MAX_BATCH,
+                 gist_id=None):
+        self.outbox_file = outbox_file
+        # Gist de destination (None : secret GIST_ID)
+        self.gist_id = gist_id
+        self.window = window
+        self.max_batch = max_batch
+        self.condition = threading.Condition()
+        # Dernier document à envoyer, sérialisé au moment de la sauvegarde
+        self.pending = None
+        # Version du Gist dont il est issu (ancêtre commun de la fusion) : révision et
+        # document sérialisé, ou None si inconnue
+        self.base_revision = None
+        self.base = None
+        # Nombre de sauvegardes regroupées dans le prochain envoi
+        self.batch_size = 0
+        self.last_enqueue = 0.0
+        self.flush_requested = False
+        self.uploads = 0
+        self.failures = 0
+        self.next_attempt = 0.0
+        self.last_error = None
+        self.last_sync = None
+        # Envois fusionnés avec une version distante écrite par une autre instance
+        self.merges = 0
+        # on_merge(envoyé, fusionné) : appelé après une fusion pour y rattacher les données
+        # locales ; doit appeler rebase_pending (par défaut, seule la version en attente est fusionnée)
+        self.on_merge = None
+        # Version envoyée dont les données locales restent issues quand on_merge a échoué
+        # (révision inconnue, None) : base des envois suivants à la place de la version en cache
+        self.local_base = None
+        self.stopped = False
+
+        self._load_outbox()
+        self.thread = threading.Thread(target=self._run, name="gist-sync", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def _load_outbox(self):
+        """Reprend une sauvegarde restée en attente avant un redémarrage"""
+        if not os.path.exists(self.outbox_file):
+            return
+        try:
+            with open(self.outbox_file, 'r', encoding='utf-8') as f:
+                outbox = json.load(f)
+            if outbox.get("format") == OUTBOX_FORMAT:
+                self.pending = json.dumps(outbox["data"], ensure_ascii=False)
+                if outbox.get("base") is not None:
+                    self.base = json.dumps(outbox["base"], ensure_ascii=False)
+                    self.base_revision = outbox.get("base_revision")
+            else:
+                # Ancienne outbox : le document seul, sans version de base
+                self.pending = json.dumps(outbox, ensure_ascii=False)
+        except (OSError, ValueError, KeyError, AttributeError):
+            # Outbox illisible : la sauvegarde locale reste la référence
+            self.pending = None
+
+    def _write_outbox(self):
+        """Écrit l'outbox (version en attente et sa base) sur disque de façon atomique"""
+        content = (f'{{"format": "{OUTBOX_FORMAT}", "data": {self.pending}, "base": {self.base or "null"}, '
+                   f'"base_revision": {json.dumps(self.base_revision)}}}')
+        tmp_file = f"{self.outbox_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.outbox_file)
+
+    def _set_base(self, version):
+        """Mémorise la version du Gist (révision, document) dont la version en attente est issue"""
+        if version is None:
+            self.base_revision = self.base = None
+        else:
+            self.base_revision = version[0]
+            self.base = json.dumps(version[1], ensure_ascii=False)
+
+    def _clear_outbox(self):
+        try:
+            os.remove(self.outbox_file)
+        except FileNotFoundError:
+            pass
+
+    def enqueue(self, data, base=None):
+        """Programme l'envoi d'une version des données sans attendre GitHub
+
+        base : (révision, document) dont data est issu, si ce n'est pas la version en cache
+        du Gist (copie locale d'un démarrage à chaud : révision inconnue, None).
+        """
+        content = json.dumps(data, ensure_ascii=False)
+        with self.condition:
+            if self.pending is None:
+                # Version du Gist sur laquelle la modification a été faite (celle en cache)
+                # (ou celle dont les données locales sont restées issues après un échec de on_merge)
+                self._set_base(base or self.local_base
+                               or GistManager(show_errors=False, gist_id=self.gist_id).cached_version())
+            # Chaque sauvegarde contient le document complet : la plus récente remplace les
+            # autres, et reste issue de la même version du Gist
+            self.pending = content
+            self.batch_size += 1
+            self.last_enqueue = time.monotonic()
+            self._write_outbox()
+            self.condition.notify_all()
+
+    def flush(self, timeout=10):
+        """Envoie immédiatement la version en attente et attend la fin de l'envoi"""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.flush_requested = True
+            self.condition.notify_all()
+            while self.pending is not None and time.monotonic() < deadline:
+                self.condition.wait(deadline - time.monotonic())
+            self.flush_requested = False
+            return self.pending is None
+
+    def stop(self, timeout=10):
+        """Envoie la version en attente puis arrête le thread (colocation libérée de la mémoire)
+
+        Une version qui n'a pas pu partir reste dans l'outbox et sera reprise au prochain chargement.
+        """
+        self.flush(timeout)
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        atexit.unregister(self.flush)
+        self.thread.join(timeout=1)
+
+    def pending_snapshot(self):
+        """Retourne une copie de la version en attente d'envoi, ou None"""
+        with self.condition:
+            if self.pending is None:
+                return None
+            return json.loads(self.pending)
+
+    def rebase_pending(self, sent, merged):
+        """Rattache la version en attente (modifiée après sent) au document fusionné"""
+        with self.condition:
+            if self.pending is None:
+                return
+            self.pending = json.dumps(merge_documents(sent, json.loads(self.pending), merged), ensure_ascii=False)
+            self._write_outbox()
+
+    def has_pending(self):
+        with self.condition:
+            return self.pending is not None
+
+    def status(self):
+        """Résumé de l'état de synchronisation pour l'affichage"""
+        with self.condition:
+            retry_in = max(0, int(self.next_attempt - time.monotonic())) if self.failures else 0
+            return {
+                "pending": self.pending is not None,
+                "batch_size": self.batch_size,
+                "uploads": self.uploads,
+                "failures": self.failures,
+                "retry_in": retry_in,
+                "last_error": self.last_error,
+                "last_sync": self.last_sync,
+                "merges": self.merges
+            }
+
+    def _next_send_time(self):
+        """Moment où la version en attente peut partir (None si rien à envoyer)"""
+        if self.pending is None:
+            return None
+        if self.flush_requested or self.batch_size >= self.max_batch:
+            return self.next_attempt
+        return max(self.next_attempt, self.last_enqueue + self.window)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                send_at = self._next_send_time()
+                while not self.stopped and (send_at is None or time.monotonic() < send_at):
+                    self.condition.wait(None if send_at is None else send_at - time.monotonic())
+                    send_at = self._next_send_time()
+                if self.stopped:
+                    return
+                content = self.pending
+                base = None if self.base is None else (self.base_revision, json.loads(self.base))
+                batch_size = self.batch_size
+
+            gist_manager = GistManager(show_errors=False, gist_id=self.gist_id)
+            success = gist_manager.save_data_to_gist(json.loads(content), base)
+
+            with self.condition:
+                if success:
+                    self.uploads += 1
+                    if gist_manager.merged is not None:
+                        self.merges += 1
+                    self.batch_size = max(0, self.batch_size - batch_size)
+                    self.failures = 0
+                    self.next_attempt = 0.0
+                    self.last_error = None
+                    self.last_sync = datetime.now()
+                    # Une sauvegarde plus récente a pu arriver pendant l'envoi
+                    if self.pending == content:
+                        self.pending = None
+                        self.batch_size = 0
+                        self._set_base(None)
+                        self._clear_outbox()
+                    else:
+                        # La version suivante est désormais issue de celle qui vient de partir
+                        self._set_base(gist_manager.cached_version())
+                        self._write_outbox()
+                    self.condition.notify_all()
+                else:
+                    self.failures += 1
+                    self.last_error = gist_manager.last_error
+                    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (self.failures - 1))
+                    # Quota GitHub épuisé : attendre son renouvellement plutôt qu'insister
+                    delay = max(delay, get_github_client().wait_time())
+                    self.next_attempt = time.monotonic() + delay
+
+            if success and gist_manager.merged is not None:
+                self._after_merge(json.loads(content), gist_manager.merged)
+
+    def _after_merge(self, sent, merged):
+        """Rattache les données locales au document fusionné sans jamais arrêter le thread"""
+        try:
+            # Hors du verrou : on_merge prend le verrou de l'état partagé avant celui-ci
+            if self.on_merge is not None:
+                self.on_merge(sent, merged)
+            else:
+                self.rebase_pending(sent, merged)
+        except Exception as e:
+            # Les données locales restent issues de la version envoyée : elle sert de base
+            # aux envois suivants, qui refont la fusion avec le Gist
+            with self.condition:
+                self.last_error = f"Erreur lors de la fusion locale : {e}"
+                self.local_base = (None, sent)
+                if self.pending is not None:
+                    self._set_base(self.local_base)
+                    self._write_outbox()
+        else:
+            with self.condition:
+                self.local_base = None
@@ -0,0 +1,138 @@
+import threading
+import unicodedata
+
+def search_key(text):
+    """Texte normalisé pour la recherche : minuscules, sans accents ni espaces superflus"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return " ".join("".join(c for c in decomposed if not unicodedata.combining(c)).split())
+
+class TaskIndex:
+    """Index secondaires des tâches : par lieu et, pour chaque colocataire, ses tâches par lieu
+
+    Les tâches gardent l'ordre du document (position d'insertion). L'index est tenu à jour
+    par les événements et reconstruit seulement quand un nouveau document est chargé.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data = None
+        # tâche -> (position, lieu, colocataires)
+        self.tasks = {}
+        # tâche -> nom normalisé pour la recherche
+        self.search_keys = {}
+        # lieu -> {tâche: None} trié par position
+        self.by_lieu = {}
+        # colocataire -> lieu -> {tâche: None} trié par position
+        self.by_user = {}
+        self.next_position = 0
+
+    def _add(self, tache, info, position):
+        lieu = info['lieu']
+        colocataires = tuple(info.get('attribuee_a', []))
+        self.tasks[tache] = (position, lieu, colocataires)
+        self.search_keys[tache] = search_key(tache)
+        self._insert(self.by_lieu, lieu, tache, position)
+        for coloc in colocataires:
+            self._insert(self.by_user.setdefault(coloc, {}), lieu, tache, position)
+
+    def _insert(self, groups, lieu, tache, position):
+        group = groups.setdefault(lieu, {})
+        last = next(reversed(group), None)
+        group[tache] = None
+        # Cas courant : la tâche est la plus récente, l'ordre est déjà bon
+        if last is not None and self.tasks[last][0] > position:
+            groups[lieu] = dict.fromkeys(sorted(group, key=lambda t: self.tasks[t][0]))
+
+    def _remove(self, tache):
+        entry = self.tasks.get(tache)
+        if entry is None:
+            return None
+        position, lieu, colocataires = entry
+        self._discard(self.by_lieu, lieu, tache)
+        for coloc in colocataires:
+            self._discard(self.by_user.get(coloc, {}), lieu, tache)
+        del self.tasks[tache]
+        del self.search_keys[tache]
+        return position
+
+    def _discard(self, groups, lieu, tache):
+        group = groups.get(lieu)
+        if group is not None:
+            group.pop(tache, None)
+            if not group:
+                del groups[lieu]
+
+    def rebuild(self, data):
+        """Indexe toutes les tâches d'un nouveau document"""
+        with self.lock:
+            self.data = data
+            self.tasks = {}
+            self.search_keys = {}
+            self.by_lieu = {}
+            self.by_user = {}
+            for position, (tache, info) in enumerate(data['taches'].items()):
+                self._add(tache, info, position)
+            self.next_position = len(data['taches'])
+
+    def sync(self, data):
+        """Reconstruit l'index si data est un autre document que celui indexé"""
+        with self.lock:
+            if data is not self.data:
+                self.rebuild(data)
+
+    def on_event(self, data, event):
+        """Tient l'index à jour après une modification appliquée à data"""
+        with self.lock:
+            if data is not self.data:
+                return
+            event_type = event["type"]
+            if event_type in ("app_reset", "tasks_imported", "batch", "remote_merged"):
+                self.rebuild(data)
+            elif event_type == "task_deleted":
+                self._remove(event["task"])
+            elif event_type == "task_added":
+                position = self._remove(event["task"])
+                if position is None:
+                    position = self.next_position
+                    self.next_position += 1
+                self._add(event["task"], data['taches'][event["task"]], position)
+            elif event_type == "task_updated":
+                if event["task"] in data['taches']:
+                    position = self._remove(event["task"])
+                    if position is None:
+                        position = self.next_position
+                        self.next_position += 1
+                    self._add(event["task"], data['taches'][event["task"]], position)
+
+    def _groups(self, user):
+        return self.by_lieu if user is None else self.by_user.get(user, {})
+
+    def lieux(self, user=None):
+        """Lieux dans l'ordre de leur première tâche (ceux où user a une tâche si précisé)"""
+        with self.lock:
+            groups = self._groups(user)
+            return sorted(groups, key=lambda lieu: self.tasks[next(iter(groups[lieu]))][0])
+
+    def tasks_in(self, lieu, user=None):
+        """Tâches d'un lieu, dans l'ordre du document (celles de user si précisé)"""
+        with self.lock:
+            return list(self._groups(user).get(lieu, ()))
+
+    def search(self, text=None, lieu=None, user=None):
+        """(lieu, tâche) filtrés par texte, lieu et colocataire, dans l'ordre d'affichage"""
+        with self.lock:
+            groups = self._groups(user)
+            lieux = self.lieux(user) if lieu is None else [lieu]
+            needle = search_key(text) if text else ""
+            return [
+                (l, tache)
+                for l in lieux
+                for tache in groups.get(l, ())
+                if needle in self.search_keys[tache]
+            ]
+
+    def is_available(self, tache, user):
+        """Vérifie si une tâche est attribuée à un colocataire"""
+        with self.lock:
+            entry = self.tasks.get(tache)
+            return entry is not None and tache in self.by_user.get(user, {}).get(entry[1], ())
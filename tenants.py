@@ -0,0 +1,311 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+import streamlit as st
+from shared_state import SharedState
+from points_engine import PointsEngine
+from task_index import TaskIndex
+from sync_worker import SyncWorker, OUTBOX_FILE, DEFAULT_SYNC_WINDOW, DEFAULT_SYNC_MAX_BATCH
+from gist_manager import GistManager
+from local_files import release_journal
+from storage import DATA_FILE
+
+# Une colocation est choisie par le paramètre d'URL ?maison=<identifiant>. Sans paramètre,
+# c'est la colocation par défaut : fichiers du répertoire courant et secret GIST_ID,
+# comme une installation pour une seule maison.
+TENANT_PARAM = "maison"
+DEFAULT_TENANT = "default"
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+# Les fichiers des autres colocations sont rangés dans <TENANTS_DIR>/<identifiant>/
+DEFAULT_TENANTS_DIR = "maisons"
+
+# Colocations gardées en mémoire : au-delà de MAX_TENANTS ou de MAX_TENANTS_MEMORY_MB, les
+# moins récemment utilisées sont libérées, comme celles inutilisées depuis TENANT_TTL secondes
+DEFAULT_MAX_TENANTS = 50
+DEFAULT_TENANT_TTL = 1800
+DEFAULT_MAX_TENANTS_MEMORY_MB = 256
+# Un document chargé occupe en mémoire (dictionnaires Python, index, moteur de points)
+# environ ce multiple de sa taille en JSON
+MEMORY_FACTOR = 10
+
+class UnknownTenant(Exception):
+    """Identifiant de colocation invalide ou non autorisé"""
+
+class TenantClosed(Exception):
+    """Colocation libérée de la mémoire : ses ressources ne sont plus utilisables"""
+
+class Tenant:
+    """Ressources d'une colocation : état partagé, index, moteur de points, stockage et synchronisation"""
+
+    def __init__(self, tenant_id, directory=None, gist_id=None, sync_window=DEFAULT_SYNC_WINDOW,
+                 sync_max_batch=DEFAULT_SYNC_MAX_BATCH):
+        self.id = tenant_id
+        # Répertoire des fichiers locaux (None : répertoire courant)
+        self.directory = directory
+        # Gist de la colocation (chaîne vide : pas de Gist)
+        self.gist_id = gist_id
+        self.sync_window = sync_window
+        self.sync_max_batch = sync_max_batch
+        self.lock = threading.RLock()
+        self.state = SharedState()
+        self.points_engine = PointsEngine()
+        self.task_index = TaskIndex()
+        # Créés au premier usage (voir app.get_storage)
+        self.storage = None
+        self._sync_worker = None
+        # Définitif : une colocation libérée est remplacée par une nouvelle (voir TenantCache)
+        self.closed = False
+        self.last_used = time.monotonic()
+        self._size = (None, 0)
+
+    def path(self, filename):
+        """Chemin d'un fichier local de la colocation"""
+        if self.directory is None:
+            return filename
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, os.path.basename(filename))
+
+    def ensure_open(self):
+        """Lève TenantClosed si la colocation a été libérée"""
+        if self.closed:
+            raise TenantClosed(f"Colocation {self.id} libérée de la mémoire : rechargez la page")
+
+    @property
+    def sync_worker(self):
+        """Thread de synchronisation avec le Gist de la colocation, démarré au premier usage"""
+        with self.lock:
+            self.ensure_open()
+            if self._sync_worker is None:
+                self._sync_worker = SyncWorker(self.path(OUTBOX_FILE), self.sync_window,
+                                               self.sync_max_batch, gist_id=self.gist_id)
+            return self._sync_worker
+
+    def memory_estimate(self):
+        """Taille approximative en mémoire, en octets (recalculée quand le document change)"""
+        generation, size = self._size
+        if generation != self.state.generation:
+            data = self.state.data
+            size = 0 if data is None else len(json.dumps(data, ensure_ascii=False)) * MEMORY_FACTOR
+            self._size = (self.state.generation, size)
+        return size
+
+    def close(self):
+        """Libère la colocation : le stockage est fermé, la dernière version est envoyée au Gist
+        avant l'arrêt du thread, puis le document en cache du Gist et le journal local sont oubliés"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            worker = self._sync_worker
+            self._sync_worker = None
+        if self.storage is not None:
+            # Plus aucune sauvegarde ne peut viser le thread après son arrêt
+            self.storage.close()
+        if worker is not None:
+            worker.stop()
+        if self.gist_id:
+            GistManager(show_errors=False, gist_id=self.gist_id).invalidate_cache()
+        release_journal(self.path(DATA_FILE))
+
+class TenantCloser:
+    """Thread qui libère les colocations évincées : leur arrêt attend l'envoi des dernières
+    modifications au Gist (jusqu'à 10 s), pas la page du visiteur qui a provoqué l'éviction"""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def close(self, tenants):
+        for tenant in tenants:
+            self.queue.put(tenant)
+        with self.lock:
+            if self.thread is None and tenants:
+                self.thread = threading.Thread(target=self._run, name="tenant-closer", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            tenant = self.queue.get()
+            try:
+                tenant.close()
+            except Exception:
+                # Les modifications pas encore envoyées restent dans l'outbox de la colocation
+                pass
+            finally:
+                self.queue.task_done()
+
+    def wait(self):
+        """Attend que les colocations évincées soient toutes libérées"""
+        self.queue.join()
+
+class TenantCache:
+    """Colocations chargées en mémoire, libérées par ordre d'utilisation (LRU), d'inactivité
+    (TTL) ou de mémoire occupée
+
+    Une colocation libérée est rechargée depuis son stockage à la visite suivante.
+    """
+
+    def __init__(self, factory, max_tenants=DEFAULT_MAX_TENANTS, ttl=DEFAULT_TENANT_TTL,
+                 max_memory=DEFAULT_MAX_TENANTS_MEMORY_MB * 1024 * 1024):
+        self.factory = factory
+        self.max_tenants = max_tenants
+        self.ttl = ttl
+        self.max_memory = max_memory
+        self.lock = threading.Lock()
+        # identifiant -> Tenant, du moins récemment utilisé au plus récent
+        self.tenants = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+        self.closer = TenantCloser()
+
+    def get(self, tenant_id):
+        """Colocation chargée (ou créée) ; les colocations en trop sont libérées"""
+        now = time.monotonic()
+        with self.lock:
+            tenant = self.tenants.get(tenant_id)
+            new = tenant is None
+            if new:
+                tenant = self.tenants[tenant_id] = self.factory(tenant_id)
+                self.loads += 1
+            else:
+                self.tenants.move_to_end(tenant_id)
+            tenant.last_used = now
+            evicted = self._evict(now, check_memory=new)
+        # En arrière-plan : l'arrêt attend l'envoi des dernières modifications
+        self.closer.close(evicted)
+        return tenant
+
+    def _evict(self, now, check_memory):
+        evicted = []
+        # Les plus anciennes sont en tête : on s'arrête à la première encore active
+        while len(self.tenants) > 1:
+            tenant_id, tenant = next(iter(self.tenants.items()))
+            if len(self.tenants) <= self.max_tenants and now - tenant.last_used < self.ttl:
+                break
+            evicted.append(self.tenants.pop(tenant_id))
+        if check_memory:
+            # Seulement à l'arrivée d'une nouvelle colocation : l'estimation parcourt les documents
+            total = sum(tenant.memory_estimate() for tenant in self.tenants.values())
+            while len(self.tenants) > 1 and total > self.max_memory:
+                _, tenant = self.tenants.popitem(last=False)
+                total -= tenant.memory_estimate()
+                evicted.append(tenant)
+        self.evictions += len(evicted)
+        return evicted
+
+    def stats(self):
+        with self.lock:
+            return {
+                "loaded": len(self.tenants),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "memory": sum(tenant.memory_estimate() for tenant in self.tenants.values())
+            }
+
+def configured_tenants():
+    """Colocations déclarées dans les secrets ([TENANTS] identifiant = "ID du Gist" ou "")"""
+    return dict(st.secrets.get("TENANTS", {}))
+
+def tenants_dir():
+    return st.secrets.get("TENANTS_DIR", DEFAULT_TENANTS_DIR)
+
+def create_tenant(tenant_id):
+    """Ressources d'une colocation selon les secrets (UnknownTenant si elle n'est pas autorisée)"""
+    validate_tenant_id(tenant_id)
+    sync = dict(
+        sync_window=float(st.secrets.get("GIST_SYNC_WINDOW", DEFAULT_SYNC_WINDOW)),
+        sync_max_batch=int(st.secrets.get("GIST_SYNC_MAX_BATCH", DEFAULT_SYNC_MAX_BATCH))
+    )
+    if tenant_id == DEFAULT_TENANT:
+        return Tenant(tenant_id, None, st.secrets.get("GIST_ID", ""), **sync)
+    return Tenant(tenant_id, os.path.join(tenants_dir(), tenant_id), configured_tenants().get(tenant_id, ""), **sync)
+
+def validate_tenant_id(tenant_id):
+    """Vérifie qu'une colocation peut être ouverte : déclarée, déjà créée, ou création libre autorisée"""
+    if tenant_id == DEFAULT_TENANT:
+        return tenant_id
+    if not TENANT_ID_PATTERN.match(tenant_id):
+        raise UnknownTenant(f"Identifiant de colocation invalide : {tenant_id}")
+    if (tenant_id in configured_tenants()
+            or os.path.isdir(os.path.join(tenants_dir(), tenant_id))
+            or st.secrets.get("ALLOW_NEW_TENANTS", False)):
+        return tenant_id
+    raise UnknownTenant(f"Colocation inconnue : {tenant_id}")
+
+@st.cache_resource
+def get_tenant_cache():
+    """Retourne le cache des colocations du processus"""
+    return TenantCache(
+        create_tenant,
+        max_tenants=int(st.secrets.get("MAX_TENANTS", DEFAULT_MAX_TENANTS)),
+        ttl=float(st.secrets.get("TENANT_TTL", DEFAULT_TENANT_TTL)),
+        max_memory=float(st.secrets.get("MAX_TENANTS_MEMORY_MB", DEFAULT_MAX_TENANTS_MEMORY_MB)) * 1024 * 1024
+    )
+
+# Colocation imposée au thread courant (threads en arrière-plan, scripts) ; sinon l'URL décide
+_local = threading.local()
+
+class use_tenant:
+    """Contexte : les accès du thread courant portent sur cette colocation"""
+
+    def __init__(self, tenant):
+        self.tenant = tenant
+
+    def __enter__(self):
+        self.previous = getattr(_local, "tenant", None)
+        _local.tenant = self.tenant
+        return self.tenant
+
+    def __exit__(self, *exc):
+        _local.tenant = self.previous
+
+def query_param(name):
+    """Valeur d'un paramètre d'URL, ou None
+
+    st.query_params n'existe qu'à partir de Streamlit 1.30 ; la version installée par
+    requirements.txt n'a que st.experimental_get_query_params (une liste par paramètre).
+    """
+    query_params = getattr(st, "query_params", None)
+    if query_params is not None:
+        return query_params.get(name)
+    values = st.experimental_get_query_params().get(name)
+    return values[0] if values else None
+
+def current_tenant_id():
+    """Identifiant demandé dans l'URL (?maison=...), la colocation par défaut sinon"""
+    tenant_id = query_param(TENANT_PARAM)
+    if not tenant_id:
+        return DEFAULT_TENANT
+    return tenant_id.strip().lower()
+
+def current_tenant():
+    """Colocation de la session (ou du thread) courante
+
+    app.main la résout une fois par rerun puis l'impose au thread (use_tenant) : tous les
+    accès de la page portent sur le même objet Tenant, même s'il est évincé entre-temps.
+    """
+    tenant = getattr(_local, "tenant", None)
+    if tenant is not None:
+        return tenant
+    return get_tenant_cache().get(current_tenant_id())
+
+def get_shared_state():
+    """Retourne l'état partagé par les sessions de la colocation courante"""
+    return current_tenant().state
+
+def get_points_engine():
+    """Retourne le moteur de points de la colocation courante"""
+    return current_tenant().points_engine
+
+def get_task_index():
+    """Retourne l'index des tâches de la colocation courante"""
+    return current_tenant().task_index
+
+def get_sync_worker():
+    """Retourne le thread de synchronisation de la colocation courante"""
+    return current_tenant().sync_worker
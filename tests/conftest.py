@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+import pytest
+import streamlit as st
+
+# Avant Streamlit 1.29, AppTest relance indéfiniment un script qui appelle st.rerun()
+# après un clic : les tests qui cliquent ne tournent qu'avec une version plus récente
+OLD_APPTEST = tuple(int(x) for x in st.__version__.split(".")[:2]) < (1, 29)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Les modules de l'application s'importent comme depuis `streamlit run app.py`
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+
+OLD_DOCUMENT = {
+    "colocataires": {"Arthur": {"points": 4}, "Martin": {"points": 1}},
+    "taches": {"Sortir les poubelles": {"points": 3, "lieu": "Cuisine", "derniere_realisation": None}}
+}
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Répertoire de travail vide : les fichiers de données de l'application y sont écrits"""
+    (tmp_path / ".streamlit").mkdir()
+    (tmp_path / ".streamlit" / "secrets.toml").write_text("", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    st.cache_resource.clear()
+    yield tmp_path
+    st.cache_resource.clear()
+
+@pytest.fixture
+def gist(workdir, monkeypatch):
+    """Faux Gist contenant un document à l'ancien format, et secrets pointant dessus"""
+    from fake_gist_server import FakeGistServer
+    from gist_manager import GistManager
+    server = FakeGistServer()
+    gist_id = server.create_gist({"colocation_data.json": json.dumps(OLD_DOCUMENT)})
+    base_url = server.start()
+    monkeypatch.setattr(st, "secrets", {"GITHUB_TOKEN": "test", "GIST_ID": gist_id, "GITHUB_API_URL": base_url})
+    GistManager._cache.clear()
+    yield server, gist_id
+    server.stop()
+    GistManager._cache.clear()
+
+@pytest.fixture
+def make_app(workdir):
+    """Crée une session de l'application (AppTest) avec les secrets donnés"""
+    from streamlit.testing.v1 import AppTest
+
+    def factory(**secrets):
+        at = AppTest.from_file(os.path.join(REPO_DIR, "app.py"), default_timeout=30)
+        for key, value in secrets.items():
+            at.secrets[key] = value
+        return at
+    return factory
+
+def click(at, label=None, key=None):
+    """Clique sur un bouton (par libellé ou par clé) et relance la page"""
+    if OLD_APPTEST:
+        pytest.skip(f"AppTest {st.__version__} ne gère pas st.rerun() après un clic")
+    for button in at.button:
+        if (key is not None and button.key == key) or (label is not None and button.label == label):
+            button.click().run()
+            assert not at.exception, at.exception
+            return at
+    raise LookupError(key or label)
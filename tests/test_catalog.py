@@ -0,0 +1,21 @@
+import json
+import os
+from conftest import REPO_DIR
+
+def test_default_catalog_matches_the_original_defaults():
+    """Comme les données par défaut d'origine : chaque tâche est attribuée à tous les colocataires"""
+    with open(os.path.join(REPO_DIR, "catalogs", "default.json"), encoding="utf-8") as f:
+        data = json.load(f)
+    colocataires = list(data["colocataires"])
+    assert colocataires == ["Antoine", "Arthur", "Raphael", "Martin", "Perrinne"]
+    assert len(data["taches"]) == 51
+    for nom, info in data["taches"].items():
+        assert info["attribuee_a"] == colocataires, nom
+        assert info["points_actuels"] == info["points_base"], nom
+        assert info["derniere_realisation"] is None and info["derniere_realisation_par"] is None, nom
+
+def test_new_document_is_a_copy_of_the_catalog(workdir):
+    from catalog import new_document
+    data = new_document("default")
+    data["taches"].clear()
+    assert len(new_document("default")["taches"]) == 51
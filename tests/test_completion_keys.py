@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from event_log import apply_event, completion_seen, COMPLETION_KEYS, COMPLETION_KEYS_MAX, COMPLETION_KEYS_WINDOW
+from merge import merge_documents
+
+START = datetime(2024, 3, 1, 12, 0)
+
+def document():
+    return {"colocataires": {"Arthur": {"points": 0}},
+            "taches": {"Vaisselle": {"lieu": "Cuisine", "points_base": 2, "points_actuels": 2,
+                                     "derniere_realisation": None, "derniere_realisation_par": None,
+                                     "attribuee_a": ["Arthur"]}}}
+
+def completion(key, ts):
+    return {"type": "completion", "ts": ts.isoformat(), "user": "Arthur", "task": "Vaisselle",
+            "points": 2, "key": key}
+
+def points(data):
+    return data["colocataires"]["Arthur"]["points"]
+
+def test_duplicate_submission_is_counted_once():
+    data = document()
+    apply_event(data, completion("clic-1", START))
+    # Double clic ou nouvel essai : même clé, quelques secondes plus tard
+    apply_event(data, completion("clic-1", START + timedelta(seconds=3)))
+    assert points(data) == 2
+    assert data[COMPLETION_KEYS] == {"clic-1": START.isoformat()}
+    apply_event(data, completion("clic-2", START + timedelta(seconds=5)))
+    assert points(data) == 4
+
+def test_keys_expire_after_the_window():
+    data = document()
+    apply_event(data, completion("ancienne", START))
+    apply_event(data, completion("veille", START + COMPLETION_KEYS_WINDOW - timedelta(minutes=1)))
+    assert completion_seen(data, "ancienne")
+    apply_event(data, completion("nouvelle", START + COMPLETION_KEYS_WINDOW + timedelta(minutes=1)))
+    assert not completion_seen(data, "ancienne")
+    assert completion_seen(data, "veille")
+    # Une clé oubliée n'est plus reconnue : la réalisation compte de nouveau
+    apply_event(data, completion("ancienne", START + COMPLETION_KEYS_WINDOW + timedelta(minutes=2)))
+    assert points(data) == 8
+
+def test_keys_are_capped_keeping_the_most_recent():
+    data = document()
+    total = COMPLETION_KEYS_MAX + 50
+    for i in range(total):
+        apply_event(data, completion(f"clic-{i}", START + timedelta(seconds=i)))
+    keys = data[COMPLETION_KEYS]
+    assert len(keys) == COMPLETION_KEYS_MAX
+    assert list(keys) == [f"clic-{i}" for i in range(50, total)]
+    assert points(data) == 2 * total
+
+def test_merge_keeps_keys_from_both_sides_within_the_cap():
+    base = document()
+    ours, theirs = document(), document()
+    for i in range(COMPLETION_KEYS_MAX):
+        apply_event(ours, completion(f"local-{i}", START + timedelta(seconds=2 * i)))
+        apply_event(theirs, completion(f"distant-{i}", START + timedelta(seconds=2 * i + 1)))
+    merged = merge_documents(base, ours, theirs)
+    keys = merged[COMPLETION_KEYS]
+    assert len(keys) == COMPLETION_KEYS_MAX
+    assert "local-199" in keys and "distant-199" in keys
+    assert "local-0" not in keys and "distant-0" not in keys
+
+def test_complete_task_with_a_seen_key_awards_nothing(workdir, monkeypatch):
+    import streamlit as st
+    import app
+    from tenants import create_tenant, use_tenant
+    monkeypatch.setattr(st, "secrets", {"STORAGE_BACKEND": "json"})
+    with use_tenant(create_tenant("default")):
+        data = app.load_data()
+        tache = next(iter(data["taches"]))
+        gain = data["taches"][tache]["points_actuels"]
+        avant = data["colocataires"]["Arthur"]["points"]
+        assert app.complete_task(data, "Arthur", tache, key="clic-1") == gain
+        assert app.complete_task(data, "Arthur", tache, key="clic-1") == 0
+        assert data["colocataires"]["Arthur"]["points"] == avant + gain
+        app.save_data(data)
+
+    # La clé est enregistrée avec les données : toujours reconnue après un redémarrage
+    with use_tenant(create_tenant("default")):
+        data = app.load_data()
+        assert completion_seen(data, "clic-1")
+        assert app.complete_task(data, "Arthur", tache, key="clic-1") == 0
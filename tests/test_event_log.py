@@ -0,0 +1,84 @@
+import json
+import os
+import pytest
+from event_log import EventLog, make_event, RECENT_COMPLETIONS
+from storage import EventLogStorage
+
+def initial_state():
+    return {"colocataires": {"Arthur": {"points": 0}},
+            "taches": {"Vaisselle": {"lieu": "Cuisine", "points_base": 1, "points_actuels": 1,
+                                     "derniere_realisation": None, "derniere_realisation_par": None,
+                                     "attribuee_a": ["Arthur"]}}}
+
+def complete(log, n):
+    for i in range(n):
+        log.append(make_event("completion", user="Arthur", task="Vaisselle", points=1))
+
+def full_scan(log, limit):
+    return list(reversed(list(log.history(event_type="completion"))))[:limit]
+
+def test_recent_completions_survive_reload_without_reading_the_log(workdir, monkeypatch):
+    log = EventLog("events.jsonl", "snapshot.json", snapshot_every=50)
+    log.load(initial_state)
+    complete(log, 260)
+    expected = full_scan(log, 20)
+    assert log.recent_completions(20) == expected
+
+    # Redémarrage : photo (avec les dernières réalisations) puis rejeu de la fin du journal
+    storage = EventLogStorage(initial_state, snapshot_every=50, log_file="events.jsonl",
+                              snapshot_file="snapshot.json")
+    assert len(storage.event_log.recent) == RECENT_COMPLETIONS
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("la page des scores ne doit pas relire le journal")
+    monkeypatch.setattr(storage.event_log, "history", no_scan)
+    assert storage.history(limit=20) == expected
+    assert storage.event_log.state["colocataires"]["Arthur"]["points"] == 260
+
+def test_export_still_reads_the_whole_log(workdir):
+    storage = EventLogStorage(initial_state, snapshot_every=50, log_file="events.jsonl",
+                              snapshot_file="snapshot.json")
+    complete(storage.event_log, RECENT_COMPLETIONS + 30)
+    assert len(storage.history(limit=None)) == RECENT_COMPLETIONS + 30
+
+def run_cli_import(workdir, *noms):
+    """Import de tâches par convert_tasks.py dans un autre processus, sur le même journal"""
+    import subprocess
+    import sys
+    from conftest import REPO_DIR
+    (workdir / ".streamlit" / "secrets.toml").write_text('STORAGE_BACKEND = "events"\n', encoding="utf-8")
+    (workdir / "taches.csv").write_text("nom,lieu,points,attribuee_a\n" + "".join(f"{nom},Salon,2,\n" for nom in noms),
+                                        encoding="utf-8")
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, "convert_tasks.py"), "import", "taches.csv"],
+                            cwd=workdir, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_import_from_another_process_while_the_app_runs(workdir, monkeypatch, compact):
+    import streamlit as st
+    import app
+    from tenants import create_tenant, use_tenant
+    monkeypatch.setattr(st, "secrets", {"STORAGE_BACKEND": "events"})
+    tenant = create_tenant("default")
+    with use_tenant(tenant):
+        data = app.load_data()
+        tenant.task_index.sync(data)
+        run_cli_import(workdir, "Cirer le piano")
+        tache = next(iter(data["taches"]))
+        with tenant.state.lock:
+            app.complete_task(data, "Arthur", tache)
+            app.save_data(data)
+        # L'import est rattrapé avant l'écriture : l'application et les index le voient
+        assert "Cirer le piano" in data["taches"]
+        assert tenant.task_index.search("cirer") == [("Salon", "Cirer le piano")]
+        if compact:
+            app.get_storage().save(data)
+        points = data["colocataires"]["Arthur"]["points"]
+
+    seqs = [json.loads(line)["seq"] for line in open("colocation_events.jsonl", encoding="utf-8")]
+    assert seqs == sorted(set(seqs))
+    # Redémarrage : ni la réalisation ni l'import ne sont perdus
+    restarted = EventLog("colocation_events.jsonl", "colocation_snapshot.json")
+    state = restarted.load(lambda: None)
+    assert state["colocataires"]["Arthur"]["points"] == points > 0
+    assert "Cirer le piano" in state["taches"]
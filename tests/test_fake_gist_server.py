@@ -0,0 +1,17 @@
+from conftest import click
+from fake_gist_server import build_server
+
+def test_default_seed_loads_in_the_app(make_app):
+    from gist_manager import GistManager
+    GistManager._cache.clear()
+    server, gist_id = build_server(["--port", "0", "--gist-id", "seed-test"])
+    base_url = server.start()
+    try:
+        at = make_app(GITHUB_TOKEN="local", GIST_ID=gist_id, GITHUB_API_URL=base_url, STORAGE_BACKEND="gist")
+        at.run()
+        assert not at.exception, at.exception
+        assert {b.key for b in at.button} >= {"btn_Arthur", "btn_Perrinne"}
+        click(at, key="btn_Arthur")
+        assert any(b.key and b.key.startswith("task_") for b in at.button)
+    finally:
+        server.stop()
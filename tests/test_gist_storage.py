@@ -0,0 +1,22 @@
+def test_load_remote_migrates_before_writing_the_backup(gist):
+    from gist_manager import assemble_files
+    from storage import GistStorage, JsonFileStorage
+    from sync_worker import SyncWorker
+    server, gist_id = gist
+    worker = SyncWorker("outbox.json", window=0.01, gist_id=gist_id)
+    storage = GistStorage(worker, JsonFileStorage("colocation_data.json"), gist_id)
+
+    data, _ = storage.load_remote()
+    assert data["taches"]["Sortir les poubelles"]["points_base"] == 3
+
+    backup = JsonFileStorage("colocation_data.json").load()
+    tache = backup["taches"]["Sortir les poubelles"]
+    assert backup["schema_version"] == data["schema_version"]
+    assert tache["points_base"] == 3
+    assert tache["attribuee_a"] == ["Arthur", "Martin"]
+
+    # La version migrée est aussi envoyée au Gist, une seule fois
+    assert worker.flush(timeout=10)
+    worker.stop()
+    remote = assemble_files(server.current_files(gist_id))
+    assert remote["taches"]["Sortir les poubelles"]["points_base"] == 3
@@ -0,0 +1,144 @@
+import time
+import pytest
+import requests
+import github_client
+from github_client import (GitHubClient, RateLimited, BACKGROUND_RETRIES, PAGE_RETRIES, RETRY_BASE_DELAY,
+                           RETRY_MAX_DELAY, LOW_QUOTA, RESERVED_QUOTA, MAX_BUDGET_WAIT)
+
+def response(status, **headers):
+    result = requests.Response()
+    result.status_code = status
+    result.headers.update(headers)
+    return result
+
+def quota(remaining, reset_in):
+    return {"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(int(time.time() + reset_in))}
+
+class ScriptedSession:
+    """Session requests remplacée : rejoue une liste de réponses (ou d'exceptions)"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = 0
+
+    def request(self, method, url, **kwargs):
+        self.sent += 1
+        result = self.responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Pauses demandées par le client, sans attendre réellement"""
+    delays = []
+    monkeypatch.setattr(github_client.time, "sleep", delays.append)
+    return delays
+
+def client_with(*responses):
+    client = GitHubClient()
+    client.session = ScriptedSession(*responses)
+    client.random.seed(7)
+    return client
+
+def test_server_errors_are_retried_with_jittered_backoff(sleeps):
+    client = client_with(response(502), response(503), response(500), response(200))
+    assert client.get("https://api.github.test/gists/x", background=True).status_code == 200
+    assert client.counters()["calls"] == BACKGROUND_RETRIES + 1
+    assert client.counters()["retries"] == BACKGROUND_RETRIES
+    for attempt, delay in enumerate(sleeps):
+        assert 0 <= delay <= RETRY_BASE_DELAY * 2 ** attempt
+    # Attentes aléatoires : les instances ne réessaient pas toutes au même moment
+    assert len(set(sleeps)) == len(sleeps)
+
+def test_pages_retry_once_then_return_the_error(sleeps):
+    client = client_with(response(502), response(502), response(200))
+    assert client.get("https://api.github.test/gists/x").status_code == 502
+    assert client.session.sent == PAGE_RETRIES + 1
+    assert len(sleeps) == PAGE_RETRIES
+
+def test_network_errors_are_raised_when_retries_are_exhausted(sleeps):
+    client = client_with(requests.ConnectionError(), requests.Timeout())
+    with pytest.raises(requests.Timeout):
+        client.get("https://api.github.test/gists/x")
+    assert client.counters()["retries"] == 1
+
+def test_429_waits_for_retry_after(sleeps):
+    client = client_with(response(429, **{"Retry-After": "3"}), response(429, **{"Retry-After": "120"}),
+                         response(200))
+    assert client.get("https://api.github.test/gists/x", background=True).status_code == 200
+    # Retry-After respecté, plafonné à RETRY_MAX_DELAY
+    assert sleeps == [3.0, RETRY_MAX_DELAY]
+
+def test_exhausted_quota_403_blocks_calls_until_reset(sleeps):
+    client = client_with(response(403, **quota(0, 600)))
+    assert client.get("https://api.github.test/gists/x", background=True).status_code == 403
+    # Un 403 de quota n'est pas réessayé
+    assert client.session.sent == 1
+    assert client.counters()["rate_limited"] == 1
+
+    for background in (True, False):
+        with pytest.raises(RateLimited) as error:
+            client.get("https://api.github.test/gists/x", background=background)
+        assert error.value.retry_at == pytest.approx(client.reset_at, abs=2)
+    assert client.session.sent == 1
+    assert client.counters()["rate_limited"] == 3
+    assert sleeps == []
+
+def test_quota_is_available_again_after_reset(sleeps):
+    client = client_with(response(403, **quota(0, -1)), response(200, **quota(5000, 3600)))
+    client.get("https://api.github.test/gists/x", background=True)
+    assert client.wait_time() == 0
+    assert client.get("https://api.github.test/gists/x", background=True).status_code == 200
+
+def test_reserved_quota_is_kept_for_pages(sleeps):
+    client = client_with(response(200, **quota(RESERVED_QUOTA, 600)),
+                         response(200, **quota(RESERVED_QUOTA - 1, 600)))
+    client.get("https://api.github.test/gists/x")
+    # Synchronisation en arrière-plan refusée sans appel réseau...
+    with pytest.raises(RateLimited):
+        client.get("https://api.github.test/gists/x", background=True)
+    assert client.session.sent == 1
+    # ... mais les pages passent, sans attendre
+    assert client.get("https://api.github.test/gists/x").status_code == 200
+    assert sleeps == []
+
+def test_low_quota_spaces_background_calls(sleeps):
+    remaining = RESERVED_QUOTA + 10
+    client = client_with(response(200, **quota(remaining, 5)), response(200, **quota(remaining - 1, 5)))
+    client.get("https://api.github.test/gists/x")
+    client.get("https://api.github.test/gists/x", background=True)
+    # Requêtes restantes (hors réserve) réparties jusqu'au renouvellement
+    assert sleeps[0] == pytest.approx(5 / 10, abs=0.11)
+    assert client.counters()["throttled"] == 1
+
+def test_background_call_gives_up_beyond_max_budget_wait(sleeps):
+    remaining = LOW_QUOTA - 1
+    reset_in = (MAX_BUDGET_WAIT + 10) * (remaining - RESERVED_QUOTA)
+    client = client_with(response(200, **quota(remaining, reset_in)))
+    client.get("https://api.github.test/gists/x")
+    with pytest.raises(RateLimited):
+        client.get("https://api.github.test/gists/x", background=True)
+    assert sleeps == []
+
+def test_quota_budget_against_the_fake_server():
+    """Le client s'arrête avant que le serveur n'ait à répondre 403"""
+    from fake_gist_server import FakeGistServer
+    server = FakeGistServer(rate_limit=RESERVED_QUOTA + 2)
+    gist_id = server.create_gist({"colocation_data.json": "{}"})
+    url = f"{server.start()}/gists/{gist_id}"
+    try:
+        client = GitHubClient(low_quota=0)
+        for _ in range(2):
+            assert client.get(url, background=True).status_code == 200
+        with pytest.raises(RateLimited):
+            client.get(url, background=True)
+        for _ in range(RESERVED_QUOTA):
+            assert client.get(url).status_code == 200
+        with pytest.raises(RateLimited):
+            client.get(url)
+        assert client.counters()["rate_limited"] == 2
+        assert server.stats["rate_limited"] == 0
+    finally:
+        server.stop()
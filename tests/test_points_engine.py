@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+from event_log import make_event, apply_event
+from points_engine import PointsEngine
+
+DEBUT = datetime(2024, 3, 1, 10, 0)
+
+def document(**taches):
+    """Tâches réalisées à DEBUT + n jours (None : jamais réalisée)"""
+    return {
+        "colocataires": {"Arthur": {"points": 0}},
+        "taches": {
+            nom: {"points_base": 2, "lieu": "Cuisine", "attribuee_a": ["Arthur"],
+                  "derniere_realisation": None if jours is None else (DEBUT + timedelta(days=jours)).isoformat()}
+            for nom, jours in taches.items()
+        }
+    }
+
+def points(data, nom):
+    return data["taches"][nom]["points_actuels"]
+
+def test_bonus_changes_exactly_at_each_tier():
+    data = document(vaisselle=0)
+    engine = PointsEngine()
+    engine.refresh(data, DEBUT)
+    assert points(data, "vaisselle") == 2
+
+    engine.refresh(data, DEBUT + timedelta(days=7, seconds=-1))
+    assert points(data, "vaisselle") == 2
+    engine.refresh(data, DEBUT + timedelta(days=7))
+    assert points(data, "vaisselle") == 3
+    engine.refresh(data, DEBUT + timedelta(days=14))
+    assert points(data, "vaisselle") == 4
+    engine.refresh(data, DEBUT + timedelta(days=21))
+    assert points(data, "vaisselle") == 5
+    # Bonus maximal : plus rien n'est programmé
+    assert engine.heap == []
+    engine.refresh(data, DEBUT + timedelta(days=365))
+    assert points(data, "vaisselle") == 5
+
+def test_skipped_tiers_are_caught_up_in_one_refresh():
+    data = document(vaisselle=0, sol=3, jamais=None)
+    engine = PointsEngine()
+    engine.refresh(data, DEBUT)
+    engine.refresh(data, DEBUT + timedelta(days=16))
+    assert points(data, "vaisselle") == 4
+    assert points(data, "sol") == 3
+    assert points(data, "jamais") == 2
+    assert engine.next_bonus_in("vaisselle", DEBUT + timedelta(days=16)) == 5
+    assert engine.next_bonus_in("jamais", DEBUT) is None
+
+def test_refresh_without_reached_tier_touches_nothing():
+    data = document(vaisselle=0)
+    engine = PointsEngine()
+    engine.refresh(data, DEBUT)
+    heap = list(engine.heap)
+    data["taches"]["vaisselle"]["points_actuels"] = 99
+    engine.refresh(data, DEBUT + timedelta(days=6))
+    assert engine.heap == heap
+    assert points(data, "vaisselle") == 99
+
+def test_completion_and_deletion_make_old_heap_entries_stale():
+    data = document(vaisselle=0, sol=0)
+    # on_event recalcule à l'heure actuelle : réalisations d'il y a 20 jours
+    for info in data["taches"].values():
+        info["derniere_realisation"] = (datetime.now() - timedelta(days=20)).isoformat()
+    engine = PointsEngine()
+    engine.refresh(data, datetime.now())
+    assert points(data, "vaisselle") == 4
+
+    for event in (make_event("completion", user="Arthur", task="vaisselle", points=4),
+                  make_event("task_deleted", task="sol")):
+        apply_event(data, event)
+        engine.on_event(data, event)
+    assert points(data, "vaisselle") == 2
+    # Les entrées programmées avant la réalisation et la suppression sont ignorées
+    engine.refresh(data, datetime.now() + timedelta(days=3))
+    assert points(data, "vaisselle") == 2
+    assert "sol" not in data["taches"]
+    engine.refresh(data, datetime.now() + timedelta(days=7, minutes=1))
+    assert points(data, "vaisselle") == 3
+
+def test_new_document_is_rebuilt():
+    engine = PointsEngine()
+    engine.refresh(document(vaisselle=0), DEBUT)
+    autre = document(sol=-14)
+    engine.refresh(autre, DEBUT)
+    assert points(autre, "sol") == 4
+    assert set(engine.entries) == {"sol"}
@@ -0,0 +1,40 @@
+import json
+import threading
+from profiling import Profiler, PROFILER
+
+def test_cold_start_load_is_profiled(make_app, workdir):
+    PROFILER.configure(False)
+    at = make_app(STORAGE_BACKEND="json", PROFILING=True, PROFILING_EXPORT="profil.jsonl")
+    # Session déjà sur le dashboard : main() vérifie le colocataire avant d'afficher la page
+    at.session_state["current_user"] = "Arthur"
+    at.session_state["page"] = "dashboard"
+    at.session_state["tenant"] = "default"
+    at.run()
+    assert not at.exception, at.exception
+    with open(workdir / "profil.jsonl", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    first = records[0]
+    # Le chargement à froid (vérification du colocataire) et celui de la page sont mesurés
+    # dans le premier rerun, pas hors profilage
+    assert first["page"] == "dashboard"
+    assert len(first["spans"]["load_data"]) == 2
+    assert not any("load_data" in r["spans"] for r in records if r["page"] == "arrière-plan")
+
+def test_export_lines_do_not_interleave(workdir):
+    profiler = Profiler()
+    profiler.configure(True, str(workdir / "export.jsonl"))
+
+    def background():
+        # Mesures hors d'un rerun : chacune est exportée aussitôt
+        for _ in range(200):
+            profiler.count("appels réseau " + "x" * 2000)
+    threads = [threading.Thread(target=background) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(workdir / "export.jsonl", encoding="utf-8") as f:
+        lines = f.readlines()
+    assert len(lines) == 1600
+    for line in lines:
+        json.loads(line)
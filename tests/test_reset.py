@@ -0,0 +1,26 @@
+import pytest
+from conftest import click
+
+@pytest.mark.parametrize("backend", ["json", "events", "sqlite"])
+def test_full_reset(make_app, backend):
+    """Réalisation d'une tâche puis remise à zéro complète depuis les paramètres"""
+    at = make_app(STORAGE_BACKEND=backend)
+    at.run()
+    assert not at.exception, at.exception
+    click(at, key="btn_Arthur")
+    tache = next(b.key for b in at.button if b.key and b.key.startswith("task_"))[len("task_"):]
+    click(at, key=f"task_{tache}")
+    click(at, key=f"oui_{tache}")
+
+    click(at, label="⚙️ Paramètres")
+    click(at, label="🔄 Réinitialiser toute l'application")
+
+    # Nouvelle session après redémarrage : la remise à zéro a été enregistrée
+    import streamlit as st
+    st.cache_resource.clear()
+    at = make_app(STORAGE_BACKEND=backend)
+    at.run()
+    click(at, key="btn_Arthur")
+    click(at, label="🏆 Scores complets")
+    scores = [m.value for m in at.markdown if "Arthur**:" in m.value]
+    assert scores and all("0 points" in s for s in scores)
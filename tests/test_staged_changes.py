@@ -0,0 +1,71 @@
+import copy
+
+from app import build_coloc_rows, build_task_rows, staged_changes
+from event_log import apply_event
+
+def document():
+    def tache(lieu, points, *colocataires):
+        return {"points_base": points, "points_actuels": points, "lieu": lieu, "attribuee_a": list(colocataires),
+                "derniere_realisation": None, "derniere_realisation_par": None}
+    return {
+        "colocataires": {"Arthur": {"points": 0}, "Martin": {"points": 0}},
+        "taches": {
+            "Vaisselle": tache("Cuisine", 2, "Arthur", "Martin"),
+            "Aspirateur": tache("Salon", 3, "Martin"),
+            "Poubelles": tache("Cuisine", 1, "Arthur")
+        }
+    }
+
+def stage(data, edited_rows=None, deleted_rows=(), added_rows=()):
+    """Modifications du tableau des tâches, les positions suivant l'ordre du document"""
+    task_table = build_task_rows(data, list(data["colocataires"]))
+    task_edits = {"edited_rows": edited_rows or {}, "deleted_rows": list(deleted_rows), "added_rows": list(added_rows)}
+    empty = {"edited_rows": {}, "deleted_rows": [], "added_rows": []}
+    return staged_changes(data, task_table, build_coloc_rows(data), task_edits, empty)
+
+def saved(data, events):
+    result = copy.deepcopy(data)
+    for event in events:
+        apply_event(result, event)
+    return result
+
+def test_rename_keeps_the_task_under_its_new_name():
+    data = document()
+    events, resume, erreurs = stage(data, {0: {"Tâche": "Faire la vaisselle", "Points": 4}})
+    assert erreurs == []
+    taches = saved(data, events)["taches"]
+    assert "Vaisselle" not in taches
+    assert taches["Faire la vaisselle"]["points_base"] == 4
+    assert taches["Faire la vaisselle"]["attribuee_a"] == ["Arthur", "Martin"]
+    assert resume == ["✏️ « Vaisselle » renommée en **Faire la vaisselle**"]
+
+def test_rename_onto_a_name_deleted_in_the_same_batch():
+    data = document()
+    events, _, erreurs = stage(data, {0: {"Tâche": "Aspirateur"}}, deleted_rows=[1])
+    assert erreurs == []
+    taches = saved(data, events)["taches"]
+    assert set(taches) == {"Aspirateur", "Poubelles"}
+    # La tâche renommée remplace la tâche supprimée
+    assert taches["Aspirateur"]["lieu"] == "Cuisine"
+    assert taches["Aspirateur"]["points_base"] == 2
+
+def test_rename_swap():
+    data = document()
+    events, _, erreurs = stage(data, {0: {"Tâche": "Aspirateur"}, 1: {"Tâche": "Vaisselle"}})
+    assert erreurs == []
+    taches = saved(data, events)["taches"]
+    assert set(taches) == {"Vaisselle", "Aspirateur", "Poubelles"}
+    assert taches["Aspirateur"]["lieu"] == "Cuisine"
+    assert taches["Vaisselle"]["lieu"] == "Salon"
+
+def test_rename_onto_an_existing_task_is_refused():
+    data = document()
+    _, _, erreurs = stage(data, {0: {"Tâche": "Poubelles"}})
+    assert erreurs == ["La tâche « Poubelles » existe déjà"]
+
+def test_added_row_can_reuse_a_deleted_name():
+    data = document()
+    events, _, erreurs = stage(data, deleted_rows=[2],
+                               added_rows=[{"Tâche": "Poubelles", "Lieu": "Entrée", "Points": 2}])
+    assert erreurs == []
+    assert saved(data, events)["taches"]["Poubelles"]["lieu"] == "Entrée"
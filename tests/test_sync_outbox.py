@@ -0,0 +1,81 @@
+import atexit
+import json
+from gist_manager import GistManager, assemble_files
+from sync_worker import SyncWorker
+
+def crash(worker):
+    """Arrête le thread sans rien envoyer, comme un arrêt brutal du processus"""
+    with worker.condition:
+        worker.stopped = True
+        worker.condition.notify_all()
+    atexit.unregister(worker.flush)
+    worker.thread.join()
+
+def remote_points(server, gist_id):
+    data = assemble_files(server.current_files(gist_id))
+    return {nom: info["points"] for nom, info in data["colocataires"].items()}
+
+def edit_remote(gist_id, nom, gain):
+    """Autre instance : gain de points envoyé directement sur le Gist"""
+    other = GistManager(show_errors=False, gist_id=gist_id)
+    data = other.load_data_from_gist()
+    data["colocataires"][nom]["points"] += gain
+    assert other.save_data_to_gist(data)
+
+def test_restart_merges_pending_outbox_against_its_base(gist):
+    server, gist_id = gist
+    data = GistManager(show_errors=False, gist_id=gist_id).load_data_from_gist()
+    worker = SyncWorker("outbox.json", window=3600, gist_id=gist_id)
+    data["colocataires"]["Arthur"]["points"] += 3
+    worker.enqueue(data)
+    crash(worker)
+    with open("outbox.json", encoding="utf-8") as f:
+        assert json.load(f)["base"]["colocataires"]["Arthur"]["points"] == 4
+
+    edit_remote(gist_id, "Martin", 2)
+    # Redémarrage : plus rien en cache, seule l'outbox connaît la version de base
+    GistManager._cache.clear()
+    worker = SyncWorker("outbox.json", window=0.01, gist_id=gist_id)
+    assert worker.flush(timeout=10)
+    worker.stop()
+    assert worker.merges == 1
+    assert remote_points(server, gist_id) == {"Arthur": 7, "Martin": 3}
+
+def test_legacy_outbox_without_base_does_not_overwrite_remote(gist):
+    server, gist_id = gist
+    data = GistManager(show_errors=False, gist_id=gist_id).load_data_from_gist()
+    data["colocataires"]["Arthur"]["points"] += 3
+    # Outbox écrite avant que la base y soit mémorisée : le document seul
+    with open("outbox.json", "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+    edit_remote(gist_id, "Martin", 2)
+    GistManager._cache.clear()
+    worker = SyncWorker("outbox.json", window=0.01, gist_id=gist_id)
+    assert worker.flush(timeout=10)
+    worker.stop()
+    assert remote_points(server, gist_id) == {"Arthur": 7, "Martin": 3}
+
+def test_failing_on_merge_does_not_stop_the_sync_thread(gist):
+    server, gist_id = gist
+    data = GistManager(show_errors=False, gist_id=gist_id).load_data_from_gist()
+    worker = SyncWorker("outbox.json", window=3600, gist_id=gist_id)
+    def on_merge(sent, merged):
+        raise RuntimeError("verrou indisponible")
+    worker.on_merge = on_merge
+
+    data["colocataires"]["Arthur"]["points"] += 3
+    worker.enqueue(data)
+    edit_remote(gist_id, "Martin", 2)
+    assert worker.flush(timeout=10)
+    assert worker.merges == 1
+    assert "verrou indisponible" in worker.status()["last_error"]
+    assert worker.thread.is_alive()
+
+    # Les sauvegardes suivantes partent toujours
+    data["colocataires"]["Arthur"]["points"] += 1
+    worker.enqueue(data)
+    assert worker.flush(timeout=10)
+    worker.stop()
+    assert worker.uploads == 2
+    assert remote_points(server, gist_id) == {"Arthur": 8, "Martin": 3}
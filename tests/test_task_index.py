@@ -0,0 +1,77 @@
+from event_log import make_event, apply_event
+from task_index import TaskIndex
+
+def document():
+    def tache(lieu, *colocataires):
+        return {"points_base": 1, "lieu": lieu, "attribuee_a": list(colocataires)}
+    return {
+        "colocataires": {"Arthur": {"points": 0}, "Martin": {"points": 0}},
+        "taches": {
+            "Vaisselle": tache("Cuisine", "Arthur", "Martin"),
+            "Aspirateur": tache("Salon", "Martin"),
+            "Poubelles": tache("Cuisine", "Arthur"),
+            "Étagères": tache("Salon", "Arthur")
+        }
+    }
+
+def indexed():
+    data = document()
+    index = TaskIndex()
+    index.sync(data)
+    return data, index
+
+def apply(index, data, event_type, **payload):
+    event = make_event(event_type, **payload)
+    apply_event(data, event)
+    index.on_event(data, event)
+
+def test_groups_follow_document_order():
+    data, index = indexed()
+    assert index.lieux() == ["Cuisine", "Salon"]
+    assert index.search() == [("Cuisine", "Vaisselle"), ("Cuisine", "Poubelles"),
+                              ("Salon", "Aspirateur"), ("Salon", "Étagères")]
+    assert index.tasks_in("Cuisine", "Martin") == ["Vaisselle"]
+    assert index.lieux("Martin") == ["Cuisine", "Salon"]
+    assert index.search("etageres") == [("Salon", "Étagères")]
+
+def test_added_task_goes_last_in_its_groups():
+    data, index = indexed()
+    apply(index, data, "task_added", task="Jardinage",
+          info={"points_base": 2, "lieu": "Jardin", "attribuee_a": ["Martin"]})
+    apply(index, data, "task_added", task="Four", info={"points_base": 2, "lieu": "Cuisine", "attribuee_a": []})
+    assert index.lieux() == ["Cuisine", "Salon", "Jardin"]
+    assert index.tasks_in("Cuisine") == ["Vaisselle", "Poubelles", "Four"]
+    assert index.is_available("Jardinage", "Martin")
+    assert not index.is_available("Four", "Arthur")
+
+def test_rename_removes_the_old_name():
+    data, index = indexed()
+    info = dict(data["taches"]["Vaisselle"])
+    # Renommage de la page Paramètres : suppression puis ajout sous le nouveau nom
+    apply(index, data, "batch", events=[make_event("task_deleted", task="Vaisselle"),
+                                        make_event("task_added", task="Lave-vaisselle", info=info)])
+    assert index.search("vaisselle") == [("Cuisine", "Lave-vaisselle")]
+    assert not index.is_available("Vaisselle", "Arthur")
+    assert index.is_available("Lave-vaisselle", "Martin")
+
+    apply(index, data, "task_deleted", task="Poubelles")
+    apply(index, data, "task_added", task="Poubelles", info={"points_base": 1, "lieu": "Cuisine"})
+    assert index.tasks_in("Cuisine") == ["Lave-vaisselle", "Poubelles"]
+    assert index.tasks_in("Cuisine", "Arthur") == ["Lave-vaisselle"]
+
+def test_delete_drops_empty_groups():
+    data, index = indexed()
+    apply(index, data, "task_deleted", task="Aspirateur")
+    assert index.lieux("Martin") == ["Cuisine"]
+    apply(index, data, "task_deleted", task="Étagères")
+    assert index.lieux() == ["Cuisine"]
+    assert index.search("aspirateur") == []
+    assert index.lieux("Arthur") == ["Cuisine"]
+
+def test_update_moves_task_between_groups_and_keeps_its_place():
+    data, index = indexed()
+    apply(index, data, "task_updated", task="Vaisselle", changes={"lieu": "Salon", "attribuee_a": ["Arthur"]})
+    assert index.tasks_in("Salon") == ["Vaisselle", "Aspirateur", "Étagères"]
+    assert index.tasks_in("Cuisine") == ["Poubelles"]
+    assert not index.is_available("Vaisselle", "Martin")
+    assert index.lieux("Martin") == ["Salon"]
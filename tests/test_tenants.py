@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+import pytest
+import streamlit as st
+
+def test_tenant_chosen_by_url(make_app, workdir):
+    """Fonctionne avec la version de Streamlit de requirements.txt (sans st.query_params)"""
+    at = make_app(ALLOW_NEW_TENANTS=True)
+    at.query_params["maison"] = "coloc-a"
+    at.run()
+    assert not at.exception, at.exception
+    assert any(c.value == "Colocation : coloc-a" for c in at.caption)
+    assert (workdir / "maisons" / "coloc-a").is_dir()
+
+def test_unknown_tenant_is_refused(make_app):
+    at = make_app(ALLOW_NEW_TENANTS=False)
+    at.query_params["maison"] = "inconnue"
+    at.run()
+    assert not at.exception, at.exception
+    assert any("Colocation inconnue" in e.value for e in at.error)
+
+def test_evicted_tenants_release_their_caches(gist, monkeypatch):
+    import local_files
+    from gist_manager import GistManager
+    from storage import JsonFileStorage, DATA_FILE
+    from tenants import TenantCache, create_tenant, use_tenant, get_sync_worker
+    server, _ = gist
+    empty = json.dumps({"colocataires": {}, "taches": {}})
+    gists = {f"coloc-{i}": server.create_gist({"colocation_data.json": empty}) for i in range(8)}
+    monkeypatch.setitem(st.secrets, "TENANTS", gists)
+    monkeypatch.setitem(st.secrets, "LOCAL_JOURNAL", True)
+
+    cache = TenantCache(create_tenant, max_tenants=2)
+    loaded = []
+    for tenant_id in gists:
+        tenant = cache.get(tenant_id)
+        with use_tenant(tenant):
+            data = GistManager(gist_id=tenant.gist_id).load_data_from_gist()
+            storage = JsonFileStorage(tenant.path(DATA_FILE))
+            storage.save(data)
+            get_sync_worker().enqueue(data)
+        loaded.append((tenant, storage.journal, tenant.sync_worker))
+    cache.closer.wait()
+
+    assert cache.evictions == 6
+    assert len(GistManager._cache) == 2
+    assert len(local_files._journals) == 2
+    for tenant, journal, worker in loaded[:6]:
+        assert journal.fd is None
+        assert not worker.thread.is_alive()
+        # Les dernières modifications des colocations évincées sont parties
+        assert "colocation_meta.json" in server.current_files(tenant.gist_id)
+    for tenant in list(cache.tenants.values()):
+        tenant.close()
+
+def test_tenant_resolved_once_per_rerun(make_app, monkeypatch):
+    """Une éviction pendant le rerun ne peut pas répartir la page entre deux objets Tenant"""
+    from tenants import TenantCache
+    get = TenantCache.get
+    calls = []
+
+    def counting_get(self, tenant_id):
+        calls.append(tenant_id)
+        return get(self, tenant_id)
+    monkeypatch.setattr(TenantCache, "get", counting_get)
+    at = make_app(ALLOW_NEW_TENANTS=True)
+    at.query_params["maison"] = "coloc-a"
+    at.run()
+    assert not at.exception, at.exception
+    assert calls == ["coloc-a"]
+
+@pytest.mark.parametrize("backend", ["json", "events", "sqlite"])
+def test_tenant_without_gist_has_no_sync_thread(workdir, monkeypatch, backend):
+    import app
+    from sync_worker import OUTBOX_FILE
+    from tenants import create_tenant, use_tenant
+    monkeypatch.setattr(st, "secrets", {"STORAGE_BACKEND": backend})
+    tenant = create_tenant("default")
+    with use_tenant(tenant):
+        data = app.load_data()
+        with tenant.state.lock:
+            app.complete_task(data, "Arthur", next(iter(data["taches"])))
+            app.save_data(data)
+    assert tenant._sync_worker is None
+    assert not os.path.exists(OUTBOX_FILE)
+    tenant.close()
+
+def test_closed_tenant_stays_closed(gist, monkeypatch):
+    import app
+    from storage import StorageClosed
+    from tenants import create_tenant, use_tenant, TenantClosed
+    monkeypatch.setitem(st.secrets, "STORAGE_BACKEND", "gist")
+    tenant = create_tenant("default")
+    with use_tenant(tenant):
+        data = app.load_data()
+        storage = app.get_storage()
+    worker = tenant.sync_worker
+    tenant.close()
+    assert not worker.thread.is_alive()
+
+    # Pas de nouveau thread après la fermeture, ni d'envoi confié à l'ancien
+    with pytest.raises(TenantClosed):
+        tenant.sync_worker
+    with pytest.raises(StorageClosed):
+        storage.save(data)
+    assert not worker.has_pending()
+    with use_tenant(tenant), pytest.raises(TenantClosed):
+        app.get_storage()
+    tenant.close()
+
+def test_closing_releases_the_sqlite_connection(workdir, monkeypatch):
+    import app
+    from storage import StorageClosed
+    from tenants import create_tenant, use_tenant
+    monkeypatch.setattr(st, "secrets", {"STORAGE_BACKEND": "sqlite"})
+    tenant = create_tenant("default")
+    with use_tenant(tenant):
+        app.load_data()
+        storage = app.get_storage()
+    tenant.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        storage.conn.execute("SELECT 1")
+    with pytest.raises(StorageClosed):
+        storage.load()
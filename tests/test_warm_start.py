@@ -0,0 +1,45 @@
+import time
+import pytest
+import streamlit as st
+from catalog import new_document
+from gist_manager import assemble_files, split_document
+
+@pytest.mark.parametrize("window", [0.01, 2])
+def test_write_during_revalidation_is_merged_with_the_gist(gist, monkeypatch, window):
+    """Réalisation faite sur la copie locale pendant que le Gist (plus récent) est relu"""
+    import app
+    from storage import JsonFileStorage, DATA_FILE
+    from tenants import create_tenant, use_tenant
+    server, _ = gist
+    remote = new_document()
+    remote["colocataires"]["Arthur"]["points"] = 10
+    gist_id = server.create_gist(split_document(remote))
+    monkeypatch.setitem(st.secrets, "GIST_ID", gist_id)
+    monkeypatch.setitem(st.secrets, "GIST_SYNC_WINDOW", window)
+    local = new_document()
+    local["colocataires"]["Arthur"]["points"] = 4
+    JsonFileStorage(DATA_FILE).save(local)
+    server.latency = 1.0
+
+    tenant = create_tenant("default")
+    state = tenant.state
+    with use_tenant(tenant):
+        data = app.load_data()
+        assert state.refreshing and data["colocataires"]["Arthur"]["points"] == 4
+        tache = next(iter(data["taches"]))
+        with state.lock:
+            gain = app.complete_task(data, "Arthur", tache)
+            app.save_data(data)
+        # L'avertissement reste affiché tant que la fusion n'est pas faite
+        assert state.stale_since is not None
+        assert tenant.sync_worker.flush(timeout=20)
+        deadline = time.monotonic() + 10
+        while (state.refreshing or state.stale_since is not None) and time.monotonic() < deadline:
+            time.sleep(0.05)
+    tenant.close()
+
+    assert gain > 0
+    points = assemble_files(server.current_files(gist_id))["colocataires"]["Arthur"]["points"]
+    assert points == 10 + gain
+    assert state.data["colocataires"]["Arthur"]["points"] == 10 + gain
+    assert state.stale_since is None
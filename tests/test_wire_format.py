@@ -0,0 +1,48 @@
+import copy
+import json
+import os
+import wire_format
+from conftest import REPO_DIR
+from migrations import migrate
+
+def default_catalog():
+    with open(os.path.join(REPO_DIR, "catalogs", "default.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def old_document():
+    """Document d'avant les migrations : points au lieu de points_base, pas d'attribution"""
+    return {
+        "colocataires": {"Arthur": {"points": 4}, "Martin": {"points": 1}},
+        "taches": {
+            "Sortir les poubelles": {"points": 3, "lieu": "Cuisine", "derniere_realisation": None},
+            "Passer l'aspirateur": {"points": 2, "lieu": "Salon",
+                                    "derniere_realisation": "2024-03-01T10:00:00"}
+        }
+    }
+
+def test_unmigrated_tasks_round_trip_unchanged():
+    data = old_document()
+    decoded = wire_format.loads(wire_format.dumps(data))
+    assert decoded == data
+
+    # La migration retrouve les champs d'origine après l'aller-retour
+    expected = old_document()
+    migrate(decoded)
+    migrate(expected)
+    assert decoded == expected
+    assert decoded["taches"]["Sortir les poubelles"]["points_base"] == 3
+    assert decoded["taches"]["Sortir les poubelles"]["attribuee_a"] == ["Arthur", "Martin"]
+
+def test_migrated_document_stays_compact():
+    data = default_catalog()
+    doc = wire_format.encode(data)
+    assert doc["v"] == 1
+    assert all(len(entry) >= 7 for entry in doc["t"])
+    assert wire_format.loads(wire_format.dumps(data)) == data
+
+def test_mixed_document_needs_version_2():
+    data = default_catalog()
+    data["taches"]["Ancienne tâche"] = {"points": 2, "lieu": "Cuisine"}
+    doc = wire_format.encode(copy.deepcopy(data))
+    assert doc["v"] == 2
+    assert wire_format.decode(doc) == data
@@ -0,0 +1,348 @@
+"""Serveur local imitant l'API GitHub Gist utilisée par gist_manager.py
+
+Implémente GET/PATCH /gists/{id}, POST /gists et GET /gists/{id}/{revision}, avec
+ETag et requêtes conditionnelles, en-têtes X-RateLimit-*, historique des révisions,
+latence configurable et injection de pannes (erreurs 5xx, requêtes bloquées).
+
+Usage :
+    python tools/fake_gist_server.py --port 8787 --latency 0.2 --error-rate 0.1
+
+puis dans .streamlit/secrets.toml :
+    GITHUB_API_URL = "http://127.0.0.1:8787"
+    GITHUB_TOKEN = "local"
+    GIST_ID = "<id affiché au démarrage>"
+
+Le serveur peut aussi être démarré depuis Python (tests de charge, benchmarks) :
+    server = FakeGistServer(latency=0.05)
+    base_url = server.start()
+    ...
+    server.stop()
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RATE_LIMIT = 5000
+RATE_LIMIT_WINDOW = 3600
+# Document de départ sans --data : le catalogue par défaut de l'application
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "catalogs", "default.json")
+
+class FakeGistServer:
+    """État et réglages du faux serveur Gist"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 timeout_rate=0.0, hang_seconds=30.0, rate_limit=DEFAULT_RATE_LIMIT,
+                 token=None, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.rate_limit = rate_limit
+        self.token = token
+        self.random = random.Random(seed)
+
+        self.lock = threading.RLock()
+        # gist_id -> {"description", "public", "history": [{"version", "committed_at", "files"}]}
+        self.gists = {}
+        self.remaining = rate_limit
+        self.reset_at = int(time.time()) + RATE_LIMIT_WINDOW
+        self.stats = {"requests": 0, "not_modified": 0, "errors_injected": 0,
+                      "timeouts_injected": 0, "rate_limited": 0, "bytes_in": 0, "bytes_out": 0}
+        self.httpd = None
+        self.thread = None
+
+    # --- Gestion des gists ---
+
+    def create_gist(self, files, description="", public=False, gist_id=None):
+        """Crée un gist (files : nom -> contenu) et retourne son identifiant"""
+        gist_id = gist_id or uuid.uuid4().hex[:20]
+        with self.lock:
+            self.gists[gist_id] = {"description": description, "public": public, "history": []}
+            self._commit(gist_id, {name: content for name, content in files.items() if content is not None})
+        return gist_id
+
+    def _commit(self, gist_id, files):
+        gist = self.gists[gist_id]
+        version = hashlib.sha1(f"{gist_id}:{len(gist['history'])}:{time.time_ns()}".encode()).hexdigest()
+        gist["history"].append({
+            "version": version,
+            "committed_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "modified": time.time(),
+            "files": files
+        })
+
+    def current_files(self, gist_id):
+        with self.lock:
+            return dict(self.gists[gist_id]["history"][-1]["files"])
+
+    def _representation(self, gist_id, revision=None):
+        gist = self.gists[gist_id]
+        history = gist["history"]
+        entry = history[-1] if revision is None else next(h for h in history if h["version"] == revision)
+        return {
+            "id": gist_id,
+            "description": gist["description"],
+            "public": gist["public"],
+            "updated_at": entry["committed_at"],
+            "files": {
+                name: {"filename": name, "type": "application/json" if name.endswith(".json") else "text/plain",
+                       "size": len(content.encode('utf-8')), "truncated": False, "content": content}
+                for name, content in entry["files"].items()
+            },
+            "history": [
+                {"version": h["version"], "committed_at": h["committed_at"]}
+                for h in reversed(history)
+            ]
+        }, entry
+
+    # --- Serveur HTTP ---
+
+    def start(self):
+        """Démarre le serveur dans un thread et retourne son URL de base"""
+        server = self
+
+        class Handler(_GistHandler):
+            fake = server
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-gist", daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def _take_quota(self):
+        """Consomme une requête du quota ; retourne False si le quota est épuisé"""
+        with self.lock:
+            now = int(time.time())
+            if now >= self.reset_at:
+                self.remaining = self.rate_limit
+                self.reset_at = now + RATE_LIMIT_WINDOW
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+    def _refund_quota(self):
+        # Comme sur GitHub, une réponse 304 ne compte pas dans le quota
+        with self.lock:
+            self.remaining = min(self.rate_limit, self.remaining + 1)
+
+    def rate_limit_headers(self):
+        with self.lock:
+            return {
+                "X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": str(self.remaining),
+                "X-RateLimit-Reset": str(self.reset_at),
+                "X-RateLimit-Used": str(self.rate_limit - self.remaining),
+                "X-RateLimit-Resource": "core"
+            }
+
+class _GistHandler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = "HTTP/1.1"
+    # En-têtes et corps partent en deux écritures : sans TCP_NODELAY, une connexion
+    # réutilisée (keep-alive) attendrait l'accusé de réception différé du client
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- Utilitaires ---
+
+    def _send_json(self, status, payload=None, headers=None):
+        body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        for name, value in self.fake.rate_limit_headers().items():
+            self.send_header(name, value)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+        with self.fake.lock:
+            self.fake.stats["bytes_out"] += len(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        with self.fake.lock:
+            self.fake.stats["bytes_in"] += len(raw)
+        return json.loads(raw) if raw else {}
+
+    def _validators(self, gist_id, entry):
+        etag = f'W/"{entry["version"]}"'
+        return {"ETag": etag, "Last-Modified": formatdate(entry["modified"], usegmt=True)}
+
+    def _prelude(self):
+        """Latence, pannes injectées, authentification et quota ; False si la requête est terminée"""
+        fake = self.fake
+        with fake.lock:
+            fake.stats["requests"] += 1
+            delay = fake.latency + (fake.random.uniform(0, fake.jitter) if fake.jitter else 0)
+            roll = fake.random.random()
+        if delay:
+            time.sleep(delay)
+
+        if roll < fake.timeout_rate:
+            with fake.lock:
+                fake.stats["timeouts_injected"] += 1
+            # Requête bloquée : le client doit abandonner sur son propre délai
+            time.sleep(fake.hang_seconds)
+            self.close_connection = True
+            return False
+        if roll < fake.timeout_rate + fake.error_rate:
+            with fake.lock:
+                fake.stats["errors_injected"] += 1
+            self._send_json(502, {"message": "Server Error"})
+            return False
+
+        if fake.token is not None and self.headers.get("Authorization") != f"token {fake.token}":
+            self._send_json(401, {"message": "Bad credentials"})
+            return False
+
+        if not fake._take_quota():
+            with fake.lock:
+                fake.stats["rate_limited"] += 1
+            self._send_json(403, {"message": "API rate limit exceeded"})
+            return False
+        return True
+
+    def _path_parts(self):
+        return [part for part in self.path.split("?")[0].split("/") if part]
+
+    # --- Routes ---
+
+    def do_GET(self):
+        if not self._prelude():
+            return
+        parts = self._path_parts()
+        if len(parts) not in (2, 3) or parts[0] != "gists":
+            return self._send_json(404, {"message": "Not Found"})
+
+        with self.fake.lock:
+            if parts[1] not in self.fake.gists:
+                return self._send_json(404, {"message": "Not Found"})
+            try:
+                payload, entry = self.fake._representation(parts[1], parts[2] if len(parts) == 3 else None)
+            except StopIteration:
+                return self._send_json(404, {"message": "Not Found"})
+        headers = self._validators(parts[1], entry)
+
+        if_none_match = self.headers.get("If-None-Match")
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if (if_none_match and if_none_match == headers["ETag"]) or \
+                (not if_none_match and if_modified_since and if_modified_since == headers["Last-Modified"]):
+            self.fake._refund_quota()
+            with self.fake.lock:
+                self.fake.stats["not_modified"] += 1
+            return self._send_json(304, None, headers)
+
+        self._send_json(200, payload, headers)
+
+    def do_PATCH(self):
+        if not self._prelude():
+            return
+        parts = self._path_parts()
+        if len(parts) != 2 or parts[0] != "gists":
+            return self._send_json(404, {"message": "Not Found"})
+        try:
+            body = self._read_json()
+        except ValueError:
+            return self._send_json(400, {"message": "Problems parsing JSON"})
+
+        with self.fake.lock:
+            gist = self.fake.gists.get(parts[1])
+            if gist is None:
+                return self._send_json(404, {"message": "Not Found"})
+            files = dict(gist["history"][-1]["files"])
+            for name, change in (body.get("files") or {}).items():
+                # Comme sur GitHub, un fichier à null est supprimé
+                if change is None:
+                    files.pop(name, None)
+                else:
+                    new_name = change.get("filename", name)
+                    content = change.get("content", files.get(name, ""))
+                    files.pop(name, None)
+                    files[new_name] = content
+            if "description" in body:
+                gist["description"] = body["description"]
+            self.fake._commit(parts[1], files)
+            payload, entry = self.fake._representation(parts[1])
+        self._send_json(200, payload, self._validators(parts[1], entry))
+
+    def do_POST(self):
+        if not self._prelude():
+            return
+        if self._path_parts() != ["gists"]:
+            return self._send_json(404, {"message": "Not Found"})
+        try:
+            body = self._read_json()
+        except ValueError:
+            return self._send_json(400, {"message": "Problems parsing JSON"})
+        files = {name: change.get("content", "") for name, change in (body.get("files") or {}).items()}
+        gist_id = self.fake.create_gist(files, body.get("description", ""), body.get("public", False))
+        with self.fake.lock:
+            payload, entry = self.fake._representation(gist_id)
+        self._send_json(201, payload, self._validators(gist_id, entry))
+
+def build_server(argv=None):
+    """Serveur configuré par les options de la ligne de commande, avec son gist de départ"""
+    parser = argparse.ArgumentParser(description="Faux serveur GitHub Gist local")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0, help="latence ajoutée à chaque requête (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latence aléatoire supplémentaire maximale (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="proportion de réponses 502 injectées")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="proportion de requêtes bloquées")
+    parser.add_argument("--hang-seconds", type=float, default=30.0, help="durée de blocage d'une requête")
+    parser.add_argument("--rate-limit", type=int, default=DEFAULT_RATE_LIMIT, help="quota de requêtes par heure")
+    parser.add_argument("--token", help="jeton exigé dans l'en-tête Authorization (aucun contrôle par défaut)")
+    parser.add_argument("--data", default=DEFAULT_DATA,
+                        help="document JSON initial pour colocation_data.json (par défaut catalogs/default.json)")
+    parser.add_argument("--gist-id", default="local-gist")
+    args = parser.parse_args(argv)
+
+    server = FakeGistServer(args.host, args.port, args.latency, args.jitter, args.error_rate,
+                            args.timeout_rate, args.hang_seconds, args.rate_limit, args.token)
+    with open(args.data, 'r', encoding='utf-8') as f:
+        content = f.read()
+    server.create_gist({"colocation_data.json": content}, "TaskGame Colocation - serveur local", gist_id=args.gist_id)
+    return server, args.gist_id
+
+def main(argv=None):
+    server, gist_id = build_server(argv)
+    base_url = server.start()
+    print(f"Faux serveur Gist sur {base_url} (GIST_ID = \"{gist_id}\")")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
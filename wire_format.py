@@ -0,0 +1,171 @@
+import base64
+import gzip
+import json
+from datetime import datetime, timedelta
+
+# Format compact du document (version 1) :
+#   {"format": "taskgame-compact", "v": 1,
+#    "c": ["Antoine", "Arthur", ...],          # table des colocataires (l'indice sert d'identifiant)
+#    "p": [12, 7, ...],                        # points (null : nom connu des tâches mais plus colocataire)
+#    "l": ["Cuisine", ...],                    # table des lieux
+#    "t": [[nom, lieu, points_base, points_actuels, date, par, attribuee_a], ...],
+#    "x": {...}}                               # autres clés du document (last_updated...)
+# date est un entier (secondes depuis 1970, heure locale sans fuseau comme les dates
+# d'origine), par un indice de colocataire et attribuee_a un masque de bits sur la table.
+# Une tâche peut avoir un 8e élément : ses champs supplémentaires.
+# Version 2 : une tâche à qui il manque un des champs habituels (document pas encore
+# migré) est gardée telle quelle, [nom, {champs}] : aucun champ absent n'est inventé.
+# "v" est la version nécessaire pour relire le document (1 sans tâche de ce genre).
+FORMAT_NAME = "taskgame-compact"
+FORMAT_VERSION = 2
+
+# Enveloppe gzip + base64 (contenu de Gist seulement : le Gist n'accepte que du texte)
+GZIP_ENCODING = "gzip+base64"
+
+# Valeurs du secret WIRE_FORMAT
+COMPACT = "compact"
+LEGACY = "json"
+
+_EPOCH = datetime(1970, 1, 1)
+_TASK_FIELDS = ("lieu", "points_base", "points_actuels", "derniere_realisation",
+                "derniere_realisation_par", "attribuee_a")
+
+def _to_epoch(value):
+    """Date ISO -> secondes entières (la chaîne est conservée si elle n'est pas une date)"""
+    if not value:
+        return None
+    try:
+        return int((datetime.fromisoformat(value) - _EPOCH).total_seconds())
+    except (TypeError, ValueError):
+        return value
+
+def _members(mask, noms):
+    """Noms correspondant aux bits à 1 du masque (parcourt seulement les bits à 1)"""
+    membres = []
+    while mask:
+        bit = mask & -mask
+        membres.append(noms[bit.bit_length() - 1])
+        mask ^= bit
+    return membres
+
+def is_compact(doc):
+    return isinstance(doc, dict) and doc.get("format") == FORMAT_NAME
+
+def encode(data):
+    """Document habituel -> document compact"""
+    colocataires = list(data.get('colocataires', {}))
+    ids = {nom: i for i, nom in enumerate(colocataires)}
+    points = []
+    for nom in colocataires:
+        info = data['colocataires'][nom]
+        # Cas courant {"points": n} réduit à n
+        points.append(info.get('points', 0) if list(info) == ['points'] else info)
+
+    def coloc_id(nom):
+        if nom not in ids:
+            # Nom encore présent dans les tâches d'un colocataire supprimé
+            ids[nom] = len(colocataires)
+            colocataires.append(nom)
+            points.append(None)
+        return ids[nom]
+
+    lieux = {}
+    taches = []
+    version = 1
+    for nom, info in data.get('taches', {}).items():
+        if any(field not in info for field in _TASK_FIELDS):
+            # Tâche pas encore migrée : la migration doit retrouver les champs d'origine
+            taches.append([nom, info])
+            version = 2
+            continue
+        mask = 0
+        for coloc in info['attribuee_a']:
+            mask |= 1 << coloc_id(coloc)
+        par = info['derniere_realisation_par']
+        entry = [
+            nom,
+            lieux.setdefault(info['lieu'], len(lieux)),
+            info['points_base'],
+            info['points_actuels'],
+            _to_epoch(info['derniere_realisation']),
+            None if par is None else coloc_id(par),
+            mask
+        ]
+        extra = {k: v for k, v in info.items() if k not in _TASK_FIELDS}
+        if extra:
+            entry.append(extra)
+        taches.append(entry)
+
+    doc = {
+        "format": FORMAT_NAME,
+        "v": version,
+        "c": colocataires,
+        "p": points,
+        "l": list(lieux),
+        "t": taches
+    }
+    extra = {k: v for k, v in data.items() if k not in ('colocataires', 'taches')}
+    if extra:
+        doc["x"] = extra
+    return doc
+
+def decode(doc):
+    """Document compact -> document habituel (un document habituel est rendu tel quel)"""
+    if not is_compact(doc):
+        return doc
+    if doc.get("v", 0) > FORMAT_VERSION:
+        raise ValueError(f"Format compact v{doc['v']} non pris en charge (version {FORMAT_VERSION} maximum)")
+
+    noms = doc["c"]
+    lieux = doc["l"]
+    data = dict(doc.get("x", {}))
+    data['colocataires'] = {
+        nom: (dict(pts) if isinstance(pts, dict) else {'points': pts})
+        for nom, pts in zip(noms, doc["p"]) if pts is not None
+    }
+
+    # Les mêmes équipes reviennent sur beaucoup de tâches : masque décodé une seule fois
+    equipes = {}
+    taches = {}
+    for entry in doc["t"]:
+        if len(entry) == 2:
+            # Tâche gardée telle quelle (version 2)
+            taches[entry[0]] = dict(entry[1])
+            continue
+        nom, lieu, points_base, points_actuels, date, par, mask = entry[:7]
+        equipe = equipes.get(mask)
+        if equipe is None:
+            equipe = equipes[mask] = _members(mask, noms)
+        if date.__class__ is int:
+            date = (_EPOCH + timedelta(seconds=date)).isoformat()
+        info = {
+            'points_base': points_base,
+            'lieu': lieux[lieu],
+            'derniere_realisation': date,
+            'points_actuels': points_actuels,
+            'attribuee_a': equipe[:],
+            'derniere_realisation_par': None if par is None else noms[par]
+        }
+        if len(entry) > 7:
+            info.update(entry[7])
+        taches[nom] = info
+    data['taches'] = taches
+    return data
+
+def dumps(data, wire_format=COMPACT, compress=False):
+    """Sérialise le document (format compact sans indentation, ou JSON indenté d'origine)"""
+    if wire_format == LEGACY:
+        text = json.dumps(data, indent=2, ensure_ascii=False)
+    else:
+        text = json.dumps(encode(data), ensure_ascii=False, separators=(',', ':'))
+    if compress:
+        payload = base64.b64encode(gzip.compress(text.encode('utf-8'))).decode('ascii')
+        text = json.dumps({"encoding": GZIP_ENCODING, "payload": payload})
+    return text
+
+def loads(text):
+    """Lit un document dans n'importe lequel des formats (habituel, compact, compressé)"""
+    doc = json.loads(text)
+    if isinstance(doc, dict) and doc.get("encoding") == GZIP_ENCODING:
+        doc = json.loads(gzip.decompress(base64.b64decode(doc["payload"])).decode('utf-8'))
+    return decode(doc)